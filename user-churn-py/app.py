@@ -18,7 +18,16 @@ from sklearn.metrics import (
     classification_report,
 )
 
-from data_loader import load_parquet, filter_df_with_names, data_split
+from data_loader import (
+    load_parquet,
+    data_split,
+    feature_cache_path,
+    load_first_seen,
+    save_feature_cache,
+    FEATURE_SOURCE_COLUMNS,
+)
+from segment_features import PlayerTimeline
+from study_store import STUDY_PATH, StudyStore, data_fingerprint
 from model_training import (
     random_forest_classifier,
     knn_classifier,
@@ -29,18 +38,34 @@ from model_training import (
 
 
 @st.cache_data(show_spinner=False)
-def _cached_load_parquet(data_dir, start_date, end_date):
-    return load_parquet(data_dir, start_date, end_date)
+def _cached_load_parquet(data_dir, start_date, end_date, columns=None, snapshot=False):
+    return load_parquet(data_dir, start_date, end_date, columns=columns, snapshot=snapshot)
+
+
+# 사이드바 슬라이더 범위 (PlayerTimeline 은 AP + COP 최댓값까지의 매치만 들고 있는다)
+AP_MIN, AP_MAX = 2, 14
+COP_MIN, COP_MAX = 3, 14
+
+
+@st.cache_resource(show_spinner=False)
+def _cached_timeline(data_dir, start_date, end_date):
+    # 기간별로 한 번만 정렬해 두고, 슬라이더를 움직이면 AP/COP 집계만 다시 한다
+    raw_df = _cached_load_parquet(data_dir, start_date, end_date, FEATURE_SOURCE_COLUMNS, snapshot=True)
+    return PlayerTimeline(raw_df, horizon_days=AP_MAX + COP_MAX, first_seen=load_first_seen(data_dir))
 
 
 @st.cache_data(show_spinner=False)
-def _cached_filter(raw_df, activation_period, churn_observation_period, churn_col):
-    return filter_df_with_names(
-        raw_df,
-        activation_period=activation_period,
-        churn_observation_period=churn_observation_period,
-        churn_column=churn_col,
-    )
+def _cached_filter(data_dir, start_date, end_date, activation_period, churn_observation_period, churn_col):
+    # filter_df_with_names() 와 같은 결과. 실험 스크립트와 같은 디스크 캐시를 먼저 확인한다
+    cache_path = feature_cache_path(data_dir, start_date, end_date, activation_period,
+                                    churn_observation_period, churn_col)
+    if cache_path.exists():
+        return pd.read_parquet(cache_path)
+    timeline = _cached_timeline(data_dir, start_date, end_date)
+    result_df = timeline.features(activation_period)
+    result_df[churn_col] = timeline.labels(activation_period, churn_observation_period)
+    save_feature_cache(result_df, cache_path)
+    return result_df
 
 # ---------------------------------------------------------------------------
 # Page config
@@ -128,6 +153,9 @@ MODEL_FUNCS = {
     "lgbm": lightgbm_classifier,
 }
 
+# experiment_tuning.py 가 study_store 에 최적 파라미터를 남기는 모델
+TUNABLE_MODELS = {"rf", "xgb", "lgbm"}
+
 MODEL_INFO = {
     "rf": {
         "설명": "여러 개의 결정 트리를 앙상블하여 다수결로 분류하는 모델",
@@ -185,11 +213,11 @@ else:
     end_date = start_date
 
 activation_period = st.sidebar.slider(
-    "활성 기간 (일)", min_value=2, max_value=14, value=7
+    "활성 기간 (일)", min_value=AP_MIN, max_value=AP_MAX, value=7
 )
 
 churn_observation_period = st.sidebar.slider(
-    "이탈 관찰 기간 (일)", min_value=3, max_value=14, value=7
+    "이탈 관찰 기간 (일)", min_value=COP_MIN, max_value=COP_MAX, value=7
 )
 
 # ---------------------------------------------------------------------------
@@ -197,9 +225,10 @@ churn_observation_period = st.sidebar.slider(
 # ---------------------------------------------------------------------------
 churn_col = f"ap_{activation_period}d_and_cop_{churn_observation_period}d"
 
-raw_df = _cached_load_parquet(str(DATA_DIR), str(start_date), str(end_date))
+# 피처/이탈 라벨 계산에 쓰는 컬럼만 메모리 매핑된 스냅샷에서 읽는다
+raw_df = _cached_load_parquet(str(DATA_DIR), str(start_date), str(end_date), FEATURE_SOURCE_COLUMNS, snapshot=True)
 filtered_df_names = (
-    _cached_filter(raw_df, activation_period, churn_observation_period, churn_col)
+    _cached_filter(str(DATA_DIR), str(start_date), str(end_date), activation_period, churn_observation_period, churn_col)
     if not raw_df.empty else None
 )
 filtered_df = (
@@ -245,6 +274,33 @@ def _ensure_model(key):
     st.session_state.trained_models = cache
     return model
 
+
+def _risk_label(p):
+    if p >= 0.7:
+        return "높음"
+    elif p >= 0.4:
+        return "중간"
+    else:
+        return "낮음"
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cached_predictions(cache_key, model_key, model_id, features, _model, _filtered_df):
+    """이탈 확률과 위험 등급을 붙인 예측 프레임 (이탈 확률 내림차순, name 인덱스).
+
+    캐시 키는 데이터 조건(cache_key)과 모델 식별자만 쓰고, 모델과 피처 프레임은 해시하지 않는다.
+    """
+    features = list(features)
+    proba = _model.predict_proba(_filtered_df[features])[:, 1]
+    # proba 는 churn_col==1 (유지) 확률이므로 이탈 확률 = 1 - proba
+    # churn_col: 0=이탈, 1=유지 이므로 class 1 = 유지
+    # 이탈 확률 = P(class=0) = 1 - P(class=1)
+    pred_df = _filtered_df[["name"] + features].copy()
+    pred_df["이탈 확률"] = 1 - proba
+    pred_df["위험 등급"] = pred_df["이탈 확률"].apply(_risk_label)
+    pred_df = pred_df.sort_values("이탈 확률", ascending=False)
+    return pred_df.set_index("name", drop=False)
+
 # 피처 중요도를 지원하는 모델
 IMPORTANCE_MODELS = {"rf", "xgb", "lgbm"}
 
@@ -299,7 +355,9 @@ with tab0:
 
     st.subheader("원본 데이터 미리보기")
     preview_n = st.slider("표시할 행 수", min_value=5, max_value=100, value=20, key="raw_preview_n")
-    st.dataframe(raw_df.head(preview_n), use_container_width=True, hide_index=True)
+    # 미리보기는 첫날 하루치만 전체 컬럼으로 읽는다
+    preview_df = _cached_load_parquet(str(DATA_DIR), str(start_date), str(start_date))
+    st.dataframe(preview_df.head(preview_n), use_container_width=True, hide_index=True)
     st.caption(f"전체 {len(raw_df):,}행 중 상위 {preview_n}행")
 
     st.divider()
@@ -420,23 +478,12 @@ with tab1:
     # --- 5. Daily Churn Rate ---
     st.subheader("일별 이탈률")
 
-    raw_copy = raw_df.copy()
-    raw_copy["first_login_date"] = raw_copy.groupby("name")["date"].transform("min")
-
-    ap_delta = datetime.timedelta(days=activation_period)
-    cop_delta = datetime.timedelta(days=churn_observation_period)
-
-    full = raw_copy[raw_copy["date"] < raw_copy["first_login_date"] + ap_delta + cop_delta].copy()
-    full["played_cop"] = (
-        (full["date"] > full["first_login_date"] + ap_delta)
-        & (full["date"] < full["first_login_date"] + ap_delta + cop_delta)
-    ).astype(int)
-    user_labels = full.groupby("name").agg(
-        first_login_date=("first_login_date", "first"),
-        played_cop=("played_cop", "max"),
-    ).reset_index()
-    user_labels["churned"] = (user_labels["played_cop"] == 0).astype(int)
-    user_labels["login_date"] = user_labels["first_login_date"].dt.date
+    # 첫 접속일별로 묶은 이탈 라벨 (캐시된 PlayerTimeline 의 첫 재접속 시각과 비교)
+    timeline = _cached_timeline(str(DATA_DIR), str(start_date), str(end_date))
+    user_labels = pd.DataFrame({
+        "login_date": timeline.first.astype("datetime64[D]"),
+        "churned": 1 - timeline.labels(activation_period, churn_observation_period),
+    })
 
     daily = user_labels.groupby("login_date").agg(
         total=("churned", "count"),
@@ -468,26 +515,9 @@ with tab2:
         )
         pred_model = _ensure_model(pred_model_key)
         _pred_features = st.session_state.feature_names  # 학습 시 컬럼 순서 그대로 사용
-        X_all = filtered_df_names[_pred_features]
-        proba = pred_model.predict_proba(X_all)[:, 1]
-        # proba 는 churn_col==1 (유지) 확률이므로 이탈 확률 = 1 - proba
-        # churn_col: 0=이탈, 1=유지 이므로 class 1 = 유지
-        # 이탈 확률 = P(class=0) = 1 - P(class=1)
-        churn_proba = 1 - proba
-
-        pred_df = filtered_df_names[["name"] + _pred_features].copy()
-        pred_df["이탈 확률"] = churn_proba
-
-        def _risk_label(p):
-            if p >= 0.7:
-                return "높음"
-            elif p >= 0.4:
-                return "중간"
-            else:
-                return "낮음"
-
-        pred_df["위험 등급"] = pred_df["이탈 확률"].apply(_risk_label)
-        pred_df = pred_df.sort_values("이탈 확률", ascending=False).reset_index(drop=True)
+        # 데이터/모델이 같으면 예측 프레임을 다시 만들지 않는다 (유저 검색 입력마다 재실행되므로)
+        pred_df = _cached_predictions(_cache_key, pred_model_key, id(pred_model), tuple(_pred_features),
+                                      pred_model, filtered_df_names)
 
         # --- Top N 위험 유저 테이블 ---
         st.subheader("이탈 위험 유저 Top N")
@@ -521,11 +551,11 @@ with tab2:
         search_name = st.text_input("유저 이름을 입력하세요", key="user_search")
 
         if search_name:
-            user_row = pred_df[pred_df["name"] == search_name]
-            if user_row.empty:
+            # 캐시된 name 인덱스로 한 명만 조회 (전체 예측 프레임을 비교 연산으로 훑지 않는다)
+            if search_name not in pred_df.index:
                 st.warning("해당 유저를 찾을 수 없습니다")
             else:
-                user = user_row.iloc[0]
+                user = pred_df.loc[search_name]
                 st.markdown(f"**유저:** {user['name']}")
 
                 ucol1, ucol2 = st.columns(2)
@@ -593,12 +623,37 @@ with tab3:
         if len(selected_keys) == 0:
             st.info("비교할 모델을 1개 이상 선택하세요.")
         else:
-            def _train_selected_models(X_tr, y_tr, X_te, y_te, keys):
+            # 튜닝 저장소에서 현재 데이터(기간/AP/COP)로 찾은 최적 파라미터를 읽는다 (탐색은 하지 않음)
+            tuned_params = {}
+            if STUDY_PATH.exists():
+                store = StudyStore(STUDY_PATH)
+                data_hash = data_fingerprint(filtered_df.drop(columns=[churn_col]), filtered_df[churn_col])
+                for key in (k for k in MODEL_NAMES if k in TUNABLE_MODELS):
+                    best = store.best_params(MODEL_NAMES[key], data_hash)
+                    if best is not None:
+                        tuned_params[key] = best
+
+            use_tuned = False
+            if tuned_params:
+                use_tuned = st.checkbox(
+                    "튜닝된 파라미터 사용 ("
+                    + ", ".join(f"{MODEL_NAMES[k]} AUC {v['score']:.4f}" for k, v in tuned_params.items())
+                    + ")",
+                    value=True,
+                    key="use_tuned_params",
+                )
+            else:
+                st.caption("현재 데이터로 튜닝한 기록이 없어 기본 파라미터를 씁니다 (experiment_tuning.py 실행 시 저장).")
+
+            def _train_selected_models(X_tr, y_tr, X_te, y_te, keys, params_by_key):
                 results = {}
                 y_te_np = np.ravel(y_te)
                 for key in keys:
                     func = MODEL_FUNCS[key]
-                    _, y_pred, model = func(X_tr, y_tr, X_te, y_te)
+                    if key in params_by_key:
+                        _, y_pred, model = func(X_tr, y_tr, X_te, y_te, params=params_by_key[key])
+                    else:
+                        _, y_pred, model = func(X_tr, y_tr, X_te, y_te)
                     y_pred = np.ravel(y_pred)
                     y_proba = model.predict_proba(X_te)[:, 1]
                     fpr, tpr, _ = roc_curve(y_te_np, y_proba)
@@ -617,12 +672,15 @@ with tab3:
                         "recall": recall_score(y_te_np, y_pred, average="macro"),
                         "confusion_matrix": cm,
                         "report": report,
+                        "params": params_by_key.get(key),
                     }
                 return results
 
             if st.button("모델 재학습", key="retrain_btn"):
                 with st.spinner("모델 학습 중..."):
-                    model_results = _train_selected_models(X_train, y_train, X_test, y_test, selected_keys)
+                    params_by_key = {k: v["params"] for k, v in tuned_params.items()} if use_tuned else {}
+                    model_results = _train_selected_models(X_train, y_train, X_test, y_test, selected_keys,
+                                                           params_by_key)
                     st.session_state.model_results = model_results
                     st.session_state.trained_keys = selected_keys
                 st.success("학습 완료!")
@@ -697,9 +755,14 @@ with tab3:
                         st.markdown(f"**적합한 상황:** {info['적합한 상황']}")
 
                         # 파라미터
-                        st.markdown("**하이퍼파라미터**")
+                        if r.get("params") is not None:
+                            st.markdown("**하이퍼파라미터** (튜닝 저장소의 최적값, 나머지는 기본값)")
+                            shown_params = r["params"]
+                        else:
+                            st.markdown("**하이퍼파라미터**")
+                            shown_params = info["파라미터"]
                         param_df = pd.DataFrame(
-                            [{"파라미터": k, "값": str(v)} for k, v in info["파라미터"].items()]
+                            [{"파라미터": k, "값": str(v)} for k, v in shown_params.items()]
                         )
                         st.dataframe(param_df, use_container_width=True, hide_index=True)
 
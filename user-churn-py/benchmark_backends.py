@@ -0,0 +1,97 @@
+"""filter_df_with_names() backend 별 벤치마크 + 결과 일치 확인 스크립트.
+
+기간 내 매치를 1x, 10x, 100x ... 로 늘려 가며 backend 마다 소요 시간을 재고,
+backend='pandas' 결과와 같은지(컬럼, 순서, dtype, 상대 오차 1e-9) 확인한다.
+N배 데이터는 플레이어 이름에 접미사를 붙인 사본 N개를 이어 붙여 만든다 (플레이어 수가 N배).
+1x 에서는 DuckDB 가 Parquet 파일을 직접 읽는 경우(duckdb-parquet)도 함께 잰다.
+
+사용 예:
+    python benchmark_backends.py --start-date 2015-06-01 --end-date 2015-06-07 --scales 1 10 100
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import data_loader
+import feature_backends
+
+
+DATA_DIR = Path("data/matches")
+BACKENDS = ['pandas', 'numpy', 'polars', 'duckdb']
+
+
+def _replicate(df: pd.DataFrame, scale: int) -> pd.DataFrame:
+    """플레이어 이름에 사본 번호를 붙여 scale 배 크기의 매치 데이터를 만든다."""
+    if scale == 1:
+        return df
+    copies = [df.assign(name=df['name'] + f"#{k}") for k in range(scale)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="피처 엔지니어링 backend 벤치마크")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help=f"Parquet 디렉토리 (기본값: {DATA_DIR})")
+    parser.add_argument("--start-date", default="2015-06-01")
+    parser.add_argument("--end-date", default="2015-06-07")
+    parser.add_argument("--ap", type=int, default=7, help="activation period (일)")
+    parser.add_argument("--cop", type=int, default=7, help="churn observation period (일)")
+    parser.add_argument("--scales", type=int, nargs='+', default=[1, 10, 100], help="데이터 배수 (기본값: 1 10 100)")
+    parser.add_argument("--backends", nargs='+', default=BACKENDS, choices=BACKENDS,
+                        help="비교할 backend (pandas 는 항상 기준으로 실행)")
+    args = parser.parse_args()
+
+    if not args.data_dir.exists():
+        print(f"[ERROR] {args.data_dir}가 없습니다.")
+        sys.exit(1)
+
+    churn_col = f"ap_{args.ap}d_and_cop_{args.cop}d"
+    base_df = data_loader.load_parquet(str(args.data_dir), args.start_date, args.end_date,
+                                       columns=data_loader.FEATURE_SOURCE_COLUMNS)
+    if base_df.empty:
+        print(f"[ERROR] {args.start_date} ~ {args.end_date} 기간에 데이터가 없습니다.")
+        sys.exit(1)
+
+    failed = False
+    print(f"{'scale':>6} {'rows':>12} {'backend':>15} {'sec':>8}  결과")
+    for scale in args.scales:
+        df = _replicate(base_df, scale)
+        expected, pandas_sec = _timed(data_loader.filter_df_with_names, df, args.ap, args.cop, churn_col,
+                                      backend='pandas')
+        print(f"{scale:>5}x {len(df):>12,} {'pandas':>15} {pandas_sec:>8.2f}  기준 ({len(expected):,}명)")
+
+        runs = [(b, lambda b=b: data_loader.filter_df_with_names(df, args.ap, args.cop, churn_col, backend=b))
+                for b in args.backends if b != 'pandas']
+        if scale == 1 and 'duckdb' in args.backends:
+            runs.append(('duckdb-parquet', lambda: feature_backends.compute_features_duckdb_parquet(
+                args.data_dir, args.start_date, args.end_date, args.ap, args.cop, churn_col)))
+
+        for name, run in runs:
+            try:
+                actual, sec = _timed(run)
+            except ImportError as e:
+                print(f"{scale:>5}x {len(df):>12,} {name:>15} {'-':>8}  [SKIP] {e}")
+                continue
+            try:
+                pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-9)
+                status = "일치"
+            except AssertionError as e:
+                failed = True
+                status = f"[ERROR] 불일치: {str(e).splitlines()[0]}"
+            print(f"{scale:>5}x {len(df):>12,} {name:>15} {sec:>8.2f}  {status}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""피처 엔지니어링 벤치마크 스크립트.
+
+score_trend 계산을 기존 방식(플레이어마다 np.polyfit 을 부르는 groupby.apply)과
+data_loader 의 그룹 합계 기반 계산으로 각각 돌려 소요 시간과 최대 오차를 출력하고,
+filter_df_with_names() 전체 소요 시간을 backend 별로 재어 결과가 같은지 확인한다.
+마지막으로 pandas, numpy, numpy 저메모리 모드(low_memory=True)의 최대 할당 메모리를 비교한다.
+
+사용 예:
+    python benchmark_features.py --start-date 2015-05-25 --end-date 2016-10-23 --ap 7
+"""
+
+import argparse
+import datetime
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import segment_features
+
+
+DATA_DIR = Path("data/matches")
+
+
+def _score_trend_polyfit(df_feat):
+    """기존 구현: 플레이어별 np.polyfit 기울기 (비교 기준)"""
+    def _slope(group):
+        if len(group) < 2:
+            return 0.0
+        x = group['game_seq'].values.astype(float)
+        y = group['score'].values.astype(float)
+        return np.polyfit(x, y, 1)[0]
+
+    return df_feat.groupby('name').apply(_slope, include_groups=False)
+
+
+def _feature_rows(df, activation_period):
+    """filter_df_with_names() 와 같은 방식으로 AP 내 행과 game_seq 를 만든다."""
+    first_login = df.groupby('name')['date'].transform('min')
+    df_feat = df[df['date'] <= first_login + datetime.timedelta(days=activation_period)]
+    df_feat = df_feat.sort_values(['name', 'date'])
+    df_feat = df_feat.assign(game_seq=df_feat.groupby('name').cumcount())
+    return df_feat
+
+
+def _timed(func, *args, repeat=1, **kwargs):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="피처 엔지니어링 벤치마크")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help=f"Parquet 디렉토리 (기본값: {DATA_DIR})")
+    parser.add_argument("--start-date", default="2015-05-25")
+    parser.add_argument("--end-date", default="2016-10-23")
+    parser.add_argument("--ap", type=int, default=7, help="activation period (일)")
+    parser.add_argument("--cop", type=int, default=7, help="churn observation period (일)")
+    parser.add_argument("--repeat", type=int, default=3, help="반복 횟수 (최솟값 기록)")
+    args = parser.parse_args()
+
+    if not args.data_dir.exists():
+        print(f"[ERROR] {args.data_dir}가 없습니다.")
+        sys.exit(1)
+
+    df, load_sec = _timed(data_loader.load_parquet, str(args.data_dir), args.start_date, args.end_date,
+                          columns=data_loader.FEATURE_SOURCE_COLUMNS)
+    print(f"로드: {len(df):,}건, {load_sec:.2f}s")
+
+    df_feat = _feature_rows(df, args.ap)
+    print(f"AP={args.ap}일 피처 대상: {len(df_feat):,}건, {df_feat['name'].nunique():,}명")
+
+    expected, polyfit_sec = _timed(_score_trend_polyfit, df_feat)
+    actual, closed_sec = _timed(data_loader._score_trend, df_feat, repeat=args.repeat)
+    max_err = np.max(np.abs(actual.to_numpy() - expected.reindex(actual.index).to_numpy()))
+
+    print("\n[score_trend]")
+    print(f"  polyfit (groupby.apply): {polyfit_sec:8.3f}s")
+    print(f"  그룹 합계 (closed-form): {closed_sec:8.3f}s  ({polyfit_sec / closed_sec:,.0f}배)")
+    print(f"  최대 절대 오차: {max_err:.3e}")
+
+    print(f"\n[filter_df_with_names] AP={args.ap}, COP={args.cop}")
+    results = {}
+    for backend in ("pandas", "numpy"):
+        results[backend], total_sec = _timed(data_loader.filter_df_with_names, df, args.ap, args.cop,
+                                             backend=backend, repeat=args.repeat)
+        print(f"  {backend:<6}: {total_sec:8.3f}s")
+    try:
+        pd.testing.assert_frame_equal(results["pandas"], results["numpy"], check_exact=False, rtol=1e-9)
+        print("  두 backend 결과 일치")
+    except AssertionError as e:
+        print(f"  [ERROR] backend 결과 불일치: {e}")
+
+    # tracemalloc 으로 계산 중 새로 할당한 최대 메모리 (입력 df 제외)
+    print(f"\n[최대 메모리] AP={args.ap}, COP={args.cop}, 입력 {df.memory_usage(deep=True).sum() / 2**20:,.0f}MB")
+    for label, kwargs in (("pandas", {'backend': 'pandas'}), ("numpy", {}), ("numpy low_memory", {'low_memory': True})):
+        result, peak = segment_features._traced(
+            lambda: data_loader.filter_df_with_names(df, args.ap, args.cop, **kwargs))
+        print(f"  {label:<16}: {peak / 2**20:8.1f}MB")
+    try:
+        pd.testing.assert_frame_equal(results["numpy"], result)
+        print("  low_memory 결과 일치")
+    except AssertionError as e:
+        print(f"  [ERROR] low_memory 결과 불일치: {e}")
+
+
+if __name__ == "__main__":
+    main()
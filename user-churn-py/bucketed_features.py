@@ -0,0 +1,231 @@
+"""플레이어 해시 버킷 단위로 나누어 계산하는 out-of-core 피처 엔지니어링.
+
+filter_df_with_names() 는 기간 전체의 원본 테이블을 한 프로세스 메모리에 올려야 한다.
+여기서는 파티션을 배치 단위로 스트리밍하면서 플레이어를 해시 버킷으로 나누어 버킷별 Parquet 파일로
+흘려 쓰고(spill), 버킷마다 프로세스 풀에서 filter_df_with_names() 를 실행한 뒤 작은 플레이어별
+결과만 모아 합친다. 한 플레이어의 매치는 항상 같은 버킷에 들어가므로 결과는 전체 계산과 같다.
+
+최대 메모리는 (버킷 하나의 크기 x 동시 작업 수)로 제한되고, 버킷 계산은 코어 수만큼 병렬로 돈다.
+
+사용 예:
+    python bucketed_features.py --start-date 2015-05-25 --end-date 2016-10-23 --buckets 16 --workers 4
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+import data_loader
+
+
+DATA_DIR = Path("data/matches")
+BUCKETS = 16
+SCAN_BATCH_SIZE = 256 * 1024
+# spill 단계에서 버킷별로 모아 두는 행 수의 합. 버킷마다 (SPILL_BUFFER_ROWS / 버킷 수) 행이 모이면 쓴다
+SPILL_BUFFER_ROWS = 512 * 1024
+
+
+def _name_hash(names: pa.Array) -> np.ndarray:
+    """문자열 배열의 UTF-8 바이트로 계산한 uint64 해시.
+
+    Python 문자열 객체를 만들지 않고 Arrow 버퍼(offsets, data)를 그대로 읽는다.
+    바이트마다 위치별 가중치를 곱해 더한 뒤(다항식 해시) 비트를 섞는다. 실행마다 값이 같다.
+    """
+    names = names.cast(pa.large_string())
+    _, offsets_buf, data_buf = names.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int64)[names.offset:names.offset + len(names) + 1]
+    data = np.frombuffer(data_buf, dtype=np.uint8)[offsets[0]:offsets[-1]].astype(np.uint64)
+    starts = offsets[:-1] - offsets[0]
+    lengths = np.diff(offsets)
+
+    pos = np.arange(len(data)) - np.repeat(starts, lengths)
+    weights = np.cumprod(np.full(max(int(lengths.max(initial=0)), 1), 0x100000001B3, dtype=np.uint64))
+    h = np.zeros(len(names), dtype=np.uint64)
+    nonempty = lengths > 0
+    if len(data):
+        h[nonempty] = np.add.reduceat(data * weights[pos], starts[nonempty])
+    h ^= lengths.astype(np.uint64)
+    # splitmix64 마무리 단계
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return h
+
+
+def _bucket_of(batch: pa.RecordBatch, buckets: int) -> np.ndarray:
+    """배치의 각 행이 들어갈 버킷 번호. 컴팩트 스키마는 player_id, 예전 형식은 이름 해시로 나눈다."""
+    if 'player_id' in batch.schema.names:
+        return batch['player_id'].to_numpy() % buckets
+    return (_name_hash(batch['name']) % np.uint64(buckets)).astype(np.int64)
+
+
+def spill_buckets(data_dir, start_date, end_date, spill_dir, buckets: int = BUCKETS) -> list[Path]:
+    """기간 내 매치를 플레이어 해시 버킷별 Parquet 파일로 나누어 쓰고, 생성된 파일 목록을 반환한다.
+
+    파티션은 SCAN_BATCH_SIZE 행 단위로 스트리밍하고 버킷별 버퍼는 합쳐서 SPILL_BUFFER_ROWS 행을
+    넘지 않으므로, 이 단계의 메모리는 기간 길이와 관계없이 일정하다.
+
+    Args:
+        data_dir: Parquet 디렉토리 경로
+        start_date: 시작 날짜 (yyyy-mm-dd, 포함)
+        end_date: 종료 날짜 (yyyy-mm-dd, 포함)
+        spill_dir: 버킷 파일을 쓸 디렉토리
+        buckets: 버킷 수
+    Returns:
+        행이 하나 이상 들어간 버킷 파일 경로 목록
+    """
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    files = data_loader.partition_files(Path(data_dir), start, end)
+    if not files:
+        return []
+
+    dataset = ds.dataset([str(f) for f in files], format='parquet')
+    encoded = 'player_id' in dataset.schema.names
+    columns = [('player_id' if c == 'name' and encoded else c) for c in data_loader.FEATURE_SOURCE_COLUMNS]
+    condition = ((pc.field('date') >= start.to_pydatetime())
+                 & (pc.field('date') < (end + pd.Timedelta(days=1)).to_pydatetime()))
+
+    spill_dir = Path(spill_dir)
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    writers = {}
+    pending = {b: [] for b in range(buckets)}
+    pending_rows = np.zeros(buckets, dtype=np.int64)
+    flush_rows = max(SPILL_BUFFER_ROWS // buckets, 1)
+
+    def _flush(b):
+        # 작은 조각을 모아 row group 하나로 쓴다 (파티션이 작아도 row group 이 잘게 쪼개지지 않도록)
+        table = pa.Table.from_batches(pending[b])
+        if b not in writers:
+            writers[b] = pq.ParquetWriter(spill_dir / f"bucket-{b:04d}.parquet", table.schema)
+        writers[b].write_table(table, row_group_size=max(table.num_rows, 1))
+        pending[b] = []
+        pending_rows[b] = 0
+
+    try:
+        # 스레드 스캔은 소비가 느리면 앞서 읽은 배치를 계속 쌓아 두므로 순차로 읽는다
+        for batch in dataset.to_batches(columns=columns, filter=condition, batch_size=SCAN_BATCH_SIZE,
+                                        use_threads=False):
+            if batch.num_rows == 0:
+                continue
+            bucket = _bucket_of(batch, buckets)
+            order = np.argsort(bucket, kind='stable')
+            bounds = np.searchsorted(bucket[order], np.arange(buckets + 1))
+            for b in np.flatnonzero(np.diff(bounds)):
+                # slice 는 원본 배치 전체를 붙잡아 두므로 버킷별로 따로 복사한다
+                pending[b].append(batch.take(pa.array(order[bounds[b]:bounds[b + 1]])))
+                pending_rows[b] += bounds[b + 1] - bounds[b]
+                if pending_rows[b] >= flush_rows:
+                    _flush(b)
+        for b in np.flatnonzero(pending_rows):
+            _flush(b)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return [spill_dir / f"bucket-{b:04d}.parquet" for b in sorted(writers)]
+
+
+def _bucket_features(path: Path, players_file: Path | None, first_seen_file: Path | None, activation_period,
+                     churn_observation_period, churn_column) -> pd.DataFrame:
+    """버킷 파일 하나로 filter_df_with_names() 를 계산한다 (프로세스 풀 작업 단위)."""
+    df = pq.read_table(path).to_pandas(split_blocks=True)
+    if 'player_id' in df.columns:
+        players = pd.read_parquet(players_file).sort_values('player_id', ignore_index=True)
+        df = data_loader.decode_matches(df, players)
+    first_seen = None
+    if first_seen_file is not None:
+        first_seen = pd.read_parquet(first_seen_file).set_index('name')['first_seen']
+    return data_loader.filter_df_with_names(df, activation_period, churn_observation_period, churn_column,
+                                            first_seen=first_seen)
+
+
+def filter_df_bucketed(data_dir, start_date, end_date, activation_period=7, churn_observation_period=7,
+                       churn_column='played_next_7_days', buckets: int = BUCKETS, workers: int = 1,
+                       spill_dir=None, with_names=False) -> pd.DataFrame:
+    """load_parquet() + filter_df() 를 플레이어 버킷 단위로 나누어 계산한다.
+
+    Args:
+        data_dir: Parquet 디렉토리 경로
+        start_date: 시작 날짜 (yyyy-mm-dd, 포함)
+        end_date: 종료 날짜 (yyyy-mm-dd, 포함)
+        activation_period: 활성 기간 (일)
+        churn_observation_period: 이탈 관찰 기간 (일)
+        churn_column: 이탈 라벨 컬럼명
+        buckets: 버킷 수 (클수록 버킷당 메모리가 작아진다)
+        workers: 버킷을 계산할 프로세스 수 (1 이면 현재 프로세스에서 순서대로 계산)
+        spill_dir: 버킷 파일을 쓸 디렉토리 (None 이면 임시 디렉토리를 만들고 끝나면 지운다)
+        with_names: True 면 filter_df_with_names() 처럼 name 컬럼을 남긴다
+    Returns:
+        filter_df() (with_names=True 이면 filter_df_with_names()) 와 같은 DataFrame
+    """
+    own_spill_dir = spill_dir is None
+    spill_dir = Path(tempfile.mkdtemp(prefix="feature-buckets-")) if own_spill_dir else Path(spill_dir)
+    players_file = data_loader.players_path(data_dir)
+    players_file = players_file if players_file.exists() else None
+    # 레지스트리를 최신 상태로 맞춰 두고 작업마다 파일에서 읽는다
+    first_seen_file = data_loader.first_seen_path(data_dir) if data_loader.load_first_seen(data_dir) is not None \
+        else None
+    try:
+        paths = spill_buckets(data_dir, start_date, end_date, spill_dir, buckets)
+        args = (players_file, first_seen_file, activation_period, churn_observation_period, churn_column)
+        if workers <= 1:
+            results = [_bucket_features(path, *args) for path in tqdm(paths, desc="Buckets")]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_bucket_features, path, *args) for path in paths]
+                results = [future.result() for future in tqdm(futures, desc="Buckets")]
+    finally:
+        if own_spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+    if not results:
+        return pd.DataFrame()
+    result_df = pd.concat(results, ignore_index=True).sort_values('name', ignore_index=True)
+    if not with_names:
+        result_df.drop('name', axis=1, inplace=True)
+    return result_df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="플레이어 해시 버킷 단위 out-of-core 피처 계산")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help=f"Parquet 디렉토리 (기본값: {DATA_DIR})")
+    parser.add_argument("--start-date", default="2015-05-25")
+    parser.add_argument("--end-date", default="2016-10-23")
+    parser.add_argument("--ap", type=int, default=7, help="activation period (일)")
+    parser.add_argument("--cop", type=int, default=7, help="churn observation period (일)")
+    parser.add_argument("--buckets", type=int, default=BUCKETS, help=f"버킷 수 (기본값: {BUCKETS})")
+    parser.add_argument("--workers", type=int, default=1, help="병렬 프로세스 수 (기본값: 1)")
+    parser.add_argument("--output", type=Path, help="결과를 저장할 Parquet 경로")
+    args = parser.parse_args()
+
+    if not args.data_dir.exists():
+        print(f"[ERROR] {args.data_dir}가 없습니다.")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    result_df = filter_df_bucketed(args.data_dir, args.start_date, args.end_date, args.ap, args.cop,
+                                   f"ap_{args.ap}d_and_cop_{args.cop}d", args.buckets, args.workers,
+                                   with_names=True)
+    print(f"{len(result_df):,}명, {time.perf_counter() - started:.2f}s "
+          f"(버킷 {args.buckets}개, 프로세스 {args.workers}개)")
+    if args.output:
+        result_df.to_parquet(args.output, index=False)
+        print(f"저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
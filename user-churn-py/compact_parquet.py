@@ -0,0 +1,173 @@
+"""날짜별 Parquet 파티션 -> 월별 Parquet 파일 컴팩션 스크립트.
+
+data/matches/<yyyy-mm-dd>.parquet 들을 월 단위로 묶어 data/matches_monthly/<yyyy-mm>.parquet 로 다시 쓴다.
+월별 파일 안에서는 하루가 하나의 row group 이 되며, 각 row group 에는 date 컬럼의
+min/max 통계가 기록된다. data_loader.load_parquet() 에 월별 디렉토리를 넘기면 파일명으로
+월을 고르고, 날짜 조건에 맞지 않는 row group 은 통계만 보고 건너뛴다.
+
+기존 날짜별 디렉토리는 그대로 두므로 두 레이아웃 모두 load_parquet() 로 읽을 수 있다.
+
+--by-player 를 주면 대신 (플레이어, date) 순으로 정렬한 레이아웃을 data/matches_by_player/ 에 만든다.
+by_player.parquet 에 정렬된 전체 매치를, player_index.parquet 에 플레이어별 행 범위
+(row_start, row_end)를 기록한다. 피처 계산은 이미 정렬된 순서를 그대로 쓰고,
+한 플레이어의 기록은 data_loader.load_player_history() 로 해당 row group 만 읽어온다.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from data_loader import PLAYER_INDEX_FILENAME, PLAYER_LAYOUT_FILENAME, load_players
+
+
+INPUT_DIR = Path("data/matches")
+OUTPUT_DIR = Path("data/matches_monthly")
+PLAYER_OUTPUT_DIR = Path("data/matches_by_player")
+
+# 플레이어 정렬 레이아웃의 row group 크기 (한 플레이어 조회 시 읽는 최소 단위)
+PLAYER_ROW_GROUP_SIZE = 64 * 1024
+# 월별 파일 스키마 메타데이터에 기록하는 원본 일별 파일 목록 {파일명: mtime_ns}
+SOURCES_METADATA_KEY = b"compact_sources"
+
+
+def _sources(day_files: list[Path]) -> dict:
+    return {f.name: f.stat().st_mtime_ns for f in day_files}
+
+
+def _recorded_sources(out_path: Path) -> dict | None:
+    """월별 파일을 만들 때 기록한 원본 목록. 기록이 없거나 읽을 수 없으면 None."""
+    try:
+        metadata = pq.read_schema(out_path).metadata or {}
+    except (OSError, ValueError):
+        return None
+    raw = metadata.get(SOURCES_METADATA_KEY)
+    return json.loads(raw) if raw is not None else None
+
+
+def _compact_month(month: str, day_files: list[Path], output_dir: Path) -> int:
+    """한 달치 날짜별 파일을 하루 = row group 하나인 월별 파일로 쓰고 레코드 수를 반환한다."""
+    out_path = output_dir / f"{month}.parquet"
+    tmp_path = out_path.with_suffix(".parquet.tmp")
+
+    sources = json.dumps(_sources(day_files)).encode()
+    records = 0
+    writer = None
+    try:
+        for day_file in day_files:
+            table = pq.read_table(day_file)
+            # row group 의 date 범위가 좁아지도록 시간순 정렬
+            table = table.take(pc.sort_indices(table, sort_keys=[("date", "ascending")]))
+            if writer is None:
+                schema = table.schema.with_metadata({**(table.schema.metadata or {}), SOURCES_METADATA_KEY: sources})
+                writer = pq.ParquetWriter(tmp_path, schema, write_statistics=True)
+            writer.write_table(table.cast(writer.schema), row_group_size=max(table.num_rows, 1))
+            records += table.num_rows
+        writer.close()
+        writer = None
+        tmp_path.replace(out_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp_path.unlink(missing_ok=True)
+    return records
+
+
+def compact(input_dir: Path = INPUT_DIR, output_dir: Path = OUTPUT_DIR, force: bool = False) -> None:
+    # 날짜별 파티션(yyyy-mm-dd)만 고른다
+    day_files = sorted(f for f in input_dir.glob("*.parquet") if len(f.stem) == 10)
+    if not day_files:
+        print(f"[ERROR] {input_dir}에 Parquet 파일이 없습니다.")
+        sys.exit(1)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    file_count = 0
+    total_records = 0
+    months = set()
+    for month, group in itertools.groupby(day_files, key=lambda f: f.stem[:7]):
+        group = list(group)
+        months.add(month)
+        out_path = output_dir / f"{month}.parquet"
+        # 월 파일을 만들 때의 원본 목록(파일명, mtime)과 같으면 건너뛴다 (일별 파일 추가/삭제/수정 시 다시 쓴다)
+        if not force and out_path.exists() and _recorded_sources(out_path) == _sources(group):
+            continue
+        records = _compact_month(month, group, output_dir)
+        print(f"{month}: {len(group)}일, {records}건")
+        file_count += 1
+        total_records += records
+
+    # 일별 파일이 하나도 남지 않은 달의 월 파일은 지운다
+    removed = 0
+    for out_path in sorted(output_dir.glob("*.parquet")):
+        if len(out_path.stem) == 7 and out_path.stem not in months:
+            out_path.unlink()
+            print(f"{out_path.stem}: 일별 파일이 없어 삭제")
+            removed += 1
+
+    print(f"\n컴팩션 완료: {file_count}개 월 파일 갱신, {removed}개 삭제, 총 {total_records}건")
+
+
+def build_player_layout(input_dir: Path = INPUT_DIR, output_dir: Path = PLAYER_OUTPUT_DIR,
+                        row_group_size: int = PLAYER_ROW_GROUP_SIZE) -> None:
+    """날짜별 파티션을 (플레이어, date) 순으로 정렬한 단일 파일과 플레이어별 행 범위 인덱스로 다시 쓴다."""
+    day_files = sorted(input_dir.glob("*.parquet"))
+    if not day_files:
+        print(f"[ERROR] {input_dir}에 Parquet 파일이 없습니다.")
+        sys.exit(1)
+
+    table = ds.dataset([str(f) for f in day_files], format="parquet").to_table(use_threads=True)
+    key = "player_id" if "player_id" in table.schema.names else "name"
+    table = table.take(pc.sort_indices(table, sort_keys=[(key, "ascending"), ("date", "ascending")]))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    layout_path = output_dir / PLAYER_LAYOUT_FILENAME
+    tmp_path = layout_path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, row_group_size=row_group_size)
+    tmp_path.replace(layout_path)
+
+    # 같은 키가 이어지는 구간 = 플레이어 한 명의 행 범위
+    keys = table[key].to_numpy()
+    dates = table["date"].to_numpy()
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    row_start = np.r_[0, boundaries]
+    row_end = np.r_[boundaries, len(keys)]
+    index = pd.DataFrame({
+        key: keys[row_start],
+        "row_start": row_start.astype(np.int64),
+        "row_end": row_end.astype(np.int64),
+        "first_date": dates[row_start],
+        "last_date": dates[row_end - 1],
+    })
+    if key == "player_id":
+        names = load_players(input_dir)["name"].to_numpy(dtype=object)
+        index.insert(0, "name", names[index["player_id"].to_numpy()])
+    index.to_parquet(output_dir / PLAYER_INDEX_FILENAME, index=False)
+
+    print(f"플레이어 정렬 레이아웃 완료: {len(index)}명, 총 {table.num_rows}건 -> {output_dir}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="날짜별 Parquet -> 월별 Parquet 컴팩션")
+    parser.add_argument("--input-dir", type=Path, default=INPUT_DIR, help=f"날짜별 파티션 디렉토리 (기본값: {INPUT_DIR})")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help=f"월별 파일 디렉토리 (기본값: {OUTPUT_DIR})")
+    parser.add_argument("--force", action="store_true", help="변경이 없는 월도 다시 쓰기")
+    parser.add_argument("--by-player", action="store_true",
+                        help=f"월별 파일 대신 (플레이어, date) 정렬 레이아웃을 만든다 (기본 출력: {PLAYER_OUTPUT_DIR})")
+    args = parser.parse_args()
+    if args.by_player:
+        output_dir = args.output_dir if args.output_dir != OUTPUT_DIR else PLAYER_OUTPUT_DIR
+        build_player_layout(args.input_dir, output_dir)
+    else:
+        compact(args.input_dir, args.output_dir, args.force)
+
+
+if __name__ == "__main__":
+    main()
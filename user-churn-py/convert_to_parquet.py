@@ -2,27 +2,258 @@
 
 data/origin/ 디렉토리의 JSON 파일들을 읽어 날짜별 Parquet 파일로 변환한다.
 출력 경로: data/matches/<yyyy-mm-dd>.parquet
+
+JSON은 data_loader.iter_load_df()로 배치 단위 스트리밍 처리한다.
+배치마다 날짜별 조각을 data/matches/_staging/<yyyy-mm-dd>/ 에 쓰고,
+마지막에 하루치 조각만 읽어 하나의 파일로 합치므로 메모리 사용량은 배치 크기와
+하루치 데이터 크기로 제한된다.
+
+--workers N 을 주면 JSON 파일 단위 변환과 날짜별 병합을 N개 프로세스로 나누어 실행한다.
+
+변환한 JSON 파일은 data/manifest.json 에 (파일명, 크기, SHA-256, 포함 날짜)로 기록한다.
+다음 실행에서는 새로 추가되거나 내용이 바뀐 JSON 파일만 변환하고, 영향을 받는
+날짜의 Parquet 파일만 이어 쓰거나(새 파일) 다시 만든다(변경/삭제된 파일).
+
+파티션은 data_loader.ENCODED_COLUMNS 의 컴팩트 스키마로 저장한다. 플레이어 이름은
+data/players.parquet 사전(name -> int32 player_id)에 한 번만 기록되며, 사전은 실행 간에
+유지되어 같은 이름은 항상 같은 player_id 를 갖는다.
+
+플레이어별 첫 매치 시각은 첫 접속 레지스트리(data/matches.first_seen.parquet)에 함께 기록한다.
+새 JSON 만 이어 쓴 경우에는 새 조각의 최솟값으로 갱신하고, 다시 만든 날짜가 있으면 전체를 다시 계산한다.
 """
 
 import argparse
+import hashlib
+import json
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-from data_loader import load_df
+import pandas as pd
+
+from compact_parquet import PLAYER_OUTPUT_DIR, build_player_layout
+from data_loader import (build_first_seen, encode_matches, first_seen_path, iter_load_df, load_players,
+                         players_path, update_first_seen)
 
 
 ORIGIN_DIR = Path("data/origin")
 OUTPUT_DIR = Path("data/matches")
+STAGING_DIR = OUTPUT_DIR / "_staging"
+MANIFEST_PATH = Path("data/manifest.json")
+PLAYERS_PATH = players_path(OUTPUT_DIR)
+
+BATCH_SIZE = 200_000
+
+
+def _file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest() -> dict:
+    """data/manifest.json 을 읽어 {JSON 파일명: 항목} dict 를 반환한다. 없으면 빈 dict."""
+    if not MANIFEST_PATH.exists():
+        return {}
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def _save_manifest(files: dict) -> None:
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, ensure_ascii=False, indent=2, sort_keys=True)
+    tmp_path.replace(MANIFEST_PATH)
+
+
+def _describe(json_file: Path, previous: dict | None) -> dict:
+    """JSON 파일의 크기/해시 항목을 만든다. 크기와 수정 시각이 그대로면 이전 해시를 재사용한다."""
+    stat = json_file.stat()
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        sha256 = previous["sha256"]
+    else:
+        sha256 = _file_sha256(json_file)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+
+def _write_fragments(json_file: Path, file_idx: int, batch_size: int,
+                     only_dates: set[str] | None = None) -> tuple[int, list[str]]:
+    """JSON 파일 하나를 스트리밍으로 읽어 날짜별 조각 파일로 기록한다.
+
+    Args:
+        json_file: 변환할 JSON 파일
+        file_idx: 조각 파일명에 붙는 파일 순번 (병합 시 원본 순서 유지용)
+        batch_size: 스트리밍 배치당 레코드 수
+        only_dates: 주어지면 이 날짜들의 조각만 기록한다
+
+    Returns:
+        (기록한 레코드 수, 파일에 포함된 전체 날짜 목록)
+    """
+    records = 0
+    dates = set()
+    for batch_idx, batch in enumerate(iter_load_df(str(json_file), batch_size=batch_size)):
+        date_str = batch["date"].dt.strftime("%Y-%m-%d")
+        for day, group in batch.groupby(date_str, sort=False):
+            dates.add(day)
+            if only_dates is not None and day not in only_dates:
+                continue
+            day_dir = STAGING_DIR / day
+            day_dir.mkdir(parents=True, exist_ok=True)
+            # 파일/배치 순번으로 이름을 붙여 병합 시 원본 순서를 유지한다
+            group.to_parquet(day_dir / f"{file_idx:05d}-{batch_idx:06d}.parquet", index=False)
+            records += len(group)
+    return records, sorted(dates)
+
+
+def _update_player_dictionary() -> None:
+    """조각에 등장한 새 이름에 다음 player_id 를 부여하여 플레이어 사전을 갱신한다."""
+    players = load_players(OUTPUT_DIR)
+    known = set(players["name"])
+    new_names = {}
+    for fragment in sorted(STAGING_DIR.glob("*/*.parquet")):
+        for name in pd.read_parquet(fragment, columns=["name"])["name"].unique():
+            if name not in known and name not in new_names:
+                new_names[name] = len(players) + len(new_names)
+
+    if new_names or not PLAYERS_PATH.exists():
+        added = pd.DataFrame({"name": list(new_names), "player_id": list(new_names.values())})
+        players = pd.concat([players, added], ignore_index=True).astype({"player_id": "int32"})
+        players.to_parquet(PLAYERS_PATH, index=False)
+        print(f"플레이어 사전: 신규 {len(new_names)}명, 전체 {len(players)}명")
+
+
+def _staged_first_matches() -> pd.DataFrame:
+    """조각 파일들에서 플레이어별 첫 매치 시각(name, date)을 모은다."""
+    mins = [pd.read_parquet(f, columns=["name", "date"]).groupby("name", as_index=False)["date"].min()
+            for f in sorted(STAGING_DIR.glob("*/*.parquet"))]
+    if not mins:
+        return pd.DataFrame({"name": pd.Series(dtype=object), "date": pd.Series(dtype="datetime64[us]")})
+    return pd.concat(mins, ignore_index=True)
+
+
+_player_ids_cache: dict = {}
+
+
+def _player_ids() -> pd.Series:
+    """name -> player_id 매핑. 프로세스마다 사전 파일이 바뀌었을 때만 다시 읽는다."""
+    mtime = PLAYERS_PATH.stat().st_mtime_ns
+    if _player_ids_cache.get("mtime") != mtime:
+        players = load_players(OUTPUT_DIR)
+        _player_ids_cache["mtime"] = mtime
+        _player_ids_cache["ids"] = pd.Series(players["player_id"].to_numpy(), index=players["name"].to_numpy())
+    return _player_ids_cache["ids"]
+
+
+def _merge_day(day_dir: Path, append: bool) -> int:
+    """하루치 조각을 합쳐 data/matches/<date>.parquet 로 기록하고 레코드 수를 반환한다.
+
+    append 가 True 이면 기존 파티션 뒤에 조각을 이어 쓰고, 아니면 조각만으로 다시 만든다.
+    """
+    out_path = OUTPUT_DIR / f"{day_dir.name}.parquet"
+    player_ids = _player_ids()
+    dfs = [encode_matches(pd.read_parquet(f), player_ids) for f in sorted(day_dir.glob("*.parquet"))]
+    if append and out_path.exists():
+        dfs.insert(0, pd.read_parquet(out_path))
+    day_df = pd.concat(dfs, ignore_index=True)
+    day_df.to_parquet(out_path, index=False)
+    return len(day_df)
+
 
+def _merge_fragments(rebuild_dates: set[str] | None,
+                     pool: ProcessPoolExecutor | None = None) -> tuple[int, int]:
+    """날짜별 조각을 하루 단위로 합치고 (파일 수, 총 레코드 수)를 반환한다.
 
-def convert(force: bool = False) -> None:
+    rebuild_dates 에 속한 날짜(None 이면 모든 날짜)는 조각만으로 다시 만들고,
+    나머지 날짜는 기존 파티션에 이어 쓴다.
+    """
+    if not STAGING_DIR.exists():
+        return 0, 0
+
+    day_dirs = sorted(p for p in STAGING_DIR.iterdir() if p.is_dir())
+    appends = [rebuild_dates is not None and d.name not in rebuild_dates for d in day_dirs]
+    if pool is None:
+        counts = [_merge_day(d, a) for d, a in zip(day_dirs, appends)]
+    else:
+        counts = list(pool.map(_merge_day, day_dirs, appends))
+
+    shutil.rmtree(STAGING_DIR)
+    return len(counts), sum(counts)
+
+
+def _run_tasks(tasks: list[tuple[Path, int, set[str] | None]], batch_size: int,
+               pool: ProcessPoolExecutor | None) -> dict[str, list[str]]:
+    """(JSON 파일, 순번, 날짜 제한) 변환 작업을 실행하고 {파일명: 포함 날짜} 를 반환한다."""
+    covered = {}
+    if pool is None:
+        for json_file, file_idx, only_dates in tasks:
+            print(f"\n--- {json_file.name} 변환 중 ---")
+            records, dates = _write_fragments(json_file, file_idx, batch_size, only_dates)
+            print(f"{json_file.name}: {records}건")
+            covered[json_file.name] = dates
+    else:
+        futures = {
+            pool.submit(_write_fragments, json_file, file_idx, batch_size, only_dates): json_file
+            for json_file, file_idx, only_dates in tasks
+        }
+        for future in as_completed(futures):
+            records, dates = future.result()
+            print(f"{futures[future].name}: {records}건")
+            covered[futures[future].name] = dates
+    return covered
+
+
+def _update(tasks: list, rebuild_dates: set[str] | None, batch_size: int,
+            pool: ProcessPoolExecutor | None) -> tuple[dict[str, list[str]], int, int]:
+    """변환 작업을 실행하고 영향받는 날짜의 파티션을 갱신한다."""
+    if STAGING_DIR.exists():
+        # 이전 실행이 중단되어 남은 조각은 버린다
+        shutil.rmtree(STAGING_DIR)
+
+    covered = _run_tasks(tasks, batch_size, pool)
+
+    # 다시 만들어야 하는데 남은 JSON 어디에도 없는 날짜는 파티션을 지운다
+    if rebuild_dates:
+        staged = {p.name for p in STAGING_DIR.iterdir()} if STAGING_DIR.exists() else set()
+        for day in rebuild_dates - staged:
+            (OUTPUT_DIR / f"{day}.parquet").unlink(missing_ok=True)
+
+    if STAGING_DIR.exists():
+        _update_player_dictionary()
+
+    # 이어 쓰기만 했다면 새 조각의 플레이어별 첫 매치로 레지스트리를 갱신하고,
+    # 다시 만든 날짜가 있으면(매치가 지워졌을 수 있으므로) 전체를 다시 계산한다
+    incremental = rebuild_dates is not None and not rebuild_dates and first_seen_path(OUTPUT_DIR).exists()
+    new_matches = _staged_first_matches() if incremental else None
+
+    # 날짜별 파티셔닝
+    file_count, total_records = _merge_fragments(rebuild_dates, pool)
+
+    if new_matches is not None:
+        update_first_seen(OUTPUT_DIR, new_matches)
+    else:
+        build_first_seen(OUTPUT_DIR)
+    return covered, file_count, total_records
+
+
+def convert(force: bool = False, batch_size: int = BATCH_SIZE, workers: int = 1,
+            by_player: bool = False, first_seen_only: bool = False) -> None:
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+    if first_seen_only:
+        first_seen = build_first_seen(OUTPUT_DIR)
+        print(f"첫 접속 레지스트리: {len(first_seen)}명 -> {first_seen_path(OUTPUT_DIR)}")
+        return
+
+    manifest = {} if force else load_manifest()
     existing_files = set(OUTPUT_DIR.glob("*.parquet"))
-    if existing_files and not force:
+    if existing_files and not manifest and not force:
+        # manifest 없이 만들어진 Parquet 은 어떤 JSON 에서 왔는지 알 수 없으므로 건드리지 않는다
         print(
-            f"[SKIP] {len(existing_files)}개의 Parquet 파일이 이미 존재합니다. "
-            "덮어쓰려면 --force 플래그를 사용하세요."
+            f"[SKIP] {len(existing_files)}개의 Parquet 파일이 이미 존재하지만 {MANIFEST_PATH}가 없습니다. "
+            "전체를 다시 변환하려면 --force 플래그를 사용하세요."
         )
         sys.exit(0)
 
@@ -34,29 +265,52 @@ def convert(force: bool = False) -> None:
 
     print(f"{len(json_files)}개 JSON 파일 발견: {[f.name for f in json_files]}")
 
-    import pandas as pd
-    dfs = []
-    for json_file in json_files:
-        print(f"\n--- {json_file.name} 로드 중 ---")
-        df = load_df(str(json_file))
-        dfs.append(df)
+    # manifest 와 비교하여 새 파일 / 변경된 파일 / 삭제된 파일을 구분
+    current = {f.name: _describe(f, manifest.get(f.name)) for f in json_files}
+    added = [f for f in json_files if f.name not in manifest]
+    changed = [f for f in json_files
+               if f.name in manifest and manifest[f.name]["sha256"] != current[f.name]["sha256"]]
+    unchanged = [f for f in json_files if f.name in manifest and f not in changed]
+    removed = [name for name in manifest if name not in current]
 
-    combined = pd.concat(dfs, ignore_index=True)
-    print(f"\n전체 레코드: {len(combined)}건")
+    if not added and not changed and not removed:
+        print("[SKIP] 변경된 JSON 파일이 없습니다.")
+        sys.exit(0)
 
-    # 날짜별 파티셔닝
-    combined["date_str"] = combined["date"].dt.strftime("%Y-%m-%d")
+    print(f"새 파일 {len(added)}개, 변경 {len(changed)}개, 삭제 {len(removed)}개")
+
+    # 변경/삭제된 파일이 덮던 날짜는 남아 있는 JSON 들로 다시 만들고, 새 파일의 날짜는 이어 쓴다.
+    # --force 이면 변환되는 모든 날짜를 다시 만든다.
+    rebuild_dates = None if force else set()
+    if rebuild_dates is not None:
+        for name in [f.name for f in changed] + removed:
+            rebuild_dates.update(manifest[name]["dates"])
+
+    file_idx = {f.name: i for i, f in enumerate(json_files)}
+    tasks = [(f, file_idx[f.name], None) for f in added + changed]
+    for f in unchanged:
+        overlap = rebuild_dates.intersection(manifest[f.name]["dates"])
+        if overlap:
+            tasks.append((f, file_idx[f.name], overlap))
+    tasks.sort(key=lambda t: t[1])
 
-    file_count = 0
-    total_records = 0
+    if workers <= 1:
+        covered, file_count, total_records = _update(tasks, rebuild_dates, batch_size, None)
+    else:
+        print(f"\n{workers}개 프로세스로 변환 중...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            covered, file_count, total_records = _update(tasks, rebuild_dates, batch_size, pool)
 
-    for date_str, group in combined.groupby("date_str"):
-        out_path = OUTPUT_DIR / f"{date_str}.parquet"
-        group.drop(columns=["date_str"]).to_parquet(out_path, index=False)
-        file_count += 1
-        total_records += len(group)
+    for f in added + changed:
+        current[f.name]["dates"] = covered[f.name]
+    for f in unchanged:
+        current[f.name]["dates"] = manifest[f.name]["dates"]
+    _save_manifest(current)
 
-    print(f"\n변환 완료: {file_count}개 파일, 총 {total_records}건")
+    print(f"\n변환 완료: {file_count}개 파일 갱신, 총 {total_records}건")
+
+    if by_player:
+        build_player_layout(OUTPUT_DIR, PLAYER_OUTPUT_DIR)
 
 
 def main() -> None:
@@ -64,10 +318,33 @@ def main() -> None:
     parser.add_argument(
         "--force",
         action="store_true",
-        help="기존 Parquet 파일을 덮어쓰기",
+        help="manifest 를 무시하고 모든 JSON 파일을 다시 변환",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"스트리밍 변환 시 배치당 레코드 수 (기본값: {BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="JSON 파일 변환/날짜별 병합에 사용할 프로세스 수 (기본값: 1)",
+    )
+    parser.add_argument(
+        "--by-player",
+        action="store_true",
+        help=f"변환 후 (플레이어, date) 정렬 레이아웃({PLAYER_OUTPUT_DIR})도 다시 만들기",
+    )
+    parser.add_argument(
+        "--first-seen",
+        action="store_true",
+        help=f"변환 없이 기존 파티션으로 첫 접속 레지스트리({first_seen_path(OUTPUT_DIR)})만 다시 만들기",
     )
     args = parser.parse_args()
-    convert(force=args.force)
+    convert(force=args.force, batch_size=args.batch_size, workers=args.workers, by_player=args.by_player,
+            first_seen_only=args.first_seen)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+"""실험 스크립트가 함께 쓰는 교차 검증 실행기.
+
+CVRunner 는 StratifiedKFold 의 fold 인덱스를 한 번만 만들고, fold 별 전처리 결과
+(스케일링, SMOTE 리샘플링)를 전처리 조합마다 한 번만 계산해 둔다. 모델은 fold 마다 한 번만
+학습하고 테스트 fold 의 예측(out-of-fold 예측)을 저장하며, 모든 지표는 저장한 예측에서 계산한다.
+cross_validate / cross_val_score 를 지표마다 따로 부를 때처럼 같은 모델을 다시 학습하지 않는다.
+
+workers > 1 이면 모델 x fold 학습을 프로세스 풀에서 실행한다. 전처리된 행렬은 작업마다 보내지 않고
+프로세스를 띄울 때 한 번만 넘기며, 스레드를 과하게 띄우지 않도록 모델의 n_jobs 는 1로 둔다.
+피처 일부만 쓰는 비교는 columns 로 지정하면 같은 fold 분할과 행렬 캐시를 그대로 쓴다.
+
+사용 예:
+    runner = CVRunner(X, y, n_splits=5, random_state=42)
+    results = runner.run({"KNN": KNeighborsClassifier(n_neighbors=7), "RF": RandomForestClassifier()},
+                         preprocess={"KNN": ("scale",)})
+    results["KNN"].scores["roc_auc"]  # fold 별 AUC 배열
+    runner.run({"RF": RandomForestClassifier()}, columns=["score_mean", "win_rate"])  # 피처 일부만
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, f1_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+
+# 지표 이름 -> (y_true, y_pred, y_score) 로 계산하는 함수. 이름은 sklearn scoring 이름과 같다
+METRICS = {
+    "accuracy": lambda y, pred, score: accuracy_score(y, pred),
+    "roc_auc": lambda y, pred, score: roc_auc_score(y, score),
+    "f1_macro": lambda y, pred, score: f1_score(y, pred, average="macro"),
+    "recall_macro": lambda y, pred, score: recall_score(y, pred, average="macro"),
+}
+
+# 지원하는 전처리 단계 (학습 fold 에만 fit 하고 순서대로 적용한다)
+PREPROCESS_STEPS = ("scale", "smote")
+
+
+class CVResult:
+    """모델 하나의 교차 검증 결과.
+
+    Attributes:
+        scores: 지표 이름 -> fold 별 점수 배열
+        oof_pred: 전체 샘플의 out-of-fold 예측 클래스
+        oof_score: 전체 샘플의 out-of-fold 양성 클래스 점수 (predict_proba 또는 decision_function)
+        fit_seconds: fold 별 학습 시간
+    """
+
+    def __init__(self, scores: dict, oof_pred: np.ndarray, oof_score: np.ndarray, fit_seconds: np.ndarray):
+        self.scores = scores
+        self.oof_pred = oof_pred
+        self.oof_score = oof_score
+        self.fit_seconds = fit_seconds
+
+    def mean(self, metric: str) -> float:
+        return float(self.scores[metric].mean())
+
+    def std(self, metric: str) -> float:
+        return float(self.scores[metric].std())
+
+
+# 작업 프로세스에서 쓰는 전처리 행렬 {(fold, 전처리): (X_train, y_train, X_test)}
+_worker_matrices: dict = {}
+
+
+def _init_worker(matrices: dict) -> None:
+    global _worker_matrices
+    _worker_matrices = matrices
+
+
+def _single_threaded(estimator):
+    # 프로세스 병렬과 겹치지 않도록 모델 자체의 스레드 병렬(n_jobs)은 1로 둔다
+    if "n_jobs" in estimator.get_params(deep=False):
+        return clone(estimator).set_params(n_jobs=1)
+    return estimator
+
+
+def _fit_predict(estimator, key, matrices=None):
+    """fold 하나에서 모델을 학습하고 테스트 fold 의 (예측 클래스, 양성 점수, 학습 시간)을 반환한다."""
+    X_train, y_train, X_test = (_worker_matrices if matrices is None else matrices)[key]
+    model = clone(estimator)
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    if hasattr(model, "predict_proba"):
+        score = model.predict_proba(X_test)[:, 1]
+    else:
+        score = model.decision_function(X_test)
+    return model.predict(X_test), score, fit_seconds
+
+
+class CVRunner:
+    """fold 인덱스와 fold 별 전처리 행렬을 재사용하는 교차 검증 실행기.
+
+    Args:
+        X: 피처 행렬 (DataFrame 또는 2차원 배열)
+        y: 라벨 배열
+        n_splits: fold 수
+        random_state: fold 분할과 SMOTE 의 난수 시드
+        workers: 모델 x fold 학습에 쓸 프로세스 수 (기본값 1: 현재 프로세스에서 순서대로 학습하고 모델의
+            n_jobs 를 그대로 쓴다. None 이면 CPU 수만큼 프로세스를 띄우고 모델의 n_jobs 는 1로 둔다)
+    """
+
+    def __init__(self, X, y, n_splits: int = 5, random_state: int = 42, workers: int | None = 1):
+        self.columns = list(X.columns) if isinstance(X, pd.DataFrame) else None
+        self.X = X.to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=np.float64)
+        self.y = np.ravel(y)
+        self.random_state = random_state
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        self.folds = list(splitter.split(self.X, self.y))
+        self._matrices = {}
+
+    @property
+    def cv(self) -> list:
+        """sklearn 의 cv 인자(RFECV, RandomizedSearchCV 등)에 그대로 넘길 수 있는 (train, test) 인덱스 목록"""
+        return self.folds
+
+    def _column_index(self, columns: tuple) -> list[int]:
+        if self.columns is None:
+            return [int(c) for c in columns]
+        missing = [c for c in columns if c not in self.columns]
+        if missing:
+            raise ValueError(f"없는 피처: {missing}")
+        return [self.columns.index(c) for c in columns]
+
+    def matrices(self, fold: int, preprocess=(), columns=None) -> tuple:
+        """fold 의 (X_train, y_train, X_test) 를 전처리해 반환한다. 같은 조합은 한 번만 계산한다.
+
+        columns 가 주어지면 그 피처(DataFrame 이면 컬럼 이름, 배열이면 위치)만 남긴 뒤 전처리한다.
+        """
+        preprocess = tuple(preprocess)
+        columns = None if columns is None else tuple(columns)
+        key = (fold, preprocess, columns)
+        if key in self._matrices:
+            return self._matrices[key]
+        unknown = [step for step in preprocess if step not in PREPROCESS_STEPS]
+        if unknown:
+            raise ValueError(f"지원하지 않는 전처리: {unknown}")
+
+        if preprocess:
+            X_train, y_train, X_test = self.matrices(fold, preprocess[:-1], columns)
+            step = preprocess[-1]
+            if step == "scale":
+                scaler = StandardScaler().fit(X_train)
+                X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+            else:
+                from imblearn.over_sampling import SMOTE
+                X_train, y_train = SMOTE(random_state=self.random_state).fit_resample(X_train, y_train)
+        elif columns is not None:
+            # 전체 피처의 fold 행렬에서 열만 고른다
+            X_train, y_train, X_test = self.matrices(fold)
+            index = self._column_index(columns)
+            X_train, X_test = X_train[:, index], X_test[:, index]
+        else:
+            train_idx, test_idx = self.folds[fold]
+            X_train, y_train, X_test = self.X[train_idx], self.y[train_idx], self.X[test_idx]
+        self._matrices[key] = (X_train, y_train, X_test)
+        return self._matrices[key]
+
+    def run(self, models: dict, preprocess: dict | None = None,
+            metrics=("accuracy", "roc_auc", "f1_macro"), columns=None) -> dict:
+        """여러 모델을 모든 fold 에서 한 번씩 학습하고 지표를 계산한다.
+
+        Args:
+            models: 모델 이름 -> sklearn 호환 estimator (fold 마다 clone 해서 학습한다)
+            preprocess: 모델 이름 -> 전처리 단계 튜플 (예: ("scale",), ("scale", "smote")). 없으면 전처리 없음
+            metrics: 계산할 지표 이름 (METRICS 의 키)
+            columns: 학습에 쓸 피처 목록 (None 이면 전체). fold 분할은 전체 피처와 같다
+        Returns:
+            모델 이름 -> CVResult
+        """
+        preprocess = preprocess or {}
+        columns = None if columns is None else tuple(columns)
+        tasks = [(name, fold, (fold, tuple(preprocess.get(name, ())), columns))
+                 for name in models for fold in range(len(self.folds))]
+        needed = {key: self.matrices(*key) for _, _, key in tasks}
+
+        if self.workers > 1:
+            models = {name: _single_threaded(model) for name, model in models.items()}
+        if self.workers <= 1:
+            outputs = [_fit_predict(models[name], key, needed) for name, _, key in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)), initializer=_init_worker,
+                                     initargs=(needed,)) as pool:
+                futures = [pool.submit(_fit_predict, models[name], key) for name, _, key in tasks]
+                outputs = [future.result() for future in futures]
+
+        results = {}
+        for name in models:
+            oof_pred = np.zeros_like(self.y)
+            oof_score = np.zeros(len(self.y), dtype=np.float64)
+            scores = {metric: np.zeros(len(self.folds)) for metric in metrics}
+            fit_seconds = np.zeros(len(self.folds))
+            for (task_name, fold, _), (pred, score, seconds) in zip(tasks, outputs):
+                if task_name != name:
+                    continue
+                test_idx = self.folds[fold][1]
+                oof_pred[test_idx] = pred
+                oof_score[test_idx] = score
+                fit_seconds[fold] = seconds
+                for metric in metrics:
+                    scores[metric][fold] = METRICS[metric](self.y[test_idx], pred, score)
+            results[name] = CVResult(scores, oof_pred, oof_score, fit_seconds)
+        return results
@@ -1,54 +1,235 @@
+import hashlib
 import json
+import os
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import datetime
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from tqdm import tqdm
 
+import segment_features
 
-def load_df(filename):
-    ##  날짜 / 플레이어 이름 / 승패 / flair(0 또는 1) / degree / score / point
-    with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+# load_df() / load_parquet() 가 반환하는 원본 매치 테이블의 컬럼 순서
+LOAD_DF_COLUMNS = ["name", "team", "flair", "score", "points", "degree", "auth", "date", "win"]
 
-    dataframes = []
+# convert_to_parquet 가 기록하는 컴팩트 스키마의 컬럼 순서.
+# player_id 는 data/players.parquet 사전(name -> int32)의 코드이고,
+# win 은 int8 코드(0: 패, 1: 무, 2: 승 = 원래 값 x 2)로 저장한다.
+ENCODED_COLUMNS = ["player_id", "team", "flair", "score", "points", "degree", "auth", "date", "win"]
+PLAYERS_FILENAME = "players.parquet"
 
-    for key, json_data in tqdm(data.items(), desc='Reading JSON', unit=' keys'):
-        # JSON 데이터를 데이터프레임으로 변환
-        df = pd.DataFrame(json_data['players'])
+# filter_df() / filter_df_with_names() 가 실제로 사용하는 원본 컬럼
+FEATURE_SOURCE_COLUMNS = ["name", "date", "win", "score", "points", "degree"]
+TEAM_CATEGORIES = ["Blue", "Red"]
 
-        # Unix 시간을 datetime 객체로 변환
-        date = json_data['date']
+# compact_parquet.py --by-player 가 만드는 (플레이어, date) 정렬 레이아웃의 파일 이름
+PLAYER_LAYOUT_FILENAME = "by_player.parquet"
+PLAYER_INDEX_FILENAME = "player_index.parquet"
 
-        # 필요한 열만 선택
-        df = df[['name', 'team', 'flair', 'score', 'points', 'degree', 'auth']]
-        df['date'] = datetime.datetime.utcfromtimestamp(date)
+# load_features() 가 피처 프레임을 저장하는 디렉토리 (data/matches 와 같은 위치의 feature_cache/).
+# 피처 계산 코드(filter_df_with_names, segment_features)를 바꾸면 FEATURE_VERSION 을 올려 기존 캐시를 무효화한다.
+FEATURE_CACHE_DIRNAME = "feature_cache"
+FEATURE_VERSION = 1
 
-        # team 열의 값을 Red 또는 Blue로 변환
-        df['team'] = df['team'].apply(lambda x: 'Red' if x == 1 else 'Blue')
 
-        # 승패 정보를 계산하여 추가
-        red_score = json_data['teams'][0]['score']
-        blue_score = json_data['teams'][1]['score']
-        if red_score == blue_score:
-            df['win'] = 0.5
-        else:
-            winning_team = 'Red' if red_score > blue_score else 'Blue'
-            df['win'] = (df['team'] == winning_team).astype(int)
+def iter_matches(filename, chunk_size=1 << 20):
+    """bulkmatches JSON을 한 번에 올리지 않고 (key, match) 쌍을 순서대로 하나씩 반환한다.
 
-        # flair 열 변환
-        df['flair'] = df['flair'].apply(lambda x: 0 if x == 0 else 1)
+    최상위 객체를 chunk_size 문자 단위로 읽어가며 키/값을 하나씩 디코딩하므로
+    메모리 사용량은 파일 크기가 아니라 가장 큰 매치 하나의 크기에 비례한다.
 
-        # df['auth'] = df['auth'].astype(int)
-        df = df[df['auth']]
+    Args:
+        filename: bulkmatches JSON 파일 경로
+        chunk_size: 한 번에 읽어들일 문자 수
 
-        dataframes.append(df)
+    Yields:
+        (매치 키, 매치 dict) 튜플
+    """
+    decoder = json.JSONDecoder()
 
-    # dataframes 리스트에 있는 모든 데이터프레임을 수직으로 연결하여 하나의 데이터프레임으로 만듭니다.
-    combined_df = pd.concat(dataframes, ignore_index=True)
+    with open(filename, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        eof = not buf
+
+        def _skip_ws(i):
+            while i < len(buf) and buf[i] in ' \t\r\n':
+                i += 1
+            return i
+
+        def _fill():
+            # 처리한 앞부분을 버리고 다음 청크를 이어 붙인다
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            buf = buf[pos:] + chunk
+            pos = 0
+            eof = not chunk
+
+        # 최상위 '{' 탐색
+        while True:
+            pos = _skip_ws(pos)
+            if pos < len(buf) or eof:
+                break
+            _fill()
+        if pos >= len(buf):
+            return
+        if buf[pos] != '{':
+            raise ValueError(f'{filename}: 최상위 JSON 객체가 아닙니다')
+        pos += 1
+
+        expect_key = True
+        while True:
+            pos = _skip_ws(pos)
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError(f'{filename}: JSON 객체가 닫히지 않았습니다')
+                _fill()
+                continue
+
+            ch = buf[pos]
+            if ch == '}':
+                return
+            if not expect_key:
+                if ch != ',':
+                    raise ValueError(f'{filename}: 매치 사이에 ","가 없습니다 (위치 {pos})')
+                pos += 1
+                expect_key = True
+                continue
+
+            # key : value 한 쌍을 디코딩하고, 버퍼가 모자라면 더 읽어서 재시도
+            try:
+                key, end = decoder.raw_decode(buf, pos)
+                end = _skip_ws(end)
+                if end >= len(buf):
+                    raise json.JSONDecodeError('incomplete', buf, end)
+                if buf[end] != ':':
+                    raise ValueError(f'{filename}: 키 다음에 ":"가 없습니다 (위치 {end})')
+                value, end = decoder.raw_decode(buf, _skip_ws(end + 1))
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                _fill()
+                continue
+
+            pos = end
+            expect_key = False
+            yield key, value
+
+
+class MatchTableBuilder:
+    """여러 매치의 플레이어 레코드를 평탄한 컬럼 버퍼에 모았다가 한 번에 DataFrame으로 만든다.
+
+    매치마다 DataFrame을 만들고 pd.concat 하는 대신, 플레이어 값은 리스트 버퍼에,
+    매치 단위 값(시각, 팀 점수)은 매치 배열에 쌓아 두고 build() 시점에
+    team / win / flair / date 를 NumPy 배열 연산으로 한 번에 계산한다.
+    """
+
+    _PLAYER_FIELDS = ('name', 'team', 'flair', 'score', 'points', 'degree', 'auth')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._players = {field: [] for field in self._PLAYER_FIELDS}
+        self._match_date = []
+        self._match_red_score = []
+        self._match_blue_score = []
+        self._match_size = []
+
+    def __len__(self):
+        """인증 여부와 관계없이 버퍼에 쌓인 플레이어 레코드 수"""
+        return len(self._players['name'])
+
+    def add(self, json_data):
+        players = json_data['players']
+        for field in self._PLAYER_FIELDS:
+            self._players[field].extend([p[field] for p in players])
+        self._match_date.append(json_data['date'])
+        self._match_red_score.append(json_data['teams'][0]['score'])
+        self._match_blue_score.append(json_data['teams'][1]['score'])
+        self._match_size.append(len(players))
+
+    def build(self):
+        """버퍼의 내용을 load_df()와 동일한 스키마의 DataFrame 하나로 만든다."""
+        size = np.asarray(self._match_size, dtype=np.int64)
+
+        # 매치 단위 값을 플레이어 행으로 펼친다
+        date = np.repeat(np.asarray(self._match_date, dtype='datetime64[s]'), size).astype('datetime64[us]')
+        red_score = np.repeat(np.asarray(self._match_red_score), size)
+        blue_score = np.repeat(np.asarray(self._match_blue_score), size)
+
+        # team 코드(1: Red, 그 외: Blue)와 팀 점수로 승패 계산, 무승부는 0.5
+        is_red = np.asarray(self._players['team']) == 1
+        win = np.where(red_score == blue_score, 0.5, (is_red == (red_score > blue_score)).astype(np.float64))
+
+        auth = np.asarray(self._players['auth'], dtype=bool)
+
+        df = pd.DataFrame({
+            'name': np.asarray(self._players['name'], dtype=object),
+            'team': np.where(is_red, 'Red', 'Blue').astype(object),
+            'flair': (np.asarray(self._players['flair']) != 0).astype(np.int64),
+            'score': np.asarray(self._players['score'], dtype=np.int64),
+            'points': np.asarray(self._players['points'], dtype=np.int64),
+            'degree': np.asarray(self._players['degree'], dtype=np.int64),
+            'auth': auth,
+            'date': date,
+            'win': win,
+        })
+        return df[auth].reset_index(drop=True)
+
+
+def iter_load_df(filename, batch_size=100_000):
+    """bulkmatches JSON을 스트리밍으로 읽어 batch_size 행 단위의 DataFrame을 순서대로 반환한다.
+
+    각 배치는 load_df()와 동일한 스키마이며, 마지막 배치만 batch_size보다 작을 수 있다.
+    전체 파일을 메모리에 올리지 않으므로 수 GB 덤프도 일정한 메모리로 처리할 수 있다.
+
+    Args:
+        filename: bulkmatches JSON 파일 경로
+        batch_size: 배치당 레코드(플레이어-매치) 수
+
+    Yields:
+        load_df()와 동일한 스키마의 DataFrame
+    """
+    builder = MatchTableBuilder()
+    carry = pd.DataFrame()
+
+    for _, json_data in tqdm(iter_matches(filename), desc='Reading JSON', unit=' keys'):
+        builder.add(json_data)
+        if len(builder) + len(carry) < batch_size:
+            continue
+
+        combined = builder.build()
+        builder.clear()
+        if len(carry):
+            combined = pd.concat([carry, combined], ignore_index=True)
+        while len(combined) >= batch_size:
+            yield combined.iloc[:batch_size].reset_index(drop=True)
+            combined = combined.iloc[batch_size:]
+        # 남은 행은 다음 배치 앞에 붙인다
+        carry = combined.reset_index(drop=True)
+
+    tail = builder.build()
+    if len(carry):
+        tail = pd.concat([carry, tail], ignore_index=True)
+    if len(tail):
+        yield tail
+
+
+def load_df(filename):
+    ##  날짜 / 플레이어 이름 / 승패 / flair(0 또는 1) / degree / score / point
+    # 모든 매치를 컬럼 버퍼에 모은 뒤 마지막에 한 번만 테이블로 만든다
+    builder = MatchTableBuilder()
+    for _, json_data in tqdm(iter_matches(filename), desc='Reading JSON', unit=' keys'):
+        builder.add(json_data)
+    combined_df = builder.build()
 
     ## 결과 데이터프레임 출력
     print(combined_df)
@@ -58,19 +239,254 @@ def load_df(filename):
     return combined_df
 
 
-def load_parquet(data_dir: str, start_date: str, end_date: str) -> pd.DataFrame:
+def players_path(data_dir) -> Path:
+    """매치 디렉토리(data/matches)에 대응하는 플레이어 사전 경로(data/players.parquet)"""
+    return Path(data_dir).parent / PLAYERS_FILENAME
+
+
+def load_players(data_dir) -> pd.DataFrame:
+    """플레이어 사전(name, player_id)을 player_id 순서로 반환한다. 없으면 빈 DataFrame."""
+    path = players_path(data_dir)
+    if not path.exists():
+        return pd.DataFrame({'name': pd.Series(dtype=object), 'player_id': pd.Series(dtype=np.int32)})
+    return pd.read_parquet(path).sort_values('player_id', ignore_index=True)
+
+
+def encode_matches(df: pd.DataFrame, player_ids: pd.Series) -> pd.DataFrame:
+    """load_df() 스키마의 DataFrame을 컴팩트 스키마로 변환한다.
+
+    Args:
+        df: load_df() 스키마의 DataFrame
+        player_ids: name -> player_id 매핑 Series (df의 모든 이름을 포함해야 한다)
+
+    Returns:
+        ENCODED_COLUMNS 스키마의 DataFrame
+    """
+    return pd.DataFrame({
+        'player_id': player_ids.loc[df['name']].to_numpy(dtype=np.int32),
+        'team': pd.Categorical(df['team'], categories=TEAM_CATEGORIES),
+        'flair': df['flair'].to_numpy(dtype=np.int8),
+        'score': df['score'].to_numpy(dtype=np.int32),
+        'points': df['points'].to_numpy(dtype=np.int32),
+        'degree': df['degree'].to_numpy(dtype=np.int32),
+        'auth': df['auth'].to_numpy(dtype=np.int8),
+        'date': df['date'].to_numpy(),
+        'win': (df['win'].to_numpy() * 2).astype(np.int8),
+    })
+
+
+def decode_matches(df: pd.DataFrame, players: pd.DataFrame) -> pd.DataFrame:
+    """컴팩트 스키마의 DataFrame을 load_df() 스키마(name, float win, bool auth)로 되돌린다.
+
+    정수 컬럼은 컴팩트 dtype(int8/int32)과 categorical team 을 그대로 유지한다.
+    """
+    out = df.drop(columns=['player_id'], errors='ignore')
+    if 'player_id' in df.columns:
+        # player_id 는 0부터 연속된 값이므로 이름 배열에서 바로 꺼낸다
+        names = pa.array(players['name'], type=pa.string())
+        out.insert(0, 'name', names.take(pa.array(df['player_id'].to_numpy())).to_pandas())
+    if 'win' in out.columns:
+        out['win'] = out['win'].to_numpy() / 2
+    if 'auth' in out.columns:
+        out['auth'] = out['auth'].astype(bool)
+    return out
+
+
+def first_seen_path(data_dir) -> Path:
+    """매치 디렉토리(data/matches)에 대응하는 첫 접속 레지스트리 경로(data/matches.first_seen.parquet)"""
+    return Path(data_dir).with_suffix('.first_seen.parquet')
+
+
+def _save_first_seen(first_seen: pd.Series, data_dir) -> None:
+    """name -> 첫 매치 시각 Series 를 현재 partition_fingerprint() 와 함께 저장한다."""
+    first_seen = first_seen.sort_index()
+    table = pa.table({'name': pa.array(first_seen.index.to_numpy(dtype=object), type=pa.string()),
+                      'first_seen': first_seen.to_numpy()})
+    table = table.replace_schema_metadata({b'partition_fingerprint': partition_fingerprint(data_dir).encode()})
+    path = first_seen_path(data_dir)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path)
+    tmp_path.replace(path)
+
+
+def build_first_seen(data_dir) -> pd.Series:
+    """모든 파티션을 훑어 플레이어별 첫 매치 시각 레지스트리를 다시 만들고 반환한다.
+
+    name(또는 player_id) 과 date 컬럼만 읽어 Arrow 에서 플레이어별 최솟값을 구한다.
+
+    Args:
+        data_dir: Parquet 디렉토리 경로
+    Returns:
+        name 을 인덱스로 하는 첫 매치 시각 Series (이름 순)
+    """
+    files = partition_files(Path(data_dir), pd.Timestamp.min, pd.Timestamp.max)
+    if not files:
+        first_seen_path(data_dir).unlink(missing_ok=True)
+        return pd.Series(dtype='datetime64[us]', index=pd.Index([], name='name', dtype=object), name='first_seen')
+    dataset = ds.dataset([str(f) for f in files], format='parquet')
+    key = 'player_id' if 'player_id' in dataset.schema.names else 'name'
+    table = dataset.to_table(columns=[key, 'date'], use_threads=True).group_by(key).aggregate([('date', 'min')])
+    first_df = table.to_pandas()
+    if key == 'player_id':
+        first_df = decode_matches(first_df, load_players(data_dir))
+    first_seen = pd.Series(first_df['date_min'].to_numpy(), index=pd.Index(first_df['name'], name='name'),
+                           name='first_seen').sort_index()
+    _save_first_seen(first_seen, data_dir)
+    return first_seen
+
+
+def update_first_seen(data_dir, df: pd.DataFrame) -> None:
+    """새로 추가된 매치(name, date)로 첫 접속 레지스트리를 갱신한다 (convert_to_parquet 가 사용).
+
+    기존 값과 새 매치의 플레이어별 최솟값 중 이른 쪽을 남긴다. 레지스트리가 없으면 전체를 새로 만든다.
+    매치가 지워지거나 바뀐 경우에는 최솟값이 늦어질 수 있으므로 build_first_seen() 을 쓴다.
+    """
+    path = first_seen_path(data_dir)
+    if not path.exists():
+        build_first_seen(data_dir)
+        return
+    existing = pd.read_parquet(path).set_index('name')['first_seen']
+    added = df.groupby('name')['date'].min()
+    first_seen = pd.concat([existing, added.astype(existing.dtype)]).groupby(level=0).min()
+    first_seen.index.name = 'name'
+    _save_first_seen(first_seen.rename('first_seen'), data_dir)
+
+
+def load_first_seen(data_dir) -> pd.Series | None:
+    """플레이어별 첫 매치 시각 레지스트리를 읽는다.
+
+    레지스트리가 없거나 파티션이 바뀌었으면(fingerprint 불일치) 먼저 다시 만든다.
+    파티션이 하나도 없으면 None 을 반환한다.
+
+    Returns:
+        name 을 인덱스로 하는 첫 매치 시각 Series
+    """
+    if not partition_files(Path(data_dir), pd.Timestamp.min, pd.Timestamp.max):
+        return None
+    path = first_seen_path(data_dir)
+    if path.exists():
+        meta = pq.read_schema(path).metadata or {}
+        if meta.get(b'partition_fingerprint') == partition_fingerprint(data_dir).encode():
+            return pd.read_parquet(path).set_index('name')['first_seen']
+    return build_first_seen(data_dir)
+
+
+def snapshot_path(data_dir) -> Path:
+    """매치 디렉토리(data/matches)에 대응하는 Arrow IPC 스냅샷 경로(data/matches.arrow)"""
+    return Path(data_dir).with_suffix('.arrow')
+
+
+def partition_fingerprint(data_dir) -> str:
+    """파티션 파일들의 (이름, 크기, 수정 시각)으로 만든 해시. 파티션이 바뀌면 값이 달라진다.
+
+    partition_files() 가 고르는 데이터 파일만 본다 (player_index.parquet 같은 보조 파일은 제외).
+    """
+    digest = hashlib.sha256()
+    for f in partition_files(Path(data_dir), pd.Timestamp.min, pd.Timestamp.max):
+        stat = f.stat()
+        digest.update(f"{f.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def build_snapshot(data_dir) -> Path:
+    """모든 파티션을 하나의 Arrow IPC 파일로 합쳐 저장하고 경로를 반환한다.
+
+    스키마 메타데이터에 partition_fingerprint() 값과 date 의 최소/최대를 기록한다.
+    압축하지 않고 저장하므로 open_snapshot() 에서 메모리 매핑한 버퍼를 그대로 쓸 수 있다.
+    """
+    files = partition_files(Path(data_dir), pd.Timestamp.min, pd.Timestamp.max)
+    table = ds.dataset([str(f) for f in files], format='parquet').to_table(use_threads=True)
+    date_min, date_max = pc.min_max(table['date']).values()
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({
+        b'partition_fingerprint': partition_fingerprint(data_dir).encode(),
+        b'date_min': str(date_min).encode(),
+        b'date_max': str(date_max).encode(),
+    })
+    table = table.replace_schema_metadata(metadata)
+
+    path = snapshot_path(data_dir)
+    # 다른 프로세스가 매핑 중인 기존 파일은 그대로 두고 새 파일로 교체한다
+    tmp_path = path.with_suffix(f'.arrow.{os.getpid()}.tmp')
+    try:
+        with pa.OSFile(str(tmp_path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return path
+
+
+def open_snapshot(data_dir) -> pa.Table | None:
+    """Arrow IPC 스냅샷을 메모리 매핑하여 zero-copy Table 로 연다.
+
+    스냅샷이 없거나 파티션이 바뀌었으면(fingerprint 불일치) 먼저 다시 만든다.
+    여러 프로세스가 같은 파일을 매핑하면 OS 페이지 캐시를 공유한다.
+    파티션이 하나도 없으면 None 을 반환한다.
+    """
+    if not partition_files(Path(data_dir), pd.Timestamp.min, pd.Timestamp.max):
+        return None
+
+    path = snapshot_path(data_dir)
+    fingerprint = partition_fingerprint(data_dir).encode()
+    if path.exists():
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        if (table.schema.metadata or {}).get(b'partition_fingerprint') == fingerprint:
+            return table
+    build_snapshot(data_dir)
+    return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+
+
+def partition_files(dir_path: Path, start: pd.Timestamp, end: pd.Timestamp) -> list[Path]:
+    """파일명만 비교하여 날짜 범위에 걸치는 파티션 파일을 고른다.
+
+    날짜별 파일(yyyy-mm-dd)과 compact_parquet.py 가 만든 월별 파일(yyyy-mm)을 모두 지원한다.
+    월별 파일은 범위와 겹치는 달을 고르고, 세부 날짜는 row group 통계로 거른다.
+    플레이어 정렬 레이아웃은 단일 파일이므로 그대로 반환하고, 날짜는 행 조건으로 거른다.
+    """
+    if (dir_path / PLAYER_LAYOUT_FILENAME).exists():
+        return [dir_path / PLAYER_LAYOUT_FILENAME]
+
+    start_str = start.strftime('%Y-%m-%d')
+    end_str = end.strftime('%Y-%m-%d')
+    files = []
+    for f in sorted(dir_path.glob("*.parquet")):
+        if len(f.stem) == 7:
+            if start_str[:7] <= f.stem <= end_str[:7]:
+                files.append(f)
+        elif start_str <= f.stem <= end_str:
+            files.append(f)
+    return files
+
+
+def load_parquet(data_dir: str, start_date: str, end_date: str, decode: bool = True,
+                 columns: list[str] | None = None, players=None, auth: bool | None = None,
+                 snapshot: bool = False) -> pd.DataFrame:
     """날짜 범위에 해당하는 Parquet 파일만 로드하여 DataFrame을 반환한다.
 
+    범위에 속하는 파티션을 하나의 pyarrow dataset 으로 묶어 한 번에 스캔한다.
+    컬럼 선택과 행 조건(날짜 범위, 플레이어, auth)은 Parquet 리더로 내려보내고,
+    파일은 스레드로 병렬로 읽는다. 월별로 컴팩션된 디렉토리(compact_parquet.py)는
+    date 통계로 범위 밖 row group 을 건너뛴다.
+
     Args:
-        data_dir: Parquet 파일이 저장된 디렉토리 경로 (예: "data/matches")
+        data_dir: Parquet 파일이 저장된 디렉토리 경로 (예: "data/matches", "data/matches_monthly")
         start_date: 시작 날짜 (yyyy-mm-dd, 포함)
         end_date: 종료 날짜 (yyyy-mm-dd, 포함)
+        decode: 컴팩트 스키마 파티션일 때 player_id/win 코드를 name/float win 으로 되돌릴지 여부.
+            False 이면 ENCODED_COLUMNS 스키마를 그대로 반환한다.
+        columns: 읽을 컬럼 목록 (None 이면 전체). decode=True 이면 load_df() 컬럼 이름으로 지정한다.
+        players: 주어지면 이 플레이어 이름들의 레코드만 읽는다
+        auth: 주어지면 auth 값이 같은 레코드만 읽는다
+        snapshot: True 이면 Parquet 대신 Arrow IPC 스냅샷(open_snapshot)을 메모리 매핑하여 읽는다
 
     Returns:
-        load_df()와 동일한 스키마의 DataFrame.
+        load_df()와 동일한 컬럼의 DataFrame (decode=False 이면 컴팩트 스키마).
+        예전 형식(name 컬럼)으로 저장된 파티션은 decode 와 관계없이 그대로 반환한다.
         해당 범위에 파일이 없으면 빈 DataFrame을 반환한다.
     """
-    columns = ["name", "team", "flair", "score", "points", "degree", "auth", "date", "win"]
+    if columns is None:
+        columns = LOAD_DF_COLUMNS if decode else ENCODED_COLUMNS
 
     dir_path = Path(data_dir)
     if not dir_path.exists():
@@ -78,29 +494,213 @@ def load_parquet(data_dir: str, start_date: str, end_date: str) -> pd.DataFrame:
 
     start = pd.Timestamp(start_date)
     end = pd.Timestamp(end_date)
+    range_start = start.to_pydatetime()
+    range_end = (end + pd.Timedelta(days=1)).to_pydatetime()
+
+    # 날짜 범위 조건 (end_date 는 그날 하루 전체를 포함)
+    condition = (pc.field('date') >= range_start) & (pc.field('date') < range_end)
+
+    if snapshot:
+        table = open_snapshot(data_dir)
+        if table is None:
+            return pd.DataFrame(columns=columns)
+        dataset = ds.dataset(table)
+        # 스냅샷 전체가 범위 안이면 날짜 조건을 생략하여 zero-copy 를 유지한다
+        meta = table.schema.metadata or {}
+        if b'date_min' in meta and start <= pd.Timestamp(meta[b'date_min'].decode()) \
+                and pd.Timestamp(meta[b'date_max'].decode()) < range_end:
+            condition = pc.scalar(True)
+    else:
+        files = partition_files(dir_path, start, end)
+        if not files:
+            return pd.DataFrame(columns=columns)
+        dataset = ds.dataset([str(f) for f in files], format='parquet')
+    encoded = 'player_id' in dataset.schema.names
+
+    if auth is not None:
+        condition &= pc.field('auth') == (int(auth) if encoded else bool(auth))
+
+    if players is not None:
+        players = list(players)
+        if encoded:
+            player_table = load_players(data_dir)
+            ids = player_table.loc[player_table['name'].isin(players), 'player_id']
+            condition &= pc.field('player_id').isin(pa.array(ids.to_numpy(), type=pa.int32()))
+        else:
+            condition &= pc.field('name').isin(pa.array(players, type=pa.string()))
+
+    read_columns = [('player_id' if c == 'name' and encoded else c) for c in columns]
+    table = dataset.to_table(columns=read_columns, filter=condition, use_threads=True)
+    # 결측이 없는 숫자 컬럼은 Arrow 버퍼를 복사하지 않고 그대로 사용
+    combined = table.to_pandas(split_blocks=True)
+    if decode and encoded:
+        combined = decode_matches(combined, load_players(data_dir))
+    return combined
 
-    files = []
-    for f in sorted(dir_path.glob("*.parquet")):
-        # 파일명에서 날짜 추출 (예: 2015-05-25.parquet -> 2015-05-25)
-        file_date = pd.Timestamp(f.stem)
-        if start <= file_date <= end:
-            files.append(f)
 
-    if not files:
-        return pd.DataFrame(columns=columns)
+def load_cohort(data_dir, cohort_start: str, cohort_end: str, activation_period=7, churn_observation_period=7,
+                columns: list[str] | None = None, snapshot: bool = False) -> tuple[pd.DataFrame, pd.Series]:
+    """첫 접속이 [cohort_start, cohort_end] 에 있는 플레이어(코호트)의 매치만 읽는다.
+
+    첫 접속 레지스트리(load_first_seen)로 코호트를 정하고, 첫 접속일부터 마지막 플레이어의
+    첫 접속 + AP + COP 까지의 파티션에서 코호트 플레이어의 행만 읽는다.
+    기간 앞쪽의 이력을 훑어 첫 접속을 다시 계산하지 않는다.
+
+    Args:
+        data_dir: Parquet 디렉토리 경로
+        cohort_start: 코호트 첫 접속 시작 날짜 (yyyy-mm-dd, 포함)
+        cohort_end: 코호트 첫 접속 종료 날짜 (yyyy-mm-dd, 포함)
+        activation_period: 활성 기간 (일)
+        churn_observation_period: 이탈 관찰 기간 (일)
+        columns: 읽을 컬럼 목록 (None 이면 전체)
+        snapshot: True 이면 Arrow IPC 스냅샷에서 읽는다
+    Returns:
+        (매치 DataFrame, 코호트 플레이어의 첫 접속 시각 Series).
+        두 번째 값은 filter_df(first_seen=...) 에 그대로 넘길 수 있다.
+    """
+    first_seen = load_first_seen(data_dir)
+    if first_seen is None:
+        return pd.DataFrame(columns=columns or LOAD_DF_COLUMNS), pd.Series(dtype='datetime64[us]', name='first_seen')
+
+    start = pd.Timestamp(cohort_start)
+    end = pd.Timestamp(cohort_end) + pd.Timedelta(days=1)
+    cohort = first_seen[(first_seen >= start) & (first_seen < end)]
+    last_day = pd.Timestamp(cohort_end) + pd.Timedelta(days=activation_period + churn_observation_period)
+    df = load_parquet(data_dir, str(start.date()), str(last_day.date()), columns=columns,
+                      players=cohort.index, snapshot=snapshot)
+    return df, cohort
 
-    dfs = [pd.read_parquet(f) for f in files]
-    combined = pd.concat(dfs, ignore_index=True)
-    return combined
 
+def load_player_history(data_dir, name: str, decode: bool = True) -> pd.DataFrame:
+    """플레이어 정렬 레이아웃(compact_parquet.py --by-player)에서 한 플레이어의 매치 기록을 읽는다.
+
+    player_index.parquet 의 행 범위로 해당 row group 만 읽어 잘라내므로 전체 테이블을 훑지 않는다.
+
+    Args:
+        data_dir: 플레이어 정렬 레이아웃 디렉토리 (예: "data/matches_by_player")
+        name: 플레이어 이름
+        decode: 컴팩트 스키마일 때 name/float win 으로 되돌릴지 여부
 
-def filter_df(df, activation_period=7, churn_observation_period=7, churn_column='played_next_7_days'):
-    result = filter_df_with_names(df, activation_period, churn_observation_period, churn_column)
+    Returns:
+        date 순으로 정렬된 해당 플레이어의 매치 DataFrame (없으면 빈 DataFrame)
+    """
+    dir_path = Path(data_dir)
+    index = pd.read_parquet(dir_path / PLAYER_INDEX_FILENAME)
+    match = index[index['name'] == name]
+    if match.empty:
+        return pd.DataFrame(columns=LOAD_DF_COLUMNS if decode else ENCODED_COLUMNS)
+    row_start, row_end = int(match['row_start'].iloc[0]), int(match['row_end'].iloc[0])
+
+    parquet_file = pq.ParquetFile(dir_path / PLAYER_LAYOUT_FILENAME)
+    row_counts = [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)]
+    offsets = np.r_[0, np.cumsum(row_counts)]
+    first_rg = int(np.searchsorted(offsets, row_start, side='right') - 1)
+    last_rg = int(np.searchsorted(offsets, row_end, side='left') - 1)
+
+    table = parquet_file.read_row_groups(list(range(first_rg, last_rg + 1)))
+    table = table.slice(row_start - offsets[first_rg], row_end - row_start)
+    history = table.to_pandas()
+    if decode and 'player_id' in history.columns:
+        history = decode_matches(history, load_players(data_dir))
+    return history
+
+
+def _score_trend(df_feat: pd.DataFrame) -> pd.Series:
+    """플레이어별 게임 순번(game_seq) 대비 점수(score)의 최소제곱 기울기.
+
+    np.polyfit(x, y, 1)[0] 과 같은 값을 그룹 합계로 한 번에 계산한다.
+        slope = (nΣxy - ΣxΣy) / (nΣx² - (Σx)²)
+    x = 0..n-1 이므로 Σx = n(n-1)/2, nΣx² - (Σx)² = n²(n²-1)/12 이고, 분자는
+    x 를 평균 (n-1)/2 로 옮긴 xc 에 대해 nΣ(xc·y) 가 된다. 큰 수끼리의 뺄셈이 없어 정밀도가 유지된다.
+    게임이 2개 미만인 플레이어는 0.0.
+
+    Args:
+        df_feat: name, game_seq, score 컬럼을 가진 (플레이어, date) 순 정렬 데이터
+    Returns:
+        name 을 인덱스로 하는 기울기 Series
+    """
+    grouped = df_feat.groupby('name')
+    n = grouped['score'].transform('size').to_numpy(dtype=np.float64)
+    xc = df_feat['game_seq'].to_numpy(dtype=np.float64) - (n - 1) / 2
+    sxy = pd.Series(xc * df_feat['score'].to_numpy(dtype=np.float64), index=df_feat.index).groupby(df_feat['name']).sum()
+
+    count = grouped.size().to_numpy(dtype=np.float64)
+    sxx = count * (count * count - 1) / 12
+    slope = np.divide(sxy.to_numpy(), sxx, out=np.zeros_like(sxx), where=count >= 2)
+    return pd.Series(slope, index=sxy.index)
+
+
+def filter_df(df, activation_period=7, churn_observation_period=7, churn_column='played_next_7_days',
+              presorted=False, backend='numpy', features=None, first_seen=None, low_memory=False):
+    result = filter_df_with_names(df, activation_period, churn_observation_period, churn_column,
+                                  presorted=presorted, backend=backend, features=features, first_seen=first_seen,
+                                  low_memory=low_memory)
     result.drop('name', axis=1, inplace=True)
     return result
 
 
-def filter_df_with_names(df, activation_period=7, churn_observation_period=7, churn_column='played_next_7_days'):
+def filter_df_multi(df, activation_periods, churn_observation_periods, churn_column='ap_{ap}d_and_cop_{cop}d',
+                    presorted=False, with_names=False, features=None, first_seen=None):
+    """여러 AP x COP 조합의 filter_df() 결과를 한 번의 정렬로 계산한다.
+
+    플레이어별 정렬과 첫 접속 시각 계산을 공유하고, 피처는 AP 마다 한 번만 집계한다.
+    5x5 그리드도 filter_df() 한 번과 비슷한 시간에 끝난다.
+
+    Args:
+        df: load_parquet() 로 읽은 매치 데이터
+        activation_periods: 활성 기간 목록 (일)
+        churn_observation_periods: 이탈 관찰 기간 목록 (일)
+        churn_column: 라벨 컬럼명 형식 ({ap}, {cop} 치환)
+        presorted: df 가 이미 (플레이어, date) 순으로 정렬되어 있으면 True
+        with_names: True 면 filter_df_with_names() 처럼 name 컬럼을 남긴다
+        features: 계산할 피처 이름 목록 (None 이면 전체)
+        first_seen: 첫 접속 레지스트리 (load_first_seen). filter_df_with_names() 참고
+    Returns:
+        {(ap, cop): 피처 DataFrame}
+    """
+    results = segment_features.compute_features_multi(df, activation_periods, churn_observation_periods,
+                                                      churn_column, presorted=presorted, features=features,
+                                                      first_seen=first_seen)
+    if not with_names:
+        for result in results.values():
+            result.drop('name', axis=1, inplace=True)
+    return results
+
+
+def filter_df_with_names(df, activation_period=7, churn_observation_period=7, churn_column='played_next_7_days',
+                         presorted=False, backend='numpy', features=None, first_seen=None, low_memory=False):
+    # presorted=True 는 df 가 이미 (플레이어, date) 순으로 정렬되어 있다는 뜻이다
+    # (플레이어 정렬 레이아웃 data/matches_by_player 에서 읽은 경우). 이때는 정렬을 생략한다.
+    # backend='numpy' 는 정렬된 배열 위에서 한 번에 계산하는 segment_features 엔진을,
+    # backend='pandas' 는 아래의 groupby 구현을, 'polars' / 'duckdb' 는 feature_backends 의
+    # lazy 쿼리 / SQL 구현을 사용한다. 모든 backend 의 결과는 같다.
+    # features 로 피처 이름 목록을 주면 그 피처만 반환한다. numpy backend 는 필요한 단계만 계산하고,
+    # 나머지 backend 는 전체를 계산한 뒤 컬럼을 고른다.
+    # first_seen(load_first_seen 결과)을 주면 레지스트리상 첫 접속이 df 의 첫 매치보다 앞선 플레이어,
+    # 즉 불러온 기간보다 먼저 플레이를 시작한 기존 유저를 빼고 계산한다.
+    # low_memory=True 는 numpy backend 의 저메모리 모드다. df 를 복사하지 않고 임시 배열을 쓰는 즉시 버리며,
+    # 최대 할당량을 결과의 attrs['peak_memory_bytes'] 에 남긴다.
+    if backend == 'numpy':
+        return segment_features.compute_features(df, activation_period, churn_observation_period,
+                                                 churn_column, presorted=presorted, features=features,
+                                                 first_seen=first_seen, low_memory=low_memory)
+    if low_memory:
+        raise ValueError(f"low_memory 는 numpy backend 에서만 지원합니다: {backend}")
+    if first_seen is not None:
+        loaded_first = df.groupby('name')['date'].transform('min')
+        df = df[~(df['name'].map(first_seen) < loaded_first)]
+    if features is not None:
+        segment_features.feature_plan(features)  # 알 수 없는 피처 이름이면 ValueError
+        result_df = filter_df_with_names(df, activation_period, churn_observation_period, churn_column,
+                                         presorted=presorted, backend=backend)
+        return result_df[['name', *features, churn_column]]
+    if backend in ('polars', 'duckdb'):
+        import feature_backends
+        compute = getattr(feature_backends, f"compute_features_{backend}")
+        return compute(df, activation_period, churn_observation_period, churn_column)
+    if backend != 'pandas':
+        raise ValueError(f"지원하지 않는 backend: {backend}")
+
     df_copy = df.copy()
 
     df_copy['first_login_date'] = df_copy.groupby('name')['date'].transform('min')
@@ -108,15 +708,16 @@ def filter_df_with_names(df, activation_period=7, churn_observation_period=7, ch
     ap = datetime.timedelta(days=activation_period)
     cop = datetime.timedelta(days=churn_observation_period)
 
-    # 전체 범위 데이터에서 이탈 라벨 계산
-    df_full = df_copy[df_copy['date'] < df_copy['first_login_date'] + ap + cop].copy()
-    df_full[churn_column] = ((df_full['date'] > df_full['first_login_date'] + ap) &
-                             (df_full['date'] < df_full['first_login_date'] + ap + cop)).astype(int)
-    churn_labels = df_full.groupby('name')[churn_column].max().reset_index()
+    # 이탈 라벨: AP 이후 첫 재접속 시각이 COP 안에 있으면 1 (재접속이 없으면 NaT 라 0)
+    first_login = df_copy.groupby('name')['first_login_date'].first()
+    first_return = (df_copy.loc[df_copy['date'] > df_copy['first_login_date'] + ap, ['name', 'date']]
+                    .groupby('name')['date'].min().reindex(first_login.index))
+    churn_labels = (first_return < first_login + ap + cop).astype(int).rename(churn_column).reset_index()
 
     # 피처는 activation period 내 데이터만 사용 (데이터 누수 방지)
     df_feat = df_copy[df_copy['date'] <= df_copy['first_login_date'] + ap].copy()
-    df_feat = df_feat.sort_values(['name', 'date'])
+    if not presorted:
+        df_feat = df_feat.sort_values(['name', 'date'])
 
     # 연속된 승/패 횟수 계산
     df_feat['_win_int'] = df_feat['win'].map({1.0: 1, 0.0: 0, 0.5: -1})
@@ -167,16 +768,7 @@ def filter_df_with_names(df, activation_period=7, churn_observation_period=7, ch
     df_feat['_is_second_half'] = (df_feat['date'] > ap_mid).astype(int)
 
     # 피처 집계
-    def _score_trend(group):
-        """게임 순번 대비 점수의 선형 회귀 기울기"""
-        if len(group) < 2:
-            return 0.0
-        x = group['game_seq'].values.astype(float)
-        y = group['score'].values.astype(float)
-        slope = np.polyfit(x, y, 1)[0]
-        return slope
-
-    score_trends = df_feat.groupby('name').apply(_score_trend, include_groups=False).reset_index()
+    score_trends = _score_trend(df_feat).reset_index()
     score_trends.columns = ['name', 'score_trend']
 
     result_df = df_feat.groupby('name').agg(
@@ -222,6 +814,122 @@ def filter_df_with_names(df, activation_period=7, churn_observation_period=7, ch
     return result_df
 
 
+def features_as_of(data_dir, cutoffs, activation_period=7, features=None) -> dict:
+    """기준 시각(cutoff)마다 그 시점에 아직 AP 안에 있는 플레이어의 피처를 계산한다.
+
+    이탈 라벨이 정해지기 전인 현재 플레이어를 점수화할 때 쓴다. 첫 접속 레지스트리로 가장 이른
+    cutoff - AP 와 가장 늦은 cutoff 사이에 첫 접속한 플레이어만 골라 그 기간의 파티션에서 읽고,
+    PlayerTimeline 을 한 번만 만든 뒤 cutoff 마다 PlayerTimeline.as_of() 로 계산한다.
+
+    Args:
+        data_dir: Parquet 디렉토리 경로
+        cutoffs: 기준 시각 목록 (각 시각까지의 매치를 포함. 날짜만 주면 그날 0시)
+        activation_period: 활성 기간 (일)
+        features: 계산할 피처 이름 목록 (None 이면 전체)
+    Returns:
+        {pd.Timestamp(cutoff): name 과 피처 컬럼의 DataFrame}
+    """
+    cutoffs = [pd.Timestamp(c) for c in cutoffs]
+    first_seen = load_first_seen(data_dir)
+    if not cutoffs or first_seen is None:
+        return {}
+
+    earliest = min(cutoffs) - pd.Timedelta(days=activation_period)
+    latest = max(cutoffs)
+    players = first_seen[(first_seen >= earliest) & (first_seen <= latest)].index
+    value_columns = segment_features.feature_inputs(
+        segment_features.FEATURE_COLUMNS if features is None else features)
+    df = load_parquet(data_dir, str(earliest.date()), str(latest.date()), columns=['name', 'date', *value_columns],
+                      players=players)
+    if df.empty:
+        return {cutoff: pd.DataFrame(columns=['name', *(features or segment_features.FEATURE_COLUMNS)])
+                for cutoff in cutoffs}
+    timeline = segment_features.PlayerTimeline(df, horizon_days=activation_period, value_columns=value_columns,
+                                               first_seen=first_seen)
+    return {cutoff: timeline.as_of(cutoff, activation_period, features) for cutoff in cutoffs}
+
+
+def feature_cache_path(data_dir, start_date, end_date, activation_period=7, churn_observation_period=7,
+                       churn_column='played_next_7_days', cohort=False) -> Path:
+    """피처 프레임 캐시 파일 경로.
+
+    파일 이름은 (기간, AP, COP, 라벨 컬럼명, 코호트 여부, 파티션 fingerprint, FEATURE_VERSION) 의
+    해시이므로 파티션이나 피처 코드가 바뀌면 자동으로 다른 파일을 가리킨다.
+    """
+    key = json.dumps({
+        'start_date': str(pd.Timestamp(start_date).date()),
+        'end_date': str(pd.Timestamp(end_date).date()),
+        'activation_period': activation_period,
+        'churn_observation_period': churn_observation_period,
+        'churn_column': churn_column,
+        'cohort': cohort,
+        'partitions': partition_fingerprint(data_dir),
+        'feature_version': FEATURE_VERSION,
+    }, sort_keys=True)
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return Path(data_dir).parent / FEATURE_CACHE_DIRNAME / f"{digest}.parquet"
+
+
+def save_feature_cache(result_df: pd.DataFrame, path) -> None:
+    """filter_df_with_names() 결과를 캐시 파일로 저장한다 (다른 프로세스와 겹쳐도 안전하게 교체)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f'.parquet.{os.getpid()}.tmp')
+    result_df.to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+
+
+def load_features(data_dir, start_date, end_date, activation_period=7, churn_observation_period=7,
+                  churn_column='played_next_7_days', with_names=False, cache=True, features=None,
+                  cohort=False, low_memory=False) -> pd.DataFrame:
+    """load_parquet() + filter_df() 결과를 캐시에서 읽고, 없으면 계산해서 저장한다.
+
+    첫 접속은 첫 접속 레지스트리(load_first_seen) 기준이므로, 기간이 이력 중간에서 시작해도
+    그 전부터 플레이하던 유저는 신규 유저로 세지 않는다.
+
+    Args:
+        data_dir: Parquet 디렉토리 경로
+        start_date: 시작 날짜 (YYYY-MM-DD)
+        end_date: 종료 날짜 (YYYY-MM-DD)
+        activation_period: 활성 기간 (일)
+        churn_observation_period: 이탈 관찰 기간 (일)
+        churn_column: 이탈 라벨 컬럼명
+        with_names: True 면 filter_df_with_names() 처럼 name 컬럼을 남긴다
+        cache: False 면 캐시를 읽지도 쓰지도 않고 계산만 한다
+        features: 피처 이름 목록. 주어지면 그 피처 컬럼만 반환한다. 캐시가 있으면 그 컬럼만 읽고,
+            없으면 필요한 원본 컬럼만 읽어 그 피처만 계산한다 (캐시는 전체 피처일 때만 저장).
+        cohort: True 면 기간을 코호트(첫 접속일 범위)로 보고 load_cohort() 로 읽는다.
+            end_date 이후 AP + COP 일까지의 매치도 읽으므로 코호트 끝쪽 유저의 라벨도 온전하다.
+        low_memory: True 면 filter_df_with_names() 의 저메모리 모드로 계산한다
+
+    Returns:
+        filter_df() (with_names=True 이면 filter_df_with_names()) 와 같은 DataFrame
+    """
+    path = feature_cache_path(data_dir, start_date, end_date, activation_period,
+                              churn_observation_period, churn_column, cohort)
+    if cache and path.exists():
+        columns = None if features is None else ['name', *features, churn_column]
+        result_df = pd.read_parquet(path, columns=columns)
+    else:
+        source_columns = FEATURE_SOURCE_COLUMNS if features is None else \
+            ['name', 'date', *segment_features.feature_inputs(features)]
+        if cohort:
+            raw_df, first_seen = load_cohort(data_dir, start_date, end_date, activation_period,
+                                             churn_observation_period, columns=source_columns, snapshot=True)
+        else:
+            raw_df = load_parquet(data_dir, start_date, end_date, columns=source_columns, snapshot=True)
+            first_seen = load_first_seen(data_dir)
+        result_df = filter_df_with_names(raw_df, activation_period, churn_observation_period, churn_column,
+                                         features=features, first_seen=first_seen, low_memory=low_memory)
+        del raw_df
+        if cache and features is None:
+            save_feature_cache(result_df, path)
+
+    if not with_names:
+        result_df.drop('name', axis=1, inplace=True)
+    return result_df
+
+
 def data_split(df, t_col, test_size, random_state=42, scale=True):
     X = df.drop(t_col, axis='columns')
     y = df[[t_col]]
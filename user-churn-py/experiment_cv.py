@@ -6,16 +6,14 @@ k-Fold 교차 검증 실험
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from sklearn.model_selection import StratifiedKFold, cross_validate
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.naive_bayes import GaussianNB
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 import warnings
 import data_loader
+from cv_runner import CVRunner
 
 warnings.filterwarnings("ignore")
 
@@ -31,11 +29,9 @@ K_FOLDS = 5
 
 # ── 데이터 로드 ──────────────────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
-print(f"원본 레코드 수: {len(raw_df):,}")
-
 churn_col = f"ap_{ACTIVATION_PERIOD}d_and_cop_{CHURN_OBSERVATION_PERIOD}d"
-result_df = data_loader.filter_df(raw_df, ACTIVATION_PERIOD, CHURN_OBSERVATION_PERIOD, churn_col)
+result_df = data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                                      CHURN_OBSERVATION_PERIOD, churn_col)
 
 X = result_df.drop(churn_col, axis=1)
 y = np.ravel(result_df[churn_col])
@@ -44,19 +40,14 @@ print(f"유저 수: {len(y):,}  |  이탈: {(y == 0).sum():,}  |  유지: {(y ==
 print(f"피처 수: {X.shape[1]}")
 
 # ── 모델 정의 ────────────────────────────────────────────────
+# 스케일링은 Pipeline 대신 CVRunner 의 전처리로 지정한다 (fold 별로 한 번만 계산해 공유)
 models = {
-    "KNN": Pipeline([
-        ("scaler", StandardScaler()),
-        ("knn", KNeighborsClassifier(n_neighbors=7)),
-    ]),
+    "KNN": KNeighborsClassifier(n_neighbors=7),
     "Random Forest": RandomForestClassifier(
         n_estimators=100, max_depth=10, min_samples_split=5,
         class_weight="balanced", random_state=RANDOM_STATE,
     ),
-    "Naive Bayes": Pipeline([
-        ("scaler", StandardScaler()),
-        ("nb", GaussianNB()),
-    ]),
+    "Naive Bayes": GaussianNB(),
     "XGBoost": XGBClassifier(
         n_estimators=200, max_depth=6, learning_rate=0.1,
         scale_pos_weight=(y == 0).sum() / max((y == 1).sum(), 1),
@@ -67,26 +58,29 @@ models = {
         is_unbalance=True, random_state=RANDOM_STATE, verbose=-1,
     ),
 }
+preprocess = {"KNN": ("scale",), "Naive Bayes": ("scale",)}
 
 # ── 교차 검증 ────────────────────────────────────────────────
-cv = StratifiedKFold(n_splits=K_FOLDS, shuffle=True, random_state=RANDOM_STATE)
-scoring = ["accuracy", "roc_auc", "f1_macro"]
+# 모델 x fold 학습은 CPU 수만큼의 프로세스로 나눈다 (XGBoost/LightGBM 의 스레드는 1개로 제한)
+runner = CVRunner(X, y, n_splits=K_FOLDS, random_state=RANDOM_STATE, workers=None)
 
 print(f"\n{'=' * 80}")
 print(f"  {K_FOLDS}-Fold Stratified 교차 검증")
 print(f"  AP={ACTIVATION_PERIOD}일, COP={CHURN_OBSERVATION_PERIOD}일, random_state={RANDOM_STATE}")
 print(f"{'=' * 80}")
 
+print(f"  {len(models)}개 모델 x {K_FOLDS} fold 학습 중 (프로세스 {runner.workers}개)...")
+cv_results = runner.run(models, preprocess=preprocess)
+
 summary_rows = []
 fold_detail = {}
 
-for name, model in models.items():
-    print(f"  {name} 학습 중...", end=" ", flush=True)
-    results = cross_validate(model, X, y, cv=cv, scoring=scoring, return_train_score=False)
-
-    acc = results["test_accuracy"]
-    auc = results["test_roc_auc"]
-    f1 = results["test_f1_macro"]
+for name in models:
+    print(f"  {name}:", end=" ")
+    scores = cv_results[name].scores
+    acc = scores["accuracy"]
+    auc = scores["roc_auc"]
+    f1 = scores["f1_macro"]
 
     summary_rows.append({
         "모델": name,
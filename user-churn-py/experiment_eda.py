@@ -57,9 +57,9 @@ FEATURE_KO = {
 
 # ── 데이터 로드 ──────────────────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
 churn_col = f"ap_{ACTIVATION_PERIOD}d_and_cop_{CHURN_OBSERVATION_PERIOD}d"
-result_df = data_loader.filter_df(raw_df, ACTIVATION_PERIOD, CHURN_OBSERVATION_PERIOD, churn_col)
+result_df = data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                                      CHURN_OBSERVATION_PERIOD, churn_col)
 
 features = list(FEATURE_KO.keys())
 churned = result_df[result_df[churn_col] == 0]
@@ -3,15 +3,17 @@
 - 다중공선성 분석 (VIF, 상관행렬)
 - RFE (Recursive Feature Elimination) 로 피처 제거
 - 전체 피처 vs 선택 피처 성능 비교
+- 전체 피처 vs 선택 피처 계산 비용 비교
 """
+import time
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import StratifiedKFold, cross_val_score
 from sklearn.feature_selection import RFECV
 import warnings
 import data_loader
+from cv_runner import CVRunner
 
 warnings.filterwarnings("ignore")
 
@@ -52,16 +54,17 @@ FEATURE_KO = {
 
 # ── 데이터 로드 ──────────────────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
 churn_col = f"ap_{ACTIVATION_PERIOD}d_and_cop_{CHURN_OBSERVATION_PERIOD}d"
-result_df = data_loader.filter_df(raw_df, ACTIVATION_PERIOD, CHURN_OBSERVATION_PERIOD, churn_col)
+result_df = data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                                      CHURN_OBSERVATION_PERIOD, churn_col)
 
 X = result_df.drop(churn_col, axis=1)
 y = np.ravel(result_df[churn_col])
 
 print(f"유저 수: {len(y):,}  |  피처 수: {X.shape[1]}")
 
-cv = StratifiedKFold(n_splits=K_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+runner = CVRunner(X, y, n_splits=K_FOLDS, random_state=RANDOM_STATE)
+cv = runner.cv
 
 # ── 1. 상관행렬 분석 ─────────────────────────────────────────
 print(f"\n{'=' * 80}")
@@ -154,23 +157,35 @@ print(f"\n{'=' * 80}")
 print(f"  4. 전체 피처 vs 선택 피처 성능 비교")
 print(f"{'=' * 80}")
 
-X_selected = X[selected]
-
+# 구성 이름 -> 학습에 쓸 피처 목록 (None 이면 전체)
 configs = {
-    f"전체 ({X.shape[1]}개)": X,
-    f"RFECV 선택 ({len(selected)}개)": X_selected,
+    f"전체 ({X.shape[1]}개)": None,
+    f"RFECV 선택 ({len(selected)}개)": selected,
 }
 
 # VIF 높은 피처 제거한 세트도 비교
 if high_vif:
-    X_no_vif = X.drop(columns=high_vif)
-    configs[f"VIF>10 제거 ({X_no_vif.shape[1]}개)"] = X_no_vif
+    no_vif = [c for c in X.columns if c not in high_vif]
+    configs[f"VIF>10 제거 ({len(no_vif)}개)"] = no_vif
 
 print(f"\n{'구성':<25} {'Accuracy':>12} {'AUC-ROC':>12} {'F1 (macro)':>12}")
 print(f"{'-' * 63}")
 
-for name, X_subset in configs.items():
-    acc = cross_val_score(rf, X_subset, y, cv=cv, scoring="accuracy").mean()
-    auc = cross_val_score(rf, X_subset, y, cv=cv, scoring="roc_auc").mean()
-    f1 = cross_val_score(rf, X_subset, y, cv=cv, scoring="f1_macro").mean()
+for name, columns in configs.items():
+    # 피처 구성이 달라도 같은 runner 의 fold 분할과 fold 행렬을 쓴다. 지표 3개는 학습 한 번으로 계산
+    result = runner.run({"rf": rf}, columns=columns)["rf"]
+    acc = result.mean("accuracy")
+    auc = result.mean("roc_auc")
+    f1 = result.mean("f1_macro")
     print(f"{name:<25} {acc:>12.4f} {auc:>12.4f} {f1:>12.4f}")
+
+# ── 5. 계산 비용 비교 (전체 vs 선택) ──────────────────────────
+print(f"\n{'=' * 80}")
+print(f"  5. 전체 피처 vs 선택 피처 계산 시간 (캐시 없이 원본부터)")
+print(f"{'=' * 80}")
+
+for name, feature_subset in [(f"전체 ({X.shape[1]}개)", None), (f"RFECV 선택 ({len(selected)}개)", selected)]:
+    started = time.perf_counter()
+    data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                              CHURN_OBSERVATION_PERIOD, churn_col, cache=False, features=feature_subset)
+    print(f"  {name:<25} {time.perf_counter() - started:>8.2f}s")
@@ -6,18 +6,14 @@
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from sklearn.model_selection import StratifiedKFold, cross_validate
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.naive_bayes import GaussianNB
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
-from imblearn.over_sampling import SMOTE
-from imblearn.pipeline import Pipeline as ImbPipeline
 import warnings
 import data_loader
+from cv_runner import CVRunner
 
 warnings.filterwarnings("ignore")
 
@@ -32,64 +28,66 @@ K_FOLDS = 5
 
 # ── 데이터 로드 ──────────────────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
 churn_col = f"ap_{ACTIVATION_PERIOD}d_and_cop_{CHURN_OBSERVATION_PERIOD}d"
-result_df = data_loader.filter_df(raw_df, ACTIVATION_PERIOD, CHURN_OBSERVATION_PERIOD, churn_col)
+result_df = data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                                      CHURN_OBSERVATION_PERIOD, churn_col)
 
 X = result_df.drop(churn_col, axis=1)
 y = np.ravel(result_df[churn_col])
 
 print(f"유저 수: {len(y):,}  |  이탈: {(y == 0).sum():,} ({(y == 0).mean():.1%})  |  유지: {(y == 1).sum():,} ({(y == 1).mean():.1%})")
 
-cv = StratifiedKFold(n_splits=K_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+# fold 분할과 fold 별 스케일링/SMOTE 결과는 세 전략이 함께 쓴다. 학습은 CPU 수만큼의 프로세스로 나눈다
+runner = CVRunner(X, y, n_splits=K_FOLDS, random_state=RANDOM_STATE, workers=None)
 scoring = ["accuracy", "roc_auc", "f1_macro", "recall_macro"]
 
 pos_weight = (y == 0).sum() / max((y == 1).sum(), 1)
 
 # ── 전략별 모델 정의 ─────────────────────────────────────────
+# 전략 이름 -> (모델, 모델별 전처리). SMOTE 는 학습 fold 에만 적용된다 (imblearn Pipeline 과 같은 순서)
 strategies = {
-    "처리 없음": {
-        "KNN": Pipeline([("scaler", StandardScaler()), ("knn", KNeighborsClassifier(n_neighbors=7))]),
+    "처리 없음": ({
+        "KNN": KNeighborsClassifier(n_neighbors=7),
         "Random Forest": RandomForestClassifier(n_estimators=100, max_depth=10, random_state=RANDOM_STATE),
-        "Naive Bayes": Pipeline([("scaler", StandardScaler()), ("nb", GaussianNB())]),
+        "Naive Bayes": GaussianNB(),
         "XGBoost": XGBClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, eval_metric="logloss", random_state=RANDOM_STATE),
         "LightGBM": LGBMClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, random_state=RANDOM_STATE, verbose=-1),
-    },
-    "가중치 조정": {
-        "KNN": Pipeline([("scaler", StandardScaler()), ("knn", KNeighborsClassifier(n_neighbors=7, weights="distance"))]),
+    }, {"KNN": ("scale",), "Naive Bayes": ("scale",)}),
+    "가중치 조정": ({
+        "KNN": KNeighborsClassifier(n_neighbors=7, weights="distance"),
         "Random Forest": RandomForestClassifier(n_estimators=100, max_depth=10, class_weight="balanced", random_state=RANDOM_STATE),
-        "Naive Bayes": Pipeline([("scaler", StandardScaler()), ("nb", GaussianNB())]),  # NB는 가중치 미지원
+        "Naive Bayes": GaussianNB(),  # NB는 가중치 미지원
         "XGBoost": XGBClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, scale_pos_weight=pos_weight, eval_metric="logloss", random_state=RANDOM_STATE),
         "LightGBM": LGBMClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, is_unbalance=True, random_state=RANDOM_STATE, verbose=-1),
-    },
-    "SMOTE": {
-        "KNN": ImbPipeline([("scaler", StandardScaler()), ("smote", SMOTE(random_state=RANDOM_STATE)), ("knn", KNeighborsClassifier(n_neighbors=7))]),
-        "Random Forest": ImbPipeline([("smote", SMOTE(random_state=RANDOM_STATE)), ("rf", RandomForestClassifier(n_estimators=100, max_depth=10, random_state=RANDOM_STATE))]),
-        "Naive Bayes": ImbPipeline([("scaler", StandardScaler()), ("smote", SMOTE(random_state=RANDOM_STATE)), ("nb", GaussianNB())]),
-        "XGBoost": ImbPipeline([("smote", SMOTE(random_state=RANDOM_STATE)), ("xgb", XGBClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, eval_metric="logloss", random_state=RANDOM_STATE))]),
-        "LightGBM": ImbPipeline([("smote", SMOTE(random_state=RANDOM_STATE)), ("lgbm", LGBMClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, random_state=RANDOM_STATE, verbose=-1))]),
-    },
+    }, {"KNN": ("scale",), "Naive Bayes": ("scale",)}),
+    "SMOTE": ({
+        "KNN": KNeighborsClassifier(n_neighbors=7),
+        "Random Forest": RandomForestClassifier(n_estimators=100, max_depth=10, random_state=RANDOM_STATE),
+        "Naive Bayes": GaussianNB(),
+        "XGBoost": XGBClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, eval_metric="logloss", random_state=RANDOM_STATE),
+        "LightGBM": LGBMClassifier(n_estimators=200, max_depth=6, learning_rate=0.1, random_state=RANDOM_STATE, verbose=-1),
+    }, {"KNN": ("scale", "smote"), "Random Forest": ("smote",), "Naive Bayes": ("scale", "smote"),
+        "XGBoost": ("smote",), "LightGBM": ("smote",)}),
 }
 
 # ── 실험 ─────────────────────────────────────────────────────
 all_rows = []
 model_names = ["KNN", "Random Forest", "Naive Bayes", "XGBoost", "LightGBM"]
 
-for strategy_name, models in strategies.items():
+for strategy_name, (models, preprocess) in strategies.items():
     print(f"\n{'=' * 80}")
     print(f"  전략: {strategy_name}")
     print(f"{'=' * 80}")
 
-    for model_name in model_names:
-        model = models[model_name]
-        print(f"  {model_name}...", end=" ", flush=True)
+    results = runner.run(models, preprocess=preprocess, metrics=scoring)
 
-        results = cross_validate(model, X, y, cv=cv, scoring=scoring, return_train_score=False)
+    for model_name in model_names:
+        print(f"  {model_name}...", end=" ")
 
-        acc = results["test_accuracy"].mean()
-        auc = results["test_roc_auc"].mean()
-        f1 = results["test_f1_macro"].mean()
-        recall = results["test_recall_macro"].mean()
+        acc = results[model_name].mean("accuracy")
+        auc = results[model_name].mean("roc_auc")
+        f1 = results[model_name].mean("f1_macro")
+        recall = results[model_name].mean("recall_macro")
 
         all_rows.append({
             "전략": strategy_name,
@@ -43,9 +43,9 @@ RANDOM_STATE = 42
 
 # ── 데이터 로드 + 모델 학습 ──────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
 churn_col = f"ap_{ACTIVATION_PERIOD}d_and_cop_{CHURN_OBSERVATION_PERIOD}d"
-result_df = data_loader.filter_df(raw_df, ACTIVATION_PERIOD, CHURN_OBSERVATION_PERIOD, churn_col)
+result_df = data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                                      CHURN_OBSERVATION_PERIOD, churn_col)
 
 X = result_df.drop(churn_col, axis=1)
 y = np.ravel(result_df[churn_col])
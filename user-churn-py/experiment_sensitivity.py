@@ -12,9 +12,9 @@ plt.rcParams["font.family"] = ["Apple SD Gothic Neo", "DejaVu Sans"]
 plt.rcParams["axes.unicode_minus"] = False
 from pathlib import Path
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import StratifiedKFold, cross_validate
 import warnings
 import data_loader
+from cv_runner import CVRunner
 
 warnings.filterwarnings("ignore")
 
@@ -30,22 +30,24 @@ COP_VALUES = [3, 5, 7, 10, 14]
 
 # ── 데이터 로드 ──────────────────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
+raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE, columns=data_loader.FEATURE_SOURCE_COLUMNS, snapshot=True)
 print(f"원본 레코드 수: {len(raw_df):,}")
 
-cv = StratifiedKFold(n_splits=K_FOLDS, shuffle=True, random_state=RANDOM_STATE)
-
 # ── 실험 ─────────────────────────────────────────────────────
 print(f"\nAP x COP 민감도 분석 (Random Forest, {K_FOLDS}-fold CV)")
 print(f"AP: {AP_VALUES}")
 print(f"COP: {COP_VALUES}")
 print(f"총 {len(AP_VALUES) * len(COP_VALUES)}개 조합\n")
 
+# 25개 조합의 피처를 한 번의 정렬로 미리 계산. 첫 접속은 로드 범위가 아니라 전체 이력 기준 (load_features, 앱과 같은 코호트)
+result_dfs = data_loader.filter_df_multi(raw_df, AP_VALUES, COP_VALUES,
+                                         first_seen=data_loader.load_first_seen(str(DATA_DIR)))
+
 rows = []
 for ap in AP_VALUES:
     for cop in COP_VALUES:
         churn_col = f"ap_{ap}d_and_cop_{cop}d"
-        result_df = data_loader.filter_df(raw_df, ap, cop, churn_col)
+        result_df = result_dfs.pop((ap, cop))
 
         X = result_df.drop(churn_col, axis=1)
         y = np.ravel(result_df[churn_col])
@@ -55,15 +57,16 @@ for ap in AP_VALUES:
 
         rf = RandomForestClassifier(
             n_estimators=100, max_depth=10, min_samples_split=5,
-            class_weight="balanced", random_state=RANDOM_STATE,
+            class_weight="balanced", random_state=RANDOM_STATE, n_jobs=-1,
         )
 
-        results = cross_validate(rf, X, y, cv=cv,
-                                 scoring=["accuracy", "roc_auc", "f1_macro"],
-                                 n_jobs=-1)
-        acc_scores = results["test_accuracy"]
-        auc_scores = results["test_roc_auc"]
-        f1_scores = results["test_f1_macro"]
+        # 조합마다 유저 집합이 다르므로 fold 도 조합마다 새로 나눈다. 조합마다 프로세스 풀을 띄우지 않고
+        # 현재 프로세스에서 fold 를 순서대로 학습하며, 트리는 RF 의 스레드(n_jobs)로 병렬 학습한다
+        runner = CVRunner(X, y, n_splits=K_FOLDS, random_state=RANDOM_STATE)
+        scores = runner.run({"rf": rf})["rf"].scores
+        acc_scores = scores["accuracy"]
+        auc_scores = scores["roc_auc"]
+        f1_scores = scores["f1_macro"]
 
         rows.append({
             "AP": ap,
@@ -1,17 +1,20 @@
 """
 하이퍼파라미터 튜닝 실험
-- RandomizedSearchCV로 RF, XGBoost, LightGBM 탐색
-- 탐색 범위 + 최적 파라미터 + 성능 비교 출력
+- RF, XGBoost, LightGBM 탐색 (기본: successive halving, SEARCH_MODE="random" 이면 RandomizedSearchCV)
+- 탐색 범위 + 최적 파라미터 + 성능 비교 + 탐색 시간/time-to-best 출력
+- trial 은 data/studies.sqlite 에 저장되어, 다시 실행하거나 중단 후 실행하면 남은 trial 만 평가
 """
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from sklearn.model_selection import RandomizedSearchCV, StratifiedKFold
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 import warnings
 import data_loader
+import halving_search
+from cv_runner import CVRunner
+from study_store import STUDY_PATH, StudyStore
 
 warnings.filterwarnings("ignore")
 
@@ -24,19 +27,23 @@ CHURN_OBSERVATION_PERIOD = 7
 RANDOM_STATE = 42
 K_FOLDS = 5
 N_ITER = 30  # RandomizedSearch 탐색 횟수
+# "halving": RF 는 트리 수, 부스팅은 샘플 수를 늘려 가며 후보를 걸러 냄 (부스팅은 early stopping 으로 트리 수 결정)
+# "random": 모든 후보를 전체 자원으로 평가하는 기존 RandomizedSearchCV
+SEARCH_MODE = "halving"
 
 # ── 데이터 로드 ──────────────────────────────────────────────
 print("데이터 로딩 중...")
-raw_df = data_loader.load_parquet(str(DATA_DIR), START_DATE, END_DATE)
 churn_col = f"ap_{ACTIVATION_PERIOD}d_and_cop_{CHURN_OBSERVATION_PERIOD}d"
-result_df = data_loader.filter_df(raw_df, ACTIVATION_PERIOD, CHURN_OBSERVATION_PERIOD, churn_col)
+result_df = data_loader.load_features(str(DATA_DIR), START_DATE, END_DATE, ACTIVATION_PERIOD,
+                                      CHURN_OBSERVATION_PERIOD, churn_col)
 
 X = result_df.drop(churn_col, axis=1)
 y = np.ravel(result_df[churn_col])
 
 print(f"유저 수: {len(y):,}  |  이탈 비율: {(y == 0).mean():.2%}")
 
-cv = StratifiedKFold(n_splits=K_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+runner = CVRunner(X, y, n_splits=K_FOLDS, random_state=RANDOM_STATE)
+cv = runner.cv
 
 # ── 탐색 범위 정의 ───────────────────────────────────────────
 search_spaces = {
@@ -82,7 +89,11 @@ search_spaces = {
 
 # ── 탐색 범위 출력 ───────────────────────────────────────────
 print(f"\n{'=' * 80}")
-print(f"  탐색 범위 (RandomizedSearchCV, n_iter={N_ITER}, {K_FOLDS}-fold CV)")
+if SEARCH_MODE == "halving":
+    print(f"  탐색 범위 (successive halving, 후보 {halving_search.HALVING_CANDIDATES}개 "
+          f"x 1/{halving_search.HALVING_FACTOR}, {K_FOLDS}-fold CV)")
+else:
+    print(f"  탐색 범위 (RandomizedSearchCV, n_iter={N_ITER}, {K_FOLDS}-fold CV)")
 print(f"{'=' * 80}")
 for name, cfg in search_spaces.items():
     print(f"\n  [{name}]")
@@ -90,30 +101,30 @@ for name, cfg in search_spaces.items():
         print(f"    {param}: {values}")
 
 # ── 튜닝 실행 ────────────────────────────────────────────────
+store = StudyStore(STUDY_PATH)
 results = {}
+best_params = {}
+timings = {}
 for name, cfg in search_spaces.items():
     print(f"\n{'=' * 80}")
-    print(f"  {name} 튜닝 중... (n_iter={N_ITER})")
+    print(f"  {name} 튜닝 중... ({SEARCH_MODE})")
     print(f"{'=' * 80}")
 
-    search = RandomizedSearchCV(
-        cfg["model"],
-        cfg["params"],
-        n_iter=N_ITER,
-        cv=cv,
-        scoring="roc_auc",
-        random_state=RANDOM_STATE,
-        n_jobs=-1,
-        verbose=0,
-        return_train_score=True,
+    search, search_sec, best_sec = halving_search.tune(
+        cfg["model"], cfg["params"], X, y, cv, mode=SEARCH_MODE, n_iter=N_ITER,
+        scoring="roc_auc", random_state=RANDOM_STATE, store=store, study=name,
     )
-    search.fit(X, y)
 
     results[name] = search
+    best_params[name] = halving_search.best_params(search)
+    timings[name] = (search_sec, best_sec)
 
     print(f"  최적 AUC-ROC: {search.best_score_:.4f}")
+    n_cached = int(search.trials["cached"].sum())
+    print(f"  탐색 시간: {search_sec:.1f}s  |  time-to-best: {best_sec:.1f}s  |  "
+          f"trial {len(search.trials)}개 (저장소 재사용 {n_cached}개)")
     print(f"  최적 파라미터:")
-    for param, val in search.best_params_.items():
+    for param, val in best_params[name].items():
         print(f"    {param}: {val}")
 
 # ── 기존 vs 튜닝 비교 ───────────────────────────────────────
@@ -121,8 +132,6 @@ print(f"\n{'=' * 80}")
 print(f"  기존 파라미터 vs 튜닝 후 비교 (AUC-ROC, {K_FOLDS}-fold CV)")
 print(f"{'=' * 80}")
 
-from sklearn.model_selection import cross_val_score
-
 baseline_models = {
     "Random Forest": RandomForestClassifier(
         n_estimators=100, max_depth=10, min_samples_split=5,
@@ -142,10 +151,9 @@ baseline_models = {
 print(f"\n{'모델':<16} {'기존 AUC':>12} {'튜닝 AUC':>12} {'개선폭':>10}")
 print(f"{'-' * 52}")
 
+baseline_results = runner.run(baseline_models, metrics=["roc_auc"])
 for name in search_spaces:
-    baseline_auc = cross_val_score(
-        baseline_models[name], X, y, cv=cv, scoring="roc_auc"
-    ).mean()
+    baseline_auc = baseline_results[name].mean("roc_auc")
     tuned_auc = results[name].best_score_
     delta = tuned_auc - baseline_auc
     print(f"{name:<16} {baseline_auc:>12.4f} {tuned_auc:>12.4f} {delta:>+10.4f}")
@@ -157,5 +165,15 @@ print(f"{'=' * 80}")
 
 for name in search_spaces:
     print(f"\n  [{name}]")
-    for param, val in results[name].best_params_.items():
+    for param, val in best_params[name].items():
         print(f"    {param}: {val}")
+
+# ── 탐색 시간 ────────────────────────────────────────────────
+print(f"\n{'=' * 80}")
+print(f"  탐색 시간 ({SEARCH_MODE}, 최종 refit 제외)")
+print(f"{'=' * 80}")
+print(f"\n{'모델':<16} {'최적 AUC':>10} {'탐색 시간':>12} {'time-to-best':>14}")
+print(f"{'-' * 56}")
+for name in search_spaces:
+    search_sec, best_sec = timings[name]
+    print(f"{name:<16} {results[name].best_score_:>10.4f} {search_sec:>11.1f}s {best_sec:>13.1f}s")
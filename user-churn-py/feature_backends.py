@@ -0,0 +1,253 @@
+"""filter_df_with_names() 의 Polars / DuckDB 구현.
+
+data_loader.filter_df_with_names(backend='polars' | 'duckdb') 가 사용한다.
+pandas 구현(backend='pandas')이 기준이며, 두 구현 모두 같은 컬럼, 순서, dtype 의 결과를 낸다.
+
+- polars: LazyFrame 쿼리 하나로 첫 접속, 이탈 라벨, 행 단위 피처, 집계를 표현하고 한 번에 실행한다.
+- duckdb: 같은 계산을 윈도우 함수를 쓰는 SQL 로 실행한다. DataFrame 외에
+  data/matches/*.parquet 를 직접 읽을 수도 있다 (compute_features_duckdb_parquet).
+
+같은 플레이어의 같은 시각 매치는 원래 행 순서(_row)로 정렬해 pandas 의 안정 정렬과 맞춘다.
+polars, duckdb 는 이 backend 를 쓸 때만 import 한다.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+
+# 정수형으로 반환하는 피처 컬럼 (나머지는 float64)
+INT_FEATURE_COLUMNS = ['winning_streak', 'losing_streak', 'game_count', 'active_days',
+                       'comeback_after_loss', 'session_count']
+
+_DAY_US = 24 * 60 * 60 * 1_000_000
+
+
+def _finalize(result_df: pd.DataFrame, churn_column: str) -> pd.DataFrame:
+    """dtype 을 pandas 구현과 맞춘다."""
+    result_df['name'] = result_df['name'].astype(str)
+    for col in result_df.columns[1:]:
+        dtype = np.int64 if col in INT_FEATURE_COLUMNS or col == churn_column else np.float64
+        result_df[col] = result_df[col].to_numpy(dtype=dtype)
+    return result_df
+
+
+def compute_features_polars(df: pd.DataFrame, activation_period=7, churn_observation_period=7,
+                            churn_column='played_next_7_days') -> pd.DataFrame:
+    """Polars lazy 쿼리로 filter_df_with_names() 와 같은 결과를 계산한다."""
+    import polars as pl
+
+    ap = pl.duration(microseconds=int(activation_period * _DAY_US))
+    ap_half = pl.duration(microseconds=int(activation_period * _DAY_US / 2))
+    cop = pl.duration(microseconds=int(churn_observation_period * _DAY_US))
+    player = pl.col('name')
+    date = pl.col('date')
+
+    lf = (pl.from_pandas(df[data_loader.FEATURE_SOURCE_COLUMNS]).lazy()
+          .with_row_index('_row')
+          .with_columns(first_login=date.min().over('name')))
+
+    # 이탈 라벨: AP 이후 첫 재접속이 COP 안이면 1
+    labels = (lf.group_by('name')
+              .agg(first_login=pl.col('first_login').first(),
+                   first_return=date.filter(date > pl.col('first_login') + ap).min())
+              .select('name', (pl.col('first_return') < pl.col('first_login') + ap + cop)
+                      .fill_null(False).cast(pl.Int64).alias(churn_column)))
+
+    outcome = (pl.when(pl.col('win') == 1.0).then(1)
+               .when(pl.col('win') == 0.0).then(0).otherwise(-1))
+    feat = (lf.filter(date <= pl.col('first_login') + ap)
+            .sort(['name', 'date', '_row'])
+            .with_columns(
+                outcome=outcome,
+                game_seq=pl.int_range(pl.len()).over('name'),
+                gap_min=(date - date.shift(1).over('name')).dt.total_microseconds() / 60_000_000,
+                hour=date.dt.hour().cast(pl.Float64),
+                day=date.dt.date(),
+                is_weekend=(date.dt.weekday() >= 6).cast(pl.Float64),
+                first_half=(date <= pl.col('first_login') + ap_half).cast(pl.Int64),
+            )
+            .with_columns(
+                run_id=(pl.col('outcome') != pl.col('outcome').shift(1).over('name'))
+                .fill_null(True).cum_sum().over('name'),
+                new_session=(pl.col('gap_min') > 30).fill_null(True),
+            )
+            .with_columns(streak=pl.int_range(1, pl.len() + 1).over(['name', 'run_id'])))
+
+    n = pl.len().cast(pl.Float64)
+    centered_seq = pl.col('game_seq') - (n - 1) / 2
+    result = (feat.group_by('name')
+              .agg(
+                  score_mean=pl.col('score').mean(),
+                  score_std=pl.col('score').std().fill_null(0),
+                  points_mean=pl.col('points').mean(),
+                  degree_mean=pl.col('degree').mean(),
+                  win_rate=pl.col('win').mean(),
+                  win_count=pl.col('win').sum(),
+                  lose_count=(1 - pl.col('win')).sum(),
+                  winning_streak=pl.when(pl.col('outcome') == 1).then(pl.col('streak')).otherwise(0).max(),
+                  losing_streak=pl.when(pl.col('outcome') == 0).then(pl.col('streak')).otherwise(0).max(),
+                  game_count=pl.len(),
+                  active_days=pl.col('day').n_unique(),
+                  engagement_hours=(date.max() - pl.col('first_login').first()).dt.total_microseconds()
+                  / 3_600_000_000,
+                  avg_gap_min=pl.col('gap_min').mean().fill_null(0),
+                  hour_std=pl.col('hour').std().fill_null(0),
+                  weekend_ratio=pl.col('is_weekend').mean(),
+                  peak_hour_ratio=pl.col('hour').is_between(18, 23).cast(pl.Float64).mean(),
+                  first_game_win=pl.col('win').first(),
+                  comeback_after_loss=((pl.col('outcome') == 0) & (pl.col('streak') >= 3)).any().cast(pl.Int64),
+                  session_count=pl.col('new_session').sum(),
+                  first_half_games=pl.col('first_half').sum(),
+                  score_trend=pl.when(pl.len() >= 2)
+                  .then((centered_seq * pl.col('score')).sum() / (n * (n * n - 1) / 12))
+                  .otherwise(0.0),
+              )
+              .with_columns(
+                  games_per_day=pl.col('game_count') / pl.col('active_days').clip(lower_bound=1),
+                  games_per_session=pl.col('game_count') / pl.col('session_count').clip(lower_bound=1),
+                  activity_decline=(2 * pl.col('first_half_games') - pl.col('game_count'))
+                  / pl.col('game_count').clip(lower_bound=1),
+              )
+              .join(labels, on='name', how='inner')
+              .sort('name')
+              .select('name', 'score_mean', 'score_std', 'points_mean', 'degree_mean', 'win_rate',
+                      'win_count', 'lose_count', 'winning_streak', 'losing_streak', 'game_count',
+                      'active_days', 'engagement_hours', 'avg_gap_min', 'hour_std', 'weekend_ratio',
+                      'peak_hour_ratio', 'first_game_win', 'comeback_after_loss', 'session_count',
+                      'games_per_day', 'games_per_session', 'activity_decline', 'score_trend', churn_column)
+              .collect())
+    return _finalize(result.to_pandas(), churn_column)
+
+
+# {source} 는 name, date, win, score, points, degree, _row 컬럼을 가진 테이블 식
+_FEATURE_SQL = """
+WITH src AS (
+    SELECT *, min(date) OVER (PARTITION BY name) AS first_login FROM {source}
+),
+labels AS (
+    SELECT name,
+           CASE WHEN min(date) FILTER (WHERE date > first_login + to_microseconds({ap_us}))
+                     < any_value(first_login) + to_microseconds({ap_cop_us})
+                THEN 1 ELSE 0 END AS label
+    FROM src GROUP BY name
+),
+feat AS (
+    SELECT *,
+           CASE WHEN win = 1.0 THEN 1 WHEN win = 0.0 THEN 0 ELSE -1 END AS outcome,
+           row_number() OVER w - 1 AS game_seq,
+           count(*) OVER (PARTITION BY name) AS n,
+           (epoch_us(date) - epoch_us(lag(date) OVER w)) / 60000000.0 AS gap_min
+    FROM src
+    WHERE date <= first_login + to_microseconds({ap_us})
+    WINDOW w AS (PARTITION BY name ORDER BY date, _row)
+),
+runs AS (
+    SELECT *,
+           sum(CASE WHEN outcome IS DISTINCT FROM prev_outcome THEN 1 ELSE 0 END)
+               OVER (PARTITION BY name ORDER BY date, _row ROWS UNBOUNDED PRECEDING) AS run_id
+    FROM (SELECT *, lag(outcome) OVER (PARTITION BY name ORDER BY date, _row) AS prev_outcome FROM feat)
+),
+streaks AS (
+    SELECT *, row_number() OVER (PARTITION BY name, run_id ORDER BY date, _row) AS streak FROM runs
+),
+agg AS (
+    SELECT name,
+           avg(score) AS score_mean,
+           coalesce(stddev_samp(score), 0) AS score_std,
+           avg(points) AS points_mean,
+           avg(degree) AS degree_mean,
+           avg(win) AS win_rate,
+           sum(win) AS win_count,
+           sum(1 - win) AS lose_count,
+           max(CASE WHEN outcome = 1 THEN streak ELSE 0 END) AS winning_streak,
+           max(CASE WHEN outcome = 0 THEN streak ELSE 0 END) AS losing_streak,
+           count(*) AS game_count,
+           count(DISTINCT CAST(date AS DATE)) AS active_days,
+           (epoch_us(max(date)) - epoch_us(any_value(first_login))) / 3600000000.0 AS engagement_hours,
+           coalesce(avg(gap_min), 0) AS avg_gap_min,
+           coalesce(stddev_samp(hour(date)), 0) AS hour_std,
+           avg(CASE WHEN isodow(date) >= 6 THEN 1.0 ELSE 0.0 END) AS weekend_ratio,
+           avg(CASE WHEN hour(date) BETWEEN 18 AND 23 THEN 1.0 ELSE 0.0 END) AS peak_hour_ratio,
+           max(CASE WHEN game_seq = 0 THEN win ELSE 0 END) AS first_game_win,
+           max(CASE WHEN outcome = 0 AND streak >= 3 THEN 1 ELSE 0 END) AS comeback_after_loss,
+           sum(CASE WHEN gap_min IS NULL OR gap_min > 30 THEN 1 ELSE 0 END) AS session_count,
+           sum(CASE WHEN date <= first_login + to_microseconds({ap_half_us}) THEN 1 ELSE 0 END)
+               AS first_half_games,
+           CASE WHEN count(*) < 2 THEN 0.0
+                ELSE sum((game_seq - (n - 1) / 2.0) * score) / (count(*) * (count(*) * count(*) - 1) / 12.0)
+                END AS score_trend
+    FROM streaks GROUP BY name
+)
+SELECT agg.name, score_mean, score_std, points_mean, degree_mean, win_rate, win_count, lose_count,
+       winning_streak, losing_streak, game_count, active_days, engagement_hours, avg_gap_min, hour_std,
+       weekend_ratio, peak_hour_ratio, first_game_win, comeback_after_loss, session_count,
+       game_count / greatest(active_days, 1) AS games_per_day,
+       game_count / greatest(session_count, 1) AS games_per_session,
+       (2 * first_half_games - game_count) / greatest(game_count, 1) AS activity_decline,
+       score_trend,
+       labels.label AS "{churn_column}"
+FROM agg JOIN labels USING (name)
+ORDER BY agg.name
+"""
+
+
+def _feature_sql(source: str, activation_period, churn_observation_period, churn_column) -> str:
+    return _FEATURE_SQL.format(
+        source=source,
+        ap_us=int(activation_period * _DAY_US),
+        ap_half_us=int(activation_period * _DAY_US / 2),
+        ap_cop_us=int((activation_period + churn_observation_period) * _DAY_US),
+        churn_column=churn_column,
+    )
+
+
+def compute_features_duckdb(df: pd.DataFrame, activation_period=7, churn_observation_period=7,
+                            churn_column='played_next_7_days') -> pd.DataFrame:
+    """DuckDB SQL 로 DataFrame 에서 filter_df_with_names() 와 같은 결과를 계산한다."""
+    import duckdb
+
+    matches = df[data_loader.FEATURE_SOURCE_COLUMNS].assign(_row=np.arange(len(df)))
+    with duckdb.connect() as con:
+        con.register('matches', matches)
+        result_df = con.execute(_feature_sql('matches', activation_period, churn_observation_period,
+                                             churn_column)).df()
+    return _finalize(result_df, churn_column)
+
+
+def compute_features_duckdb_parquet(data_dir, start_date, end_date, activation_period=7,
+                                    churn_observation_period=7,
+                                    churn_column='played_next_7_days') -> pd.DataFrame:
+    """data/matches/*.parquet 를 DuckDB 로 직접 읽어 load_parquet() + filter_df_with_names() 결과를 계산한다.
+
+    컴팩트 스키마(player_id, win 코드)면 players.parquet 와 조인해 이름과 승패 값을 되돌린다.
+    같은 시각 매치의 순서는 load_parquet() 와 같은 (파일명, 파일 내 행 번호) 순이다.
+    """
+    import duckdb
+
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    files = [str(f) for f in data_loader.partition_files(Path(data_dir), start, end)]
+    if not files:
+        return pd.DataFrame()
+
+    with duckdb.connect() as con:
+        columns = {row[0] for row in con.execute("DESCRIBE SELECT * FROM read_parquet($files)",
+                                                 {'files': files}).fetchall()}
+        if 'player_id' in columns:
+            players = str(data_loader.players_path(data_dir))
+            raw = (f"(SELECT p.name, m.date, m.win / 2.0 AS win, m.score, m.points, m.degree, "
+                   f"m.filename, m.file_row_number FROM read_parquet($files, filename = true, "
+                   f"file_row_number = true) m JOIN read_parquet('{players}') p USING (player_id))")
+        else:
+            raw = ("(SELECT name, date, win, score, points, degree, filename, file_row_number "
+                   "FROM read_parquet($files, filename = true, file_row_number = true))")
+        source = (f"(SELECT name, date, win, score, points, degree, "
+                  f"row_number() OVER (ORDER BY filename, file_row_number) AS _row FROM {raw} "
+                  f"WHERE date >= TIMESTAMP '{start}' AND date < TIMESTAMP '{end + pd.Timedelta(days=1)}')")
+        result_df = con.execute(_feature_sql(source, activation_period, churn_observation_period, churn_column),
+                                {'files': files}).df()
+    return _finalize(result_df, churn_column)
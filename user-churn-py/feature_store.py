@@ -0,0 +1,357 @@
+"""플레이어별 피처 상태를 날짜 파티션 단위로 누적 갱신하는 피처 저장소.
+
+filter_df_with_names() 는 매번 전체 기록을 다시 읽지만, 피처는 첫 접속 후 AP 일 동안의
+매치만으로 정해지므로 새 날짜 파티션이 들어와도 바뀌는 플레이어는 그날 매치가 있는 플레이어뿐이다.
+FeatureStore 는 플레이어마다 집계에 필요한 상태(게임 수, 합계, 분산용 M2, 연속 승/패 상태,
+마지막 매치 시각, 세션 수, 점수 기울기용 합계, AP 이후 첫 재접속 시각)를 들고 있다가
+새 파티션의 매치만 차례로 반영한다. 갱신 비용은 새 행 수에 비례한다.
+
+상태는 data/feature_store/ap_<AP>d.parquet 에 저장하고, 반영한 파티션 목록은 파일 메타데이터에
+기록한다. 이미 반영한 파티션이 바뀌었거나 그보다 이른 날짜의 파티션이 새로 생기면 처음부터 다시 만든다.
+
+사용 예:
+    python feature_store.py --ap 7            # 새 파티션만 반영
+    python feature_store.py --ap 7 --force    # 전체 다시 계산
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+import data_loader
+from segment_features import segment_starts
+
+
+DATA_DIR = Path("data/matches")
+STORE_DIR = Path("data/feature_store")
+
+_NEVER = np.iinfo(np.int64).max
+_MINUTE_US = 60 * 1_000_000
+_HOUR_US = 60 * _MINUTE_US
+
+# 상태 컬럼과 초기값 (date 계열은 마이크로초 단위 int64, 없으면 _NEVER)
+_STATE_COLUMNS = {
+    'first_login': 0,
+    'last_date': 0,
+    'last_day': 0,
+    'first_return': _NEVER,
+    'game_count': 0,
+    'win_sum': 0.0,
+    'lose_sum': 0.0,
+    'score_sum': 0.0,
+    'score_m2': 0.0,
+    'points_sum': 0.0,
+    'degree_sum': 0.0,
+    'hour_sum': 0.0,
+    'hour_m2': 0.0,
+    'weekend_games': 0,
+    'peak_hour_games': 0,
+    'first_half_games': 0,
+    'first_game_win': 0.0,
+    'last_outcome': -2,
+    'streak': 0,
+    'winning_streak': 0,
+    'losing_streak': 0,
+    'active_days': 0,
+    'session_count': 0,
+    'seq_score_sum': 0.0,
+}
+
+
+def store_path(store_dir, activation_period) -> Path:
+    return Path(store_dir) / f"ap_{activation_period}d.parquet"
+
+
+def _fingerprint(f: Path) -> list:
+    stat = f.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _merge_m2(n_a, sum_a, m2_a, n_b, sum_b, m2_b):
+    """두 묶음의 (개수, 합, 편차제곱합)을 합친 편차제곱합 (Chan 의 병렬 분산 공식)."""
+    n = n_a + n_b
+    mean_a = np.divide(sum_a, n_a, out=np.zeros_like(sum_a), where=n_a > 0)
+    delta = sum_b / n_b - mean_a
+    return m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+class FeatureStore:
+    """플레이어별 피처 누적 상태.
+
+    Args:
+        activation_period: 피처를 계산할 첫 접속 이후 기간 (일)
+    """
+
+    def __init__(self, activation_period=7):
+        self.activation_period = activation_period
+        self.names = pd.Index([], dtype=object)
+        self.state = {col: np.zeros(0, dtype=np.float64 if isinstance(init, float) else np.int64)
+                      for col, init in _STATE_COLUMNS.items()}
+        self.applied = {}
+
+    def __len__(self):
+        """상태를 가진 플레이어 수"""
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path) -> 'FeatureStore':
+        table = pq.read_table(path)
+        metadata = table.schema.metadata
+        store = cls(int(metadata[b'activation_period']))
+        store.applied = json.loads(metadata[b'applied'])
+        store.names = pd.Index(table['name'].to_numpy(zero_copy_only=False))
+        for col in _STATE_COLUMNS:
+            store.state[col] = table[col].to_numpy()
+        return store
+
+    def save(self, path) -> None:
+        table = pa.table({'name': pa.array(self.names, type=pa.string()), **self.state})
+        table = table.replace_schema_metadata({
+            b'activation_period': str(self.activation_period).encode(),
+            b'applied': json.dumps(self.applied, sort_keys=True).encode(),
+        })
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp_path)
+        tmp_path.replace(path)
+
+    def _player_rows(self, names: pd.Index, first_dates: np.ndarray) -> np.ndarray:
+        """이름별 상태 행 번호를 반환한다. 처음 보는 플레이어는 first_dates 를 첫 접속으로 추가한다."""
+        rows = self.names.get_indexer(names)
+        new = rows < 0
+        if new.any():
+            rows[new] = len(self.names) + np.arange(new.sum())
+            self.names = self.names.append(names[new])
+            for col, init in _STATE_COLUMNS.items():
+                added = np.full(new.sum(), init, dtype=self.state[col].dtype)
+                if col == 'first_login':
+                    added = first_dates[new]
+                self.state[col] = np.concatenate([self.state[col], added])
+        return rows
+
+    def apply(self, day_df: pd.DataFrame) -> int:
+        """한 파티션의 매치를 상태에 반영하고 AP 안에 들어간 행 수를 반환한다.
+
+        파티션은 날짜순으로 반영해야 한다 (이미 반영한 매치보다 이른 매치가 오면 안 된다).
+
+        Args:
+            day_df: name, date, win, score, points, degree 컬럼을 가진 매치 데이터
+        Returns:
+            피처 상태에 반영된 (AP 내) 행 수
+        """
+        if day_df.empty:
+            return 0
+        codes, names = pd.factorize(day_df['name'])
+        dates = day_df['date'].to_numpy().astype('M8[us]').view(np.int64)
+        order = np.lexsort((dates, codes))
+        codes = codes[order]
+        dates = dates[order]
+
+        # 플레이어별 상태 행과 첫 접속 시각
+        starts = segment_starts(codes)
+        first_dates = np.empty(len(names), dtype=np.int64)
+        first_dates[codes[starts]] = dates[starts]
+        player = self._player_rows(names, first_dates)[codes]
+        st = self.state
+        ap_end = st['first_login'][player] + int(self.activation_period * 24 * _HOUR_US)
+
+        # AP 이후 매치는 첫 재접속 시각만 갱신
+        after = dates > ap_end
+        np.minimum.at(st['first_return'], player[after], dates[after])
+
+        sel = np.flatnonzero(~after)
+        if len(sel) == 0:
+            return 0
+        player = player[sel]
+        dates = dates[sel]
+        win = day_df['win'].to_numpy(dtype=np.float64)[order][sel]
+        score = day_df['score'].to_numpy(dtype=np.float64)[order][sel]
+        points = day_df['points'].to_numpy(dtype=np.float64)[order][sel]
+        degree = day_df['degree'].to_numpy(dtype=np.float64)[order][sel]
+
+        n = len(sel)
+        starts = segment_starts(player)
+        counts = np.diff(np.r_[starts, n])
+        ends = starts + counts - 1
+        seg = np.repeat(np.arange(len(starts)), counts)
+        p = player[starts]
+        n0 = st['game_count'][p]
+        pos = np.arange(n)
+        local_seq = pos - starts[seg]
+        seg_first = local_seq == 0
+        fresh = seg_first & (n0[seg] == 0)
+
+        # 이전 매치와의 간격 / 날짜 / 세션 (구간 첫 행은 저장된 마지막 매치와 비교)
+        prev_date = np.empty(n, dtype=np.int64)
+        prev_date[1:] = dates[:-1]
+        prev_date[starts] = st['last_date'][p]
+        gap_min = (dates - prev_date) / _MINUTE_US
+        day = dates // (24 * _HOUR_US)
+        prev_day = np.empty(n, dtype=np.int64)
+        prev_day[1:] = day[:-1]
+        prev_day[starts] = st['last_day'][p]
+        new_day = fresh | (day != prev_day)
+        new_session = fresh | (gap_min > 30)
+        hour = ((dates // _HOUR_US) % 24).astype(np.float64)
+        is_weekend = (day + 3) % 7 >= 5
+        is_peak = (hour >= 18) & (hour <= 23)
+        first_half = dates <= st['first_login'][player] + int(self.activation_period * 12 * _HOUR_US)
+
+        # 연속 승/패: 구간 첫 연속은 저장된 마지막 결과와 같으면 이어서 센다
+        outcome = np.where(win == 1.0, 1, np.where(win == 0.0, 0, -1))
+        run_start = seg_first.copy()
+        run_start[1:] |= outcome[1:] != outcome[:-1]
+        run_pos = np.maximum.accumulate(np.where(run_start, pos, 0))
+        streak = pos - run_pos + 1
+        carry = (n0 > 0) & (outcome[starts] == st['last_outcome'][p])
+        streak += np.where((run_pos == starts[seg]) & carry[seg], st['streak'][p][seg], 0)
+
+        # 분산(M2)은 파티션 내 값의 M2 를 구해 기존 상태와 합친다
+        def _batch_m2(values):
+            batch_sum = np.add.reduceat(values, starts)
+            dev = values - (batch_sum / counts)[seg]
+            return batch_sum, np.add.reduceat(dev * dev, starts)
+
+        score_sum, score_m2 = _batch_m2(score)
+        hour_sum, hour_m2 = _batch_m2(hour)
+        st['score_m2'][p] = _merge_m2(n0, st['score_sum'][p], st['score_m2'][p], counts, score_sum, score_m2)
+        st['hour_m2'][p] = _merge_m2(n0, st['hour_sum'][p], st['hour_m2'][p], counts, hour_sum, hour_m2)
+        st['score_sum'][p] += score_sum
+        st['hour_sum'][p] += hour_sum
+
+        st['seq_score_sum'][p] += np.add.reduceat((n0[seg] + local_seq) * score, starts)
+        st['win_sum'][p] += np.add.reduceat(win, starts)
+        st['lose_sum'][p] += np.add.reduceat(1 - win, starts)
+        st['points_sum'][p] += np.add.reduceat(points, starts)
+        st['degree_sum'][p] += np.add.reduceat(degree, starts)
+        st['weekend_games'][p] += np.add.reduceat(is_weekend.astype(np.int64), starts)
+        st['peak_hour_games'][p] += np.add.reduceat(is_peak.astype(np.int64), starts)
+        st['first_half_games'][p] += np.add.reduceat(first_half.astype(np.int64), starts)
+        st['active_days'][p] += np.add.reduceat(new_day.astype(np.int64), starts)
+        st['session_count'][p] += np.add.reduceat(new_session.astype(np.int64), starts)
+        st['winning_streak'][p] = np.maximum(st['winning_streak'][p],
+                                             np.maximum.reduceat(streak * (outcome == 1), starts))
+        st['losing_streak'][p] = np.maximum(st['losing_streak'][p],
+                                            np.maximum.reduceat(streak * (outcome == 0), starts))
+        st['first_game_win'][p] = np.where(n0 == 0, win[starts], st['first_game_win'][p])
+        st['streak'][p] = streak[ends]
+        st['last_outcome'][p] = outcome[ends]
+        st['last_date'][p] = dates[ends]
+        st['last_day'][p] = day[ends]
+        st['game_count'][p] = n0 + counts
+        return n
+
+    def features(self, churn_observation_period=7, churn_column='played_next_7_days') -> pd.DataFrame:
+        """현재 상태로 filter_df_with_names() 와 같은 형태의 피처 DataFrame 을 만든다 (name 순).
+
+        Args:
+            churn_observation_period: 이탈 관찰 기간 (일)
+            churn_column: 이탈 라벨 컬럼명
+        Returns:
+            플레이어별 피처 DataFrame
+        """
+        st = self.state
+        order = np.argsort(self.names.to_numpy(dtype=str), kind='stable')
+        n = st['game_count'][order].astype(np.float64)
+        first = st['first_login'][order]
+        span = st['last_date'][order] - first
+        score_sum = st['score_sum'][order]
+        has_pairs = n > 1
+
+        def _std(m2):
+            return np.sqrt(np.divide(m2[order], n - 1, out=np.zeros_like(n), where=has_pairs))
+
+        sxx = n * (n * n - 1) / 12
+        sxy = st['seq_score_sum'][order] - (n - 1) / 2 * score_sum
+        deadline = first + int((self.activation_period + churn_observation_period) * 24 * _HOUR_US)
+
+        result_df = pd.DataFrame({
+            'name': self.names[order].astype(str),
+            'score_mean': score_sum / n,
+            'score_std': _std(st['score_m2']),
+            'points_mean': st['points_sum'][order] / n,
+            'degree_mean': st['degree_sum'][order] / n,
+            'win_rate': st['win_sum'][order] / n,
+            'win_count': st['win_sum'][order],
+            'lose_count': st['lose_sum'][order],
+            'winning_streak': st['winning_streak'][order],
+            'losing_streak': st['losing_streak'][order],
+            'game_count': st['game_count'][order],
+            'active_days': st['active_days'][order],
+            'engagement_hours': span / _HOUR_US,
+            'avg_gap_min': np.divide(span / _MINUTE_US, n - 1, out=np.zeros_like(n), where=has_pairs),
+            'hour_std': _std(st['hour_m2']),
+            'weekend_ratio': st['weekend_games'][order] / n,
+            'peak_hour_ratio': st['peak_hour_games'][order] / n,
+            'first_game_win': st['first_game_win'][order],
+            'comeback_after_loss': (st['losing_streak'][order] >= 3).astype(np.int64),
+            'session_count': st['session_count'][order],
+        })
+        result_df['games_per_day'] = result_df['game_count'] / result_df['active_days'].clip(lower=1)
+        result_df['games_per_session'] = result_df['game_count'] / result_df['session_count'].clip(lower=1)
+        result_df['activity_decline'] = (2 * st['first_half_games'][order] - n) / np.maximum(n, 1)
+        result_df['score_trend'] = np.divide(sxy, sxx, out=np.zeros_like(n), where=has_pairs)
+        result_df[churn_column] = (st['first_return'][order] < deadline).astype(np.int64)
+        return result_df
+
+
+def _daily_partitions(data_dir: Path) -> list[Path]:
+    # 날짜별 파티션(yyyy-mm-dd.parquet)만 대상으로 한다
+    return sorted(f for f in Path(data_dir).glob("*.parquet") if len(f.stem) == 10)
+
+
+def update(data_dir: Path = DATA_DIR, store_dir: Path = STORE_DIR, activation_period: int = 7,
+           force: bool = False) -> FeatureStore:
+    """새 날짜 파티션을 피처 저장소에 반영하고 저장한 뒤 FeatureStore 를 반환한다."""
+    files = _daily_partitions(data_dir)
+    if not files:
+        print(f"[ERROR] {data_dir}에 날짜별 Parquet 파일이 없습니다.")
+        sys.exit(1)
+
+    path = store_path(store_dir, activation_period)
+    store = FeatureStore.load(path) if path.exists() and not force else FeatureStore(activation_period)
+
+    current = {f.name: _fingerprint(f) for f in files}
+    changed = [name for name, fp in store.applied.items() if current.get(name) != fp]
+    pending = [f for f in files if f.name not in store.applied]
+    if changed or (store.applied and pending and pending[0].name < max(store.applied)):
+        # 이미 반영한 매치가 바뀌었거나 과거 날짜가 끼어들면 누적 상태를 쓸 수 없다
+        print(f"[SKIP] 누적 갱신 불가 (변경/삭제 {len(changed)}개 또는 과거 날짜 추가) -> 전체 다시 계산")
+        store = FeatureStore(activation_period)
+        pending = files
+
+    if not pending:
+        print(f"[SKIP] 새 파티션이 없습니다 ({len(store):,}명)")
+        return store
+
+    rows = 0
+    for f in tqdm(pending, desc="Updating feature store"):
+        day_df = data_loader.load_parquet(str(data_dir), f.stem, f.stem, columns=data_loader.FEATURE_SOURCE_COLUMNS)
+        rows += store.apply(day_df)
+        store.applied[f.name] = current[f.name]
+    store.save(path)
+
+    print(f"피처 저장소 갱신: 파티션 {len(pending)}개, AP 내 {rows:,}건 반영, 총 {len(store):,}명 -> {path}")
+    return store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="플레이어별 피처 저장소 누적 갱신")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help=f"날짜별 파티션 디렉토리 (기본값: {DATA_DIR})")
+    parser.add_argument("--store-dir", type=Path, default=STORE_DIR, help=f"저장소 디렉토리 (기본값: {STORE_DIR})")
+    parser.add_argument("--ap", type=int, default=7, help="activation period (일, 기본값: 7)")
+    parser.add_argument("--force", action="store_true", help="저장된 상태를 버리고 전체 다시 계산")
+    args = parser.parse_args()
+    update(args.data_dir, args.store_dir, args.ap, args.force)
+
+
+if __name__ == "__main__":
+    main()
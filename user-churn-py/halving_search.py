@@ -0,0 +1,256 @@
+"""자원 인지(successive halving) 하이퍼파라미터 탐색.
+
+mode="random" 은 RandomizedSearchCV 처럼 모든 후보를 전체 자원(트리 수 전부, 학습 데이터 전부)으로
+k-fold 평가한다. mode="halving" 은 HalvingRandomSearchCV 처럼 많은 후보를 작은 자원으로
+먼저 평가하고, 점수가 좋은 1/factor 만 남겨 자원을 factor 배로 늘리는 과정을 반복한다.
+마지막 단계는 항상 전체 자원(설정한 최대 트리 수, 학습 데이터 전부)으로 평가한다.
+나쁜 후보는 트리 몇 개, 샘플 수백 개 단계에서 떨어진다.
+
+trial(후보 x 자원) 단위로 평가하므로 StudyStore 를 넘기면 평가가 끝난 trial 을 바로 저장하고,
+같은 데이터/fold 에서 이미 평가한 trial 은 저장된 점수를 쓴다 (재실행/중단 후 이어서 실행).
+탐색이 끝나면 best_params() 형태의 최적 파라미터를 저장소에 따로 기록한다 (StudyStore.best_params 로 읽음).
+
+- 배깅 계열(Random Forest): 자원은 n_estimators
+- 부스팅 계열(XGBoost, LightGBM): 자원은 학습 샘플 수. 트리 수는 탐색하지 않고, 학습 fold 에서 떼어 낸
+  검증 세트로 라이브러리 자체 early stopping 을 걸어 정한다 (EarlyStoppingClassifier)
+
+사용 예:
+    result, search_seconds, best_seconds = tune(model, params, X, y, cv, mode="halving", random_state=42,
+                                                store=StudyStore(), study="Random Forest")
+    best_params(result)
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.model_selection import ParameterSampler, check_cv, cross_validate, train_test_split
+from sklearn.utils import check_random_state
+
+from study_store import cv_fingerprint, data_fingerprint
+
+
+SEARCH_MODES = ("random", "halving")
+# halving 첫 단계 후보 수와 단계마다 남기는 비율 (81 -> 27 -> 9 -> 3 -> 1)
+HALVING_CANDIDATES = 81
+HALVING_FACTOR = 3
+# early stopping 을 거는 부스팅 모델의 최대 트리 수와 중단 기준
+MAX_BOOSTING_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 20
+VALIDATION_FRACTION = 0.1
+
+
+def _is_booster(model) -> bool:
+    return type(model).__module__.split('.')[0] in ('xgboost', 'lightgbm')
+
+
+class EarlyStoppingClassifier(ClassifierMixin, BaseEstimator):
+    """학습 데이터 일부를 검증 세트로 떼어 XGBoost / LightGBM 의 early stopping 으로 트리 수를 정하는 래퍼.
+
+    Args:
+        estimator: XGBClassifier 또는 LGBMClassifier (n_estimators 는 최대 트리 수로 쓴다)
+        validation_fraction: 검증 세트로 쓸 학습 데이터 비율 (라벨 비율 유지)
+        early_stopping_rounds: 검증 손실이 이 횟수만큼 나아지지 않으면 학습을 멈춘다
+        random_state: 검증 세트 분할 시드
+    """
+
+    def __init__(self, estimator, validation_fraction=VALIDATION_FRACTION,
+                 early_stopping_rounds=EARLY_STOPPING_ROUNDS, random_state=None):
+        self.estimator = estimator
+        self.validation_fraction = validation_fraction
+        self.early_stopping_rounds = early_stopping_rounds
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=self.validation_fraction, stratify=y,
+                                                      random_state=self.random_state)
+        model = clone(self.estimator)
+        if type(model).__module__.startswith('lightgbm'):
+            import lightgbm
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)],
+                      callbacks=[lightgbm.early_stopping(self.early_stopping_rounds, verbose=False)])
+            self.n_estimators_ = model.best_iteration_ or model.n_estimators
+        else:
+            model.set_params(early_stopping_rounds=self.early_stopping_rounds)
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+            self.n_estimators_ = model.best_iteration + 1
+        self.estimator_ = model
+        self.classes_ = model.classes_
+        return self
+
+    def predict(self, X):
+        return self.estimator_.predict(X)
+
+    def predict_proba(self, X):
+        return self.estimator_.predict_proba(X)
+
+
+def _search_setup(model, params: dict, mode: str, random_state):
+    """탐색할 (estimator, 파라미터 공간, 자원 이름, 최대 자원) 을 정한다."""
+    params = dict(params)
+    if mode == "random":
+        return model, params, None, None
+    if _is_booster(model):
+        params.pop('n_estimators', None)
+        estimator = EarlyStoppingClassifier(clone(model).set_params(n_estimators=MAX_BOOSTING_ROUNDS),
+                                            random_state=random_state)
+        return estimator, {f"estimator__{k}": v for k, v in params.items()}, 'n_samples', None
+    if 'n_estimators' in params:
+        return model, params, 'n_estimators', max(params.pop('n_estimators'))
+    return model, params, 'n_samples', None
+
+
+def _rungs(n_candidates: int, factor: int, max_resources: int) -> list[tuple[int, int]]:
+    """단계별 (후보 수, 자원) 목록. 후보가 1개 남을 때까지 단계를 두고, 마지막 단계의 자원은 정확히 max_resources.
+
+    자원은 마지막 단계에서 거꾸로 factor 로 나눠 정한다 (HalvingRandomSearchCV 의 min_resources='exhaust' 는
+    작은 쪽에서 곱해 올라가므로 마지막 단계가 max_resources 보다 작을 수 있다).
+    """
+    n_iterations = 1
+    while factor ** n_iterations <= n_candidates:
+        n_iterations += 1
+    return [(-(-n_candidates // factor ** i), max(max_resources // factor ** (n_iterations - 1 - i), 1))
+            for i in range(n_iterations)]
+
+
+def _shuffle_folds(folds, random_state) -> list[tuple[np.ndarray, np.ndarray]]:
+    """fold 마다 학습/테스트 인덱스를 서로 다른 난수로 한 번 섞는다 (_subsample_folds 의 입력)."""
+    rng = check_random_state(random_state)
+    return [(rng.permutation(train_idx), rng.permutation(test_idx)) for train_idx, test_idx in folds]
+
+
+def _subsample_folds(shuffled_folds, fraction: float):
+    """섞어 둔 학습/테스트 fold 의 앞 fraction 만큼을 쓴다.
+
+    단계마다 같은 순서의 앞부분을 잘라 쓰므로 자원이 늘어난 단계의 샘플은 이전 단계의 샘플을 모두 포함하고,
+    fold 마다 섞는 순서가 다르므로 fold 간 샘플 선택은 서로 독립이다.
+    """
+    return [tuple(idx[:max(int(fraction * len(idx)), 1)] for idx in (train_idx, test_idx))
+            for train_idx, test_idx in shuffled_folds]
+
+
+def _evaluate(estimator, params: dict, X, y, folds, scoring, n_jobs) -> tuple[np.ndarray, float, dict]:
+    """trial 하나를 fold 별로 학습/평가하고 (fold 점수, 학습 시간 합, 부가 정보) 를 반환한다."""
+    early_stopping = isinstance(estimator, EarlyStoppingClassifier)
+    scores = cross_validate(clone(estimator).set_params(**params), X, y, cv=folds, scoring=scoring,
+                            n_jobs=n_jobs, return_estimator=early_stopping)
+    attrs = {}
+    if early_stopping:
+        attrs['n_estimators'] = int(round(np.mean([e.n_estimators_ for e in scores['estimator']])))
+    return scores['test_score'], float(scores['fit_time'].sum()), attrs
+
+
+def _rank_score(row: dict) -> float:
+    # 점수 계산에 실패한 trial(nan)은 순위 맨 뒤로 보낸다
+    return -np.inf if np.isnan(row['mean_score']) else row['mean_score']
+
+
+class SearchResult:
+    """tune() 결과.
+
+    Attributes:
+        best_params_: 최적 후보의 파라미터 (탐색한 estimator 기준, early stopping 래퍼는 estimator__ 접두사)
+        best_score_: 최적 후보의 평균 점수 (halving 은 마지막 단계 점수)
+        best_estimator_: 전체 데이터로 다시 학습한 최적 모델
+        trials: trial 별 단계, 파라미터, 자원, 평균 점수, 학습 시간, 저장소 재사용 여부, 경과 시간
+    """
+
+    def __init__(self, best_params_: dict, best_score_: float, best_estimator_, trials: pd.DataFrame):
+        self.best_params_ = best_params_
+        self.best_score_ = best_score_
+        self.best_estimator_ = best_estimator_
+        self.trials = trials
+
+
+def tune(model, params: dict, X, y, cv, mode: str = "halving", n_iter: int = 30, scoring: str = "roc_auc",
+         random_state=None, n_jobs: int = -1, store=None, study: str | None = None):
+    """하이퍼파라미터를 탐색하고 (SearchResult, 탐색 시간, time-to-best) 를 반환한다.
+
+    Args:
+        model: 탐색할 sklearn 호환 모델
+        params: 파라미터 이름 -> 후보 값 목록 (RandomizedSearchCV 형식)
+        X: 피처 행렬 (DataFrame)
+        y: 라벨 배열
+        cv: fold 수 또는 (train, test) 인덱스 목록
+        mode: "random" (n_iter 개 후보를 전체 자원으로 평가) 또는
+              "halving" (배깅은 n_estimators / 부스팅은 샘플 수 + early stopping 을 자원으로 successive halving)
+        n_iter: mode="random" 의 후보 수
+        scoring: 평가 지표
+        random_state: 후보 샘플링 / 샘플 축소 시드
+        n_jobs: fold 병렬 작업 수
+        store: StudyStore (None 이면 저장/재사용하지 않음)
+        study: 저장소의 study 이름 (store 를 넘기면 필수)
+    Returns:
+        (SearchResult, 탐색 경과 시간(초, 최종 refit 제외), time-to-best(초, 최종 최적 trial 평가가 끝난 시점))
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"지원하지 않는 탐색 방식: {mode} (가능: {', '.join(SEARCH_MODES)})")
+    if store is not None and study is None:
+        raise ValueError("store 를 쓰려면 study 이름이 필요합니다")
+    y = np.ravel(y)
+    folds = list(check_cv(cv, y, classifier=True).split(X, y))
+    estimator, space, resource, max_resources = _search_setup(model, params, mode, random_state)
+
+    # 파라미터 공간이 후보 수보다 작으면 ParameterSampler 가 가능한 조합 수만큼만 돌려준다
+    candidates = list(ParameterSampler(space, n_iter if mode == "random" else HALVING_CANDIDATES,
+                                       random_state=random_state))
+    if mode == "random":
+        rungs = [(len(candidates), None)]
+    else:
+        max_resources = max_resources or len(y)
+        rungs = _rungs(len(candidates), HALVING_FACTOR, max_resources)
+        shuffled_folds = _shuffle_folds(folds, random_state) if resource == 'n_samples' else None
+    keys = (data_fingerprint(X, y), cv_fingerprint(folds), scoring) if store is not None else None
+
+    rows = []
+    started = time.perf_counter()
+    for rung, (n_keep, n_resources) in enumerate(rungs):
+        if rung > 0:
+            # 직전 단계 점수 상위 n_keep 개만 다음 단계로 올린다
+            previous = [r for r in rows if r['rung'] == rung - 1]
+            order = np.argsort([-_rank_score(r) for r in previous], kind='stable')[:n_keep]
+            candidates = [previous[i]['candidate'] for i in sorted(order)]
+        fraction = 1.0
+        rung_folds = folds
+        rung_keys = keys
+        if resource == 'n_samples' and n_resources < max_resources:
+            fraction = n_resources / max_resources
+            rung_folds = _subsample_folds(shuffled_folds, fraction)
+            if store is not None:
+                # 줄인 fold 는 시드에 따라 달라지므로 실제로 쓴 인덱스로 trial 을 식별한다
+                rung_keys = (keys[0], cv_fingerprint(rung_folds), scoring)
+        for candidate in candidates:
+            trial_params = dict(candidate, n_estimators=n_resources) if resource == 'n_estimators' else candidate
+            saved = store.get(study, *rung_keys, trial_params, fraction) if store is not None else None
+            if saved is None:
+                fold_scores, fit_seconds, attrs = _evaluate(estimator, trial_params, X, y, rung_folds, scoring, n_jobs)
+                if store is not None:
+                    store.record(study, *rung_keys, trial_params, fold_scores, fit_seconds, fraction, attrs)
+            else:
+                fold_scores, fit_seconds = saved['fold_scores'], saved['fit_seconds']
+            rows.append({'rung': rung, 'candidate': candidate, 'params': trial_params, 'n_resources': n_resources,
+                         'mean_score': float(np.mean(fold_scores)), 'fit_seconds': fit_seconds,
+                         'cached': saved is not None, 'elapsed': time.perf_counter() - started})
+    search_seconds = time.perf_counter() - started
+
+    final = [r for r in rows if r['rung'] == len(rungs) - 1]
+    best = max(final, key=_rank_score)
+    best_estimator = clone(estimator).set_params(**best['params']).fit(X, y)
+    trials = pd.DataFrame(rows).drop(columns='candidate')
+    result = SearchResult(best['params'], best['mean_score'], best_estimator, trials)
+    if store is not None:
+        store.record_best(study, *keys, mode, best_params(result), best['mean_score'])
+    return result, search_seconds, best['elapsed']
+
+
+def best_params(result) -> dict:
+    """원래 모델에 바로 넣을 수 있는 최적 파라미터.
+
+    halving 탐색의 자원(n_estimators)은 best_params_ 에 이미 들어 있고, early stopping 래퍼는
+    접두사(estimator__)를 떼고 최종 refit 에서 멈춘 트리 수를 n_estimators 로 채운다.
+    """
+    params = {k.removeprefix('estimator__'): v for k, v in result.best_params_.items()}
+    if isinstance(result.best_estimator_, EarlyStoppingClassifier):
+        params['n_estimators'] = int(result.best_estimator_.n_estimators_)
+    return params
@@ -1,22 +1,48 @@
 import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import check_cv, cross_val_score
 from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.naive_bayes import GaussianNB
 from sklearn.svm import SVC
 
 
-def knn_classifier(X_train, y_train, X_test, y_test):
-    neighbors = []
-    cv_scores = []
+def _knn_cv_scores(X, y, neighbors, cv):
+    """k 후보마다 cross_val_score(KNeighborsClassifier(k), scoring='accuracy') 의 평균을 계산한다.
+
+    fold 마다 가장 큰 k(+1) 로 이웃을 한 번만 찾고, 거리순 이웃 표의 앞쪽 k 개 라벨로 다수결을 내서
+    모든 k 를 채점한다. k 번째와 k+1 번째 이웃의 거리가 같은 행(중복 행 등)은 어느 이웃이 들어가는지가
+    n_neighbors 에 따라 달라지므로, 그 행만 n_neighbors=k 로 이웃을 다시 찾아 결과를 똑같이 맞춘다.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    classes, y_codes = np.unique(y, return_inverse=True)
+    one_hot = np.eye(len(classes), dtype=np.int32)
+    max_k = max(neighbors)
+    fold_scores = {k: [] for k in neighbors}
+    for train_idx, test_idx in check_cv(cv, y, classifier=True).split(X, y):
+        y_fold = y_codes[train_idx]
+        X_val = X[test_idx]
+        n_neighbors = min(max_k + 1, len(train_idx))
+        knn = KNeighborsClassifier(n_neighbors=n_neighbors).fit(X[train_idx], y_fold)
+        dist, neigh_ind = knn.kneighbors(X_val)
+        # votes[:, j, c]: 가까운 순서로 j+1 번째 이웃까지 중 클래스 c 의 수
+        votes = np.cumsum(one_hot[y_fold[neigh_ind]], axis=1)
+        for k in neighbors:
+            # 동률이면 argmax 가 앞쪽(작은) 클래스를 고른다 (KNeighborsClassifier.predict 와 같다)
+            pred = votes[:, k - 1].argmax(axis=1)
+            if k < n_neighbors:
+                tied = np.flatnonzero(np.isclose(dist[:, k - 1], dist[:, k], rtol=1e-7, atol=1e-12))
+                if len(tied):
+                    # predict(n_neighbors=k) 가 고르는 이웃 그대로 다수결 (검증/최빈값 계산 오버헤드 없이)
+                    tied_ind = knn.kneighbors(X_val[tied], n_neighbors=k, return_distance=False)
+                    pred[tied] = one_hot[y_fold[tied_ind]].sum(axis=1).argmax(axis=1)
+            fold_scores[k].append(np.mean(pred == y_codes[test_idx]))
+    return [np.mean(fold_scores[k]) for k in neighbors]
+
 
-    for k in range(1, 16, 2):
-        neighbors.append(k)
-        knn = KNeighborsClassifier(n_neighbors=k)
-        knn.fit(X_train, np.ravel(y_train))
-        scores = cross_val_score(knn, X_train, np.ravel(y_train), cv=7, scoring='accuracy')
-        cv_scores.append(scores.mean())
+def knn_classifier(X_train, y_train, X_test, y_test):
+    neighbors = list(range(1, 16, 2))
+    cv_scores = _knn_cv_scores(X_train, np.ravel(y_train), neighbors, cv=7)
 
     # Misclassification error versus k
     MSE = [1 - x for x in cv_scores]
@@ -27,9 +53,11 @@ def knn_classifier(X_train, y_train, X_test, y_test):
 
     model = KNeighborsClassifier(n_neighbors=optimal_k)
     model.fit(X_train, np.ravel(y_train))
-    y_pred = np.ravel(model.predict(X_test))
+    # 이웃 검색은 한 번만: 균등 가중치에서 predict 는 predict_proba 의 argmax 와 같다 (동률이면 앞쪽 클래스)
+    proba = model.predict_proba(X_test)
+    y_pred = model.classes_[proba.argmax(axis=1)]
 
-    auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    auc = roc_auc_score(y_test, proba[:, 1])
     print('kNN Classification Report : \n')
     print(classification_report(y_test, y_pred))
     print(f'Accuracy: {accuracy_score(y_test, y_pred) * 100:.2f}%  |  AUC-ROC: {auc:.4f}  |  best k={optimal_k}')
@@ -37,9 +65,10 @@ def knn_classifier(X_train, y_train, X_test, y_test):
     return y_test, y_pred, model
 
 
-def random_forest_classifier(X_train, y_train, X_test, y_test):
-    model = RandomForestClassifier(n_estimators=100, max_depth=10, min_samples_split=5,
-                                   class_weight='balanced', random_state=42)
+def random_forest_classifier(X_train, y_train, X_test, y_test, params=None):
+    # params: 기본 하이퍼파라미터를 덮어쓸 값 (예: 튜닝 저장소의 최적 파라미터)
+    model = RandomForestClassifier(**{'n_estimators': 100, 'max_depth': 10, 'min_samples_split': 5,
+                                      'class_weight': 'balanced', 'random_state': 42, **(params or {})})
     model.fit(X_train, np.ravel(y_train))
 
     y_pred = model.predict(X_test)
@@ -81,12 +110,12 @@ def support_vector_classifier(X_train, y_train, X_test, y_test):
     print('----------------------------------------------')
 
 
-def xgboost_classifier(X_train, y_train, X_test, y_test):
+def xgboost_classifier(X_train, y_train, X_test, y_test, params=None):
     from xgboost import XGBClassifier
 
-    model = XGBClassifier(n_estimators=200, max_depth=6, learning_rate=0.1,
-                          scale_pos_weight=(np.ravel(y_train) == 0).sum() / (np.ravel(y_train) == 1).sum(),
-                          eval_metric='logloss', random_state=42)
+    model = XGBClassifier(**{'n_estimators': 200, 'max_depth': 6, 'learning_rate': 0.1,
+                             'scale_pos_weight': (np.ravel(y_train) == 0).sum() / (np.ravel(y_train) == 1).sum(),
+                             'eval_metric': 'logloss', 'random_state': 42, **(params or {})})
     model.fit(X_train, np.ravel(y_train))
 
     y_pred = model.predict(X_test)
@@ -100,11 +129,11 @@ def xgboost_classifier(X_train, y_train, X_test, y_test):
     return y_test, y_pred, model
 
 
-def lightgbm_classifier(X_train, y_train, X_test, y_test):
+def lightgbm_classifier(X_train, y_train, X_test, y_test, params=None):
     from lightgbm import LGBMClassifier
 
-    model = LGBMClassifier(n_estimators=200, max_depth=6, learning_rate=0.1,
-                           is_unbalance=True, random_state=42, verbose=-1)
+    model = LGBMClassifier(**{'n_estimators': 200, 'max_depth': 6, 'learning_rate': 0.1,
+                              'is_unbalance': True, 'random_state': 42, 'verbose': -1, **(params or {})})
     model.fit(X_train, np.ravel(y_train))
 
     y_pred = model.predict(X_test)
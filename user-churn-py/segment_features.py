@@ -0,0 +1,577 @@
+"""(플레이어, date) 순으로 정렬된 배열 위에서 피처를 계산하는 세그먼트 엔진.
+
+data_loader.filter_df_with_names(backend='numpy') 와 data_loader.filter_df_multi() 가 사용한다.
+플레이어 이름은 pd.factorize 로 한 번만 정수 코드로 바꾸고, 이후에는 코드 순으로 정렬된
+배열과 플레이어별 구간 시작 위치(starts)만으로 연속 승/패, 세션, 게임 순번, 간격 같은
+행 단위 피처와 플레이어별 집계를 NumPy 연산(np.*.reduceat, 누적 연산)으로 계산한다.
+groupby('name') 를 반복하며 키를 다시 해시하지 않는다.
+
+각 피처와 중간값은 필요한 원본 컬럼과 다른 단계를 선언한 레지스트리(_STEPS)에 등록되어 있고,
+feature_plan() 이 요청한 피처에 필요한 단계만 의존 순서대로 골라 실행 계획을 만든다.
+일부 피처만 요청하면 쓰지 않는 컬럼은 정렬하지도 않고 중간값도 만들지 않는다.
+
+PlayerTimeline 은 정렬과 첫 접속 시각 계산을 한 번만 해 두고, 여러 AP/COP 조합에 재사용한다.
+각 플레이어의 매치가 시간순이므로 AP 내 행은 플레이어 구간의 앞부분(prefix)이고,
+이탈 라벨은 AP 이후 첫 재접속 시각 하나로 모든 COP 에 대해 바로 정해진다.
+
+결과 프레임은 pandas 구현(backend='pandas')과 컬럼, 순서, dtype 이 같다.
+"""
+
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+def _traced(func, *args):
+    """func(*args) 를 실행하고 (결과, 실행 중 tracemalloc 최대 할당량 바이트)를 반환한다."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return result, peak - base
+
+
+def _timedelta(days: float, unit: str) -> np.timedelta64:
+    """일 수를 date 배열과 같은 단위의 timedelta64 로 변환한다."""
+    return pd.Timedelta(days=days).to_numpy().astype(f"m8[{unit}]")
+
+
+def segment_starts(codes: np.ndarray) -> np.ndarray:
+    """같은 코드가 이어지는 구간(세그먼트)마다 시작 위치를 반환한다.
+
+    Args:
+        codes: 같은 플레이어끼리 붙어 있는 정수 코드 배열
+    Returns:
+        세그먼트 시작 인덱스 배열 (첫 원소는 항상 0)
+    """
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.r_[0, np.flatnonzero(codes[1:] != codes[:-1]) + 1]
+
+
+def _seg_std(values: np.ndarray, starts: np.ndarray, counts: np.ndarray, seg: np.ndarray) -> np.ndarray:
+    """세그먼트별 표본 표준편차 (ddof=1). 원소가 1개인 세그먼트는 0."""
+    mean = np.add.reduceat(values, starts) / counts
+    dev = values - mean[seg]
+    ss = np.add.reduceat(dev * dev, starts)
+    var = np.divide(ss, counts - 1, out=np.zeros_like(ss), where=counts > 1)
+    return np.sqrt(var)
+
+
+# compute_features(low_memory=True) 가 전체 행을 한 번에 다루는 대신 끊어 읽는 단위
+LOW_MEMORY_CHUNK_ROWS = 1 << 20
+
+# 피처 계산에 쓰는 원본 값 컬럼 (name, date 외)
+VALUE_COLUMNS = ('win', 'score', 'points', 'degree')
+
+# filter_df_with_names() 결과의 피처 컬럼 순서 (name, 라벨 제외)
+FEATURE_COLUMNS = [
+    'score_mean', 'score_std', 'points_mean', 'degree_mean', 'win_rate', 'win_count', 'lose_count',
+    'winning_streak', 'losing_streak', 'game_count', 'active_days', 'engagement_hours', 'avg_gap_min',
+    'hour_std', 'weekend_ratio', 'peak_hour_ratio', 'first_game_win', 'comeback_after_loss', 'session_count',
+    'games_per_day', 'games_per_session', 'activity_decline', 'score_trend',
+]
+
+
+class PlayerTimeline:
+    """플레이어별로 시간순 정렬된 매치 배열.
+
+    첫 접속 후 horizon_days 일 이내의 행만 남기고 (플레이어, date) 순으로 한 번 정렬해 둔다.
+    features() / labels() 는 이 배열만 보고 계산하므로 AP/COP 를 바꿔도 다시 정렬하거나
+    이름을 해시하지 않는다. 이탈 라벨이 정확하려면 horizon_days 가 AP + COP 이상이어야 한다.
+
+    Args:
+        df: name, date 와 value_columns 컬럼을 가진 매치 데이터
+        horizon_days: 첫 접속 이후 남길 기간 (일). None 이면 모든 행을 남긴다.
+        presorted: df 가 이미 (플레이어, date) 순으로 정렬되어 있으면 True
+        value_columns: 정렬해 둘 값 컬럼 (기본값: VALUE_COLUMNS 전체).
+            일부 피처만 계산할 때는 feature_inputs() 결과를 넘기면 나머지 컬럼을 복사하지 않는다.
+        first_seen: name -> 전체 이력 기준 첫 매치 시각 Series (data_loader.load_first_seen).
+            주어지면 첫 매치가 df 범위보다 앞선 플레이어(기간 중간에 이어서 플레이한 기존 유저)를 뺀다.
+    """
+
+    def __init__(self, df: pd.DataFrame, horizon_days=None, presorted=False, value_columns=VALUE_COLUMNS,
+                 first_seen=None):
+        codes, self.names = pd.factorize(df['name'], sort=True)
+        dates = df['date'].to_numpy()
+        self.unit = np.datetime_data(dates.dtype)[0]
+
+        # 플레이어별 첫 접속 시각은 전체 행에서 계산
+        first = np.full(len(self.names), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first, codes, dates.view(np.int64))
+        first = first.view(dates.dtype)
+
+        if horizon_days is None:
+            keep = np.ones(len(codes), dtype=bool)
+        else:
+            keep = dates <= first[codes] + _timedelta(horizon_days, self.unit)
+        if first_seen is not None:
+            registered = pd.DatetimeIndex(first_seen.reindex(self.names)).as_unit(self.unit).to_numpy()
+            preexisting = registered < first
+            if preexisting.any():
+                # 남은 플레이어의 코드를 0 부터 다시 매긴다 (이름 순서는 그대로)
+                keep &= ~preexisting[codes]
+                codes = np.cumsum(~preexisting)[codes] - 1
+                self.names = self.names[~preexisting]
+                first = first[~preexisting]
+        keep = np.flatnonzero(keep)
+        if presorted:
+            order = keep[np.argsort(codes[keep], kind='stable')]
+        else:
+            order = keep[np.lexsort((dates[keep], codes[keep]))]
+
+        # 모든 플레이어가 첫 접속 행을 가지므로 세그먼트 i 는 코드 i 의 플레이어다
+        self.codes = codes[order]
+        self.dates = dates[order]
+        self.values = {col: df[col].to_numpy(dtype=np.float64)[order] for col in value_columns}
+        self.starts = segment_starts(self.codes)
+        self.counts = np.diff(np.r_[self.starts, len(order)])
+        self.seg = np.repeat(np.arange(len(self.starts)), self.counts)
+        self.first = first
+        self._first_order = None
+
+    def __len__(self):
+        """플레이어 수"""
+        return len(self.names)
+
+    def first_return(self, activation_period) -> np.ndarray:
+        """AP 가 끝난 뒤 처음 다시 접속한 시각 (없으면 NaT).
+
+        Args:
+            activation_period: 활성 기간 (일)
+        Returns:
+            플레이어(코드) 순 datetime64 배열
+        """
+        cutoff = self.first + _timedelta(activation_period, self.unit)
+        ticks = self.dates.view(np.int64)
+        never = np.iinfo(np.int64).max
+        after = np.where(self.dates > cutoff[self.seg], ticks, never)
+        first_return = np.minimum.reduceat(after, self.starts)
+        first_return = first_return.view(self.dates.dtype).copy()
+        first_return[first_return.view(np.int64) == never] = np.datetime64('NaT')
+        return first_return
+
+    def labels(self, activation_period, churn_observation_period, first_return=None) -> np.ndarray:
+        """COP 안에 다시 접속했으면 1(유지), 아니면 0(이탈).
+
+        Args:
+            activation_period: 활성 기간 (일)
+            churn_observation_period: 이탈 관찰 기간 (일)
+            first_return: 같은 AP 로 미리 구한 first_return() 결과 (여러 COP 에 재사용)
+        Returns:
+            플레이어(코드) 순 int64 배열
+        """
+        if first_return is None:
+            first_return = self.first_return(activation_period)
+        deadline = self.first + _timedelta(activation_period + churn_observation_period, self.unit)
+        return (first_return < deadline).astype(np.int64)
+
+    def features(self, activation_period, features=None) -> pd.DataFrame:
+        """AP 내 매치로 플레이어별 피처를 계산한다 (라벨 컬럼 제외, name 순).
+
+        Args:
+            activation_period: 활성 기간 (일)
+            features: 계산할 피처 이름 목록 (None 이면 FEATURE_COLUMNS 전체)
+        Returns:
+            name 과 요청한 피처 컬럼의 DataFrame
+        """
+        features = FEATURE_COLUMNS if features is None else list(features)
+        plan = feature_plan(features)
+        in_ap = np.flatnonzero(self.dates <= self.first[self.seg] + _timedelta(activation_period, self.unit))
+        return _aggregate(self.names, self.codes[in_ap], self._columns(in_ap, plan), activation_period,
+                          self.unit, features, plan)
+
+    def _columns(self, rows, plan) -> dict:
+        """실행 계획이 읽는 원본 컬럼(date 포함)을 rows 위치만 모아 반환한다."""
+        value_columns = [col for col in _plan_inputs(plan) if col != 'date']
+        missing = [col for col in value_columns if col not in self.values]
+        if missing:
+            raise ValueError(f"PlayerTimeline 에 없는 컬럼이 필요합니다: {missing}")
+        columns = {col: self.values[col][rows] for col in value_columns}
+        columns['date'] = self.dates[rows]
+        return columns
+
+    def as_of(self, cutoff, activation_period=7, features=None) -> pd.DataFrame:
+        """cutoff 시점에 아직 AP 안에 있는 플레이어의 피처를 cutoff 까지의 매치로 계산한다.
+
+        첫 접속이 [cutoff - AP, cutoff] 인 플레이어만 첫 접속 순 인덱스에서 골라 그 구간의 앞부분만
+        모으므로, cutoff 마다 전체 배열을 다시 거르지 않는다. cutoff 가 첫 접속 + AP 와 같으면
+        features() 와 같은 값이 된다. 아직 관찰 기간이 끝나지 않았으므로 라벨은 없다.
+
+        Args:
+            cutoff: 기준 시각 (이 시각까지의 매치를 포함)
+            activation_period: 활성 기간 (일)
+            features: 계산할 피처 이름 목록 (None 이면 FEATURE_COLUMNS 전체)
+        Returns:
+            name 과 요청한 피처 컬럼의 DataFrame (name 순). 해당 플레이어가 없으면 빈 DataFrame
+        """
+        features = FEATURE_COLUMNS if features is None else list(features)
+        plan = feature_plan(features)
+        if self._first_order is None:
+            self._first_order = np.argsort(self.first, kind='stable')
+        cutoff = pd.Timestamp(cutoff).to_datetime64().astype(self.dates.dtype)
+        by_first = self.first[self._first_order]
+        lo = np.searchsorted(by_first, cutoff - _timedelta(activation_period, self.unit), side='left')
+        hi = np.searchsorted(by_first, cutoff, side='right')
+        active = np.sort(self._first_order[lo:hi])
+        if len(active) == 0:
+            return pd.DataFrame(columns=['name', *features])
+
+        # 활성 플레이어 구간의 행 번호를 이어 붙이고 cutoff 이후 행을 뺀다 (구간마다 앞부분만 남는다)
+        starts, counts = self.starts[active], self.counts[active]
+        offsets = np.cumsum(counts) - counts
+        rows = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+        rows = rows[self.dates[rows] <= cutoff]
+        return _aggregate(self.names, self.codes[rows], self._columns(rows, plan), activation_period,
+                          self.unit, features, plan)
+
+
+# ---------------------------------------------------------------------------
+# 피처 레지스트리
+# ---------------------------------------------------------------------------
+# 단계 이름 -> (필요한 원본 컬럼/다른 단계, 계산 함수).
+# 계산 함수는 지금까지 계산된 값이 담긴 dict 를 받는다. dict 에는 처음부터 원본 컬럼(date, 값 컬럼),
+# 플레이어 구간(starts, counts), 행 수 n, activation_period, unit 이 들어 있다.
+# FEATURE_COLUMNS 의 피처도 단계이고, 여러 피처가 쓰는 중간값(seg, streak, gap_min ...)은 한 번만 계산된다.
+_STEPS = {}
+_BASE = ('starts', 'counts', 'n', 'activation_period', 'unit')
+
+
+def _step(name, *requires):
+    def register(func):
+        _STEPS[name] = (requires, func)
+        return func
+    return register
+
+
+def feature_plan(features) -> list[str]:
+    """요청한 피처를 계산하는 데 필요한 단계를 의존 순서대로 반환한다.
+
+    Args:
+        features: 피처 이름 목록 (FEATURE_COLUMNS 의 부분집합)
+    Returns:
+        실행할 단계 이름 목록 (원본 컬럼 이름 포함, 의존하는 단계가 항상 먼저 온다)
+    """
+    unknown = [f for f in features if f not in FEATURE_COLUMNS]
+    if unknown:
+        raise ValueError(f"알 수 없는 피처: {unknown}")
+
+    plan = []
+    visited = set(_BASE)
+
+    def _visit(name):
+        if name in visited:
+            return
+        visited.add(name)
+        if name in _STEPS:
+            for dep in _STEPS[name][0]:
+                _visit(dep)
+        plan.append(name)
+
+    for feature in features:
+        _visit(feature)
+    return plan
+
+
+def _plan_inputs(plan) -> list[str]:
+    return [name for name in plan if name not in _STEPS]
+
+
+def feature_inputs(features) -> list[str]:
+    """요청한 피처를 계산하는 데 필요한 값 컬럼 (VALUE_COLUMNS 중 일부, date 제외)."""
+    return [col for col in _plan_inputs(feature_plan(features)) if col != 'date']
+
+
+# 행 단위 중간값
+_step('seg', 'counts')(lambda c: np.repeat(np.arange(len(c['counts'])), c['counts']))
+_step('pos')(lambda c: np.arange(c['n']))
+_step('seq', 'pos', 'starts', 'seg')(lambda c: c['pos'] - c['starts'][c['seg']])
+
+
+@_step('is_first')
+def _is_first(c):
+    is_first = np.zeros(c['n'], dtype=bool)
+    is_first[c['starts']] = True
+    return is_first
+
+
+_step('hours_per_unit')(lambda c: np.timedelta64(1, 'h').astype(f"m8[{c['unit']}]").astype(np.float64))
+
+
+# 연속된 승/패: 결과(승=1, 패=0, 무=-1)가 바뀌거나 플레이어가 바뀌면 새 연속 구간
+@_step('outcome', 'win')
+def _outcome(c):
+    win = c['win']
+    return np.where(win == 1.0, 1, np.where(win == 0.0, 0, -1))
+
+
+@_step('streak', 'outcome', 'is_first', 'pos')
+def _streak(c):
+    outcome, pos = c['outcome'], c['pos']
+    run_start = c['is_first'].copy()
+    run_start[1:] |= outcome[1:] != outcome[:-1]
+    return pos - np.maximum.accumulate(np.where(run_start, pos, 0)) + 1
+
+
+_step('losing_streak_row', 'streak', 'outcome')(lambda c: c['streak'] * (c['outcome'] == 0))
+
+
+# 시간 기반 중간값
+_step('day', 'date')(lambda c: c['date'].astype('M8[D]'))
+_step('hour', 'date', 'day')(lambda c: (c['date'].astype('M8[h]') - c['day']).astype(np.int64).astype(np.float64))
+
+
+@_step('new_day', 'day', 'is_first')
+def _new_day(c):
+    day = c['day'].view(np.int64)
+    new_day = c['is_first'].copy()
+    new_day[1:] |= day[1:] != day[:-1]
+    return new_day
+
+
+@_step('gap_min', 'date', 'hours_per_unit')
+def _gap_min(c):
+    dates = c['date']
+    gap_min = np.zeros(c['n'], dtype=np.float64)
+    gap_min[1:] = (dates[1:] - dates[:-1]).astype(np.int64) / (c['hours_per_unit'] / 60)
+    return gap_min
+
+
+# 세션 구분 (30분 이상 간격이면 새 세션)
+_step('new_session', 'is_first', 'gap_min')(lambda c: c['is_first'] | (c['gap_min'] > 30))
+
+
+# 활동 감소율 (AP 전반부 vs 후반부 게임 수)
+@_step('first_half_games', 'date', 'seg')
+def _first_half_games(c):
+    first_date = c['date'][c['starts']]
+    first_half = c['date'] <= first_date[c['seg']] + _timedelta(c['activation_period'] / 2, c['unit'])
+    return np.add.reduceat(first_half.astype(np.int64), c['starts'])
+
+
+# 플레이어별 피처
+_step('score_mean', 'score')(lambda c: np.add.reduceat(c['score'], c['starts']) / c['counts'])
+_step('score_std', 'score', 'seg')(lambda c: _seg_std(c['score'], c['starts'], c['counts'], c['seg']))
+_step('points_mean', 'points')(lambda c: np.add.reduceat(c['points'], c['starts']) / c['counts'])
+_step('degree_mean', 'degree')(lambda c: np.add.reduceat(c['degree'], c['starts']) / c['counts'])
+_step('win_count', 'win')(lambda c: np.add.reduceat(c['win'], c['starts']))
+_step('win_rate', 'win_count')(lambda c: c['win_count'] / c['counts'])
+_step('lose_count', 'win')(lambda c: np.add.reduceat(1 - c['win'], c['starts']))
+_step('winning_streak', 'streak', 'outcome')(
+    lambda c: np.maximum.reduceat(c['streak'] * (c['outcome'] == 1), c['starts']).astype(np.int64))
+_step('losing_streak', 'losing_streak_row')(
+    lambda c: np.maximum.reduceat(c['losing_streak_row'], c['starts']).astype(np.int64))
+_step('game_count')(lambda c: c['counts'].astype(np.int64))
+_step('active_days', 'new_day')(lambda c: np.add.reduceat(c['new_day'].astype(np.int64), c['starts']))
+
+
+@_step('engagement_hours', 'date', 'hours_per_unit')
+def _engagement_hours(c):
+    starts = c['starts']
+    span = c['date'][starts + c['counts'] - 1] - c['date'][starts]
+    return span.astype(np.int64) / c['hours_per_unit']
+
+
+@_step('avg_gap_min', 'gap_min', 'is_first')
+def _avg_gap_min(c):
+    counts = c['counts']
+    gap_sum = np.add.reduceat(np.where(c['is_first'], 0.0, c['gap_min']), c['starts'])
+    return np.divide(gap_sum, counts - 1, out=np.zeros(len(counts)), where=counts > 1)
+
+
+_step('hour_std', 'hour', 'seg')(lambda c: _seg_std(c['hour'], c['starts'], c['counts'], c['seg']))
+# 주말(토, 일) / 피크타임(18~24시) 플레이 (1970-01-01 은 목요일)
+_step('weekend_ratio', 'day')(
+    lambda c: np.add.reduceat(((c['day'].view(np.int64) + 3) % 7 >= 5).astype(np.float64), c['starts'])
+    / c['counts'])
+_step('peak_hour_ratio', 'hour')(
+    lambda c: np.add.reduceat(((c['hour'] >= 18) & (c['hour'] <= 23)).astype(np.float64), c['starts'])
+    / c['counts'])
+# 첫 게임 승패 / 3연패 이상을 겪은 뒤에도 계속 플레이했는지
+_step('first_game_win', 'win')(lambda c: c['win'][c['starts']])
+_step('comeback_after_loss', 'losing_streak_row')(
+    lambda c: np.maximum.reduceat(c['losing_streak_row'] >= 3, c['starts']).astype(np.int64))
+_step('session_count', 'new_session')(lambda c: np.add.reduceat(c['new_session'].astype(np.int64), c['starts']))
+_step('games_per_day', 'active_days')(lambda c: c['counts'] / np.maximum(c['active_days'], 1))
+_step('games_per_session', 'session_count')(lambda c: c['counts'] / np.maximum(c['session_count'], 1))
+_step('activity_decline', 'first_half_games')(
+    lambda c: (2 * c['first_half_games'] - c['counts']) / np.maximum(c['counts'], 1))
+
+
+# 게임 순번 대비 점수 기울기 (data_loader._score_trend 와 같은 closed-form)
+@_step('score_trend', 'score', 'seq', 'seg')
+def _score_trend(c):
+    counts = c['counts']
+    fcounts = counts.astype(np.float64)
+    xc = c['seq'] - (fcounts[c['seg']] - 1) / 2
+    sxx = fcounts * (fcounts * fcounts - 1) / 12
+    return np.divide(np.add.reduceat(xc * c['score'], c['starts']), sxx,
+                     out=np.zeros(len(counts)), where=counts >= 2)
+
+
+def _aggregate(names, codes, columns, activation_period, unit, features=FEATURE_COLUMNS,
+               plan=None, low_memory=False) -> pd.DataFrame:
+    """(플레이어, date) 순으로 정렬된 AP 내 매치 배열에서 요청한 플레이어별 피처만 계산한다.
+
+    Args:
+        names: 코드 -> 플레이어 이름
+        codes: 행별 플레이어 코드
+        columns: 원본 컬럼 이름 -> 배열 (또는 배열을 돌려주는 함수. 실행 계획에서 처음 쓰일 때 호출한다)
+        activation_period: 활성 기간 (일)
+        unit: date 배열의 시간 단위
+        features: 계산할 피처 이름 목록 (결과 컬럼 순서)
+        plan: 미리 구한 feature_plan(features) 결과
+        low_memory: True 면 원본 컬럼과 중간값을 마지막으로 쓰는 단계가 끝나는 즉시 버린다
+    Returns:
+        name 과 요청한 피처 컬럼의 DataFrame
+    """
+    plan = feature_plan(features) if plan is None else plan
+    starts = segment_starts(codes)
+    context = dict(starts=starts, counts=np.diff(np.r_[starts, len(codes)]), n=len(codes),
+                   activation_period=activation_period, unit=unit)
+    result_df = pd.DataFrame({'name': names[codes[starts]]})
+    del codes
+
+    last_use = {}
+    if low_memory:
+        for i, name in enumerate(plan):
+            for dep in _STEPS[name][0] if name in _STEPS else ():
+                if dep not in _BASE:
+                    last_use[dep] = i
+
+    for i, name in enumerate(plan):
+        if name in _STEPS:
+            context[name] = _STEPS[name][1](context)
+        else:
+            source = columns[name]
+            context[name] = source() if callable(source) else source
+        if name in features:
+            result_df[name] = context[name]
+        if low_memory:
+            for dep in _STEPS[name][0] if name in _STEPS else ():
+                if last_use.get(dep) == i:
+                    del context[dep]
+    return result_df[['name', *features]]
+
+
+def _compute_features_low_memory(df, activation_period, churn_observation_period, churn_column, features,
+                                 first_seen) -> pd.DataFrame:
+    """compute_features(low_memory=True) 의 본체.
+
+    입력 컬럼은 복사하지 않고 NumPy 뷰로만 읽는다. 첫 접속, 첫 재접속, AP 내 행 선택은
+    정렬 없이 LOW_MEMORY_CHUNK_ROWS 행씩 끊어 scatter-min 으로 구하므로 임시 배열이 청크 크기로 제한된다.
+    정렬은 AP 내 행 번호에만 하고, 값 컬럼은 실행 계획에서 처음 쓰일 때 그 행만 모아 float64 로 바꾼다.
+    """
+    codes, names = pd.factorize(df['name'], sort=True)
+    dates = df['date'].to_numpy()
+    unit = np.datetime_data(dates.dtype)[0]
+    ticks = dates.view(np.int64)
+    ap = _timedelta(activation_period, unit).astype(np.int64)
+    never = np.iinfo(np.int64).max
+    chunks = [slice(i, i + LOW_MEMORY_CHUNK_ROWS) for i in range(0, len(codes), LOW_MEMORY_CHUNK_ROWS)]
+
+    first = np.full(len(names), never, dtype=np.int64)
+    for chunk in chunks:
+        np.minimum.at(first, codes[chunk], ticks[chunk])
+
+    first_return = np.full(len(names), never, dtype=np.int64)
+    in_ap = []
+    for chunk in chunks:
+        chunk_codes, chunk_ticks = codes[chunk], ticks[chunk]
+        after = chunk_ticks > first[chunk_codes] + ap
+        np.minimum.at(first_return, chunk_codes[after], chunk_ticks[after])
+        in_ap.append(np.flatnonzero(~after) + chunk.start)
+    in_ap = np.concatenate(in_ap) if in_ap else np.zeros(0, dtype=np.int64)
+    order = in_ap[np.lexsort((ticks[in_ap], codes[in_ap]))]
+    del in_ap
+
+    plan = feature_plan(features)
+    columns = {'date': lambda: dates[order]}
+    for col in _plan_inputs(plan):
+        if col != 'date':
+            columns[col] = lambda col=col: df[col].to_numpy()[order].astype(np.float64, copy=False)
+    result_df = _aggregate(names, codes[order], columns, activation_period, unit, features, plan, low_memory=True)
+    del order
+
+    deadline = first + _timedelta(activation_period + churn_observation_period, unit).astype(np.int64)
+    result_df[churn_column] = (first_return < deadline).astype(np.int64)
+    if first_seen is not None:
+        registered = pd.DatetimeIndex(first_seen.reindex(names)).as_unit(unit).to_numpy().view(np.int64)
+        preexisting = (registered != np.iinfo(np.int64).min) & (registered < first)
+        result_df = result_df[~preexisting].reset_index(drop=True)
+    return result_df
+
+
+def compute_features(df: pd.DataFrame, activation_period=7, churn_observation_period=7,
+                     churn_column='played_next_7_days', presorted=False, features=None,
+                     first_seen=None, low_memory=False) -> pd.DataFrame:
+    """플레이어별 피처와 이탈 라벨을 세그먼트 연산으로 계산한다.
+
+    Args:
+        df: name, date, win, score, points, degree 컬럼을 가진 매치 데이터
+        activation_period: 피처를 계산할 첫 접속 이후 기간 (일)
+        churn_observation_period: 이탈 여부를 관찰할 기간 (일)
+        churn_column: 이탈 라벨 컬럼명
+        presorted: df 가 이미 (플레이어, date) 순으로 정렬되어 있으면 True
+        features: 계산할 피처 이름 목록 (None 이면 FEATURE_COLUMNS 전체).
+            주어지면 그 피처에 필요한 컬럼과 중간값만 계산한다.
+        first_seen: 첫 접속 레지스트리 (PlayerTimeline 참고)
+        low_memory: True 면 입력을 복사하지 않고 임시 배열을 쓰자마자 버리는 저메모리 모드로 계산한다.
+            결과는 같고, tracemalloc 으로 잰 최대 할당량(바이트)을 result_df.attrs['peak_memory_bytes'] 에 남긴다.
+    Returns:
+        filter_df_with_names() 와 같은 형태의 플레이어별 피처 DataFrame (name 순)
+    """
+    features = FEATURE_COLUMNS if features is None else list(features)
+    if low_memory:
+        result_df, peak = _traced(_compute_features_low_memory, df, activation_period, churn_observation_period,
+                                  churn_column, features, first_seen)
+        result_df.attrs['peak_memory_bytes'] = peak
+        return result_df
+    horizon = max(activation_period, activation_period + churn_observation_period)
+    timeline = PlayerTimeline(df, horizon_days=horizon, presorted=presorted, value_columns=feature_inputs(features),
+                              first_seen=first_seen)
+    result_df = timeline.features(activation_period, features)
+    result_df[churn_column] = timeline.labels(activation_period, churn_observation_period)
+    return result_df
+
+
+def compute_features_multi(df: pd.DataFrame, activation_periods, churn_observation_periods,
+                           churn_column='ap_{ap}d_and_cop_{cop}d', presorted=False, features=None,
+                           first_seen=None) -> dict:
+    """여러 AP x COP 조합의 피처 프레임을 한 번의 정렬로 계산한다.
+
+    피처는 AP 마다 한 번, 라벨은 AP 마다 구한 첫 재접속 시각을 COP 별로 비교해 만든다.
+
+    Args:
+        df: name, date, win, score, points, degree 컬럼을 가진 매치 데이터
+        activation_periods: 활성 기간 목록 (일)
+        churn_observation_periods: 이탈 관찰 기간 목록 (일)
+        churn_column: 라벨 컬럼명 형식 ({ap}, {cop} 치환)
+        presorted: df 가 이미 (플레이어, date) 순으로 정렬되어 있으면 True
+        features: 계산할 피처 이름 목록 (None 이면 FEATURE_COLUMNS 전체)
+        first_seen: 첫 접속 레지스트리 (PlayerTimeline 참고)
+    Returns:
+        {(ap, cop): compute_features() 와 같은 형태의 DataFrame}
+    """
+    features = FEATURE_COLUMNS if features is None else list(features)
+    horizon = max(max(activation_periods), max(activation_periods) + max(churn_observation_periods))
+    timeline = PlayerTimeline(df, horizon_days=horizon, presorted=presorted, value_columns=feature_inputs(features),
+                              first_seen=first_seen)
+
+    results = {}
+    for ap in activation_periods:
+        feature_df = timeline.features(ap, features)
+        first_return = timeline.first_return(ap)
+        for cop in churn_observation_periods:
+            result_df = feature_df.copy()
+            result_df[churn_column.format(ap=ap, cop=cop)] = timeline.labels(ap, cop, first_return)
+            results[(ap, cop)] = result_df
+    return results
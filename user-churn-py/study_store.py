@@ -0,0 +1,172 @@
+"""하이퍼파라미터 탐색 trial 저장소 (SQLite).
+
+trial 하나(파라미터 조합 x 자원 x fold 분할)의 fold 별 점수, 학습 시간, 데이터 해시를 평가가 끝나는 즉시
+기록한다. 같은 데이터(피처 + 라벨 해시)와 같은 fold 분할에서 이미 평가한 trial 은 다시 학습하지 않고
+저장된 점수를 쓰므로, 탐색을 다시 돌리거나 중간에 끊긴 탐색을 이어서 돌려도 남은 trial 만 평가한다.
+
+탐색이 끝나면 최종 단계에서 고른 최적 파라미터(모델에 바로 넣을 수 있는 형태)를 best 테이블에 따로
+기록한다. 앱의 "모델 비교" 탭은 best_params() 로 이 값을 읽어 탐색 없이 모델을 학습한다.
+
+사용 예:
+    store = StudyStore()
+    data_hash = data_fingerprint(X, y)
+    store.best_params("Random Forest", data_hash)
+"""
+
+import datetime
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+STUDY_PATH = Path(__file__).parent / "data" / "studies.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    study TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    cv_hash TEXT NOT NULL,
+    scoring TEXT NOT NULL,
+    params TEXT NOT NULL,
+    sample_fraction REAL NOT NULL,
+    fold_scores TEXT NOT NULL,
+    mean_score REAL NOT NULL,
+    fit_seconds REAL NOT NULL,
+    attrs TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (study, data_hash, cv_hash, scoring, params, sample_fraction)
+);
+CREATE TABLE IF NOT EXISTS best (
+    study TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    cv_hash TEXT NOT NULL,
+    scoring TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    params TEXT NOT NULL,
+    score REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (study, data_hash, cv_hash, scoring, mode)
+)
+"""
+
+
+def data_fingerprint(X: pd.DataFrame, y) -> str:
+    """피처 이름, 피처 값, 라벨로 계산한 데이터 해시. 값은 float64 로 맞춰 dtype 차이는 무시한다."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(map(str, X.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(X.astype(np.float64), index=False).to_numpy().tobytes())
+    digest.update(np.ascontiguousarray(np.ravel(y), dtype=np.int64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def cv_fingerprint(folds) -> str:
+    """(train, test) 인덱스 목록의 해시. fold 분할이 같아야 fold 점수를 재사용할 수 있다."""
+    digest = hashlib.sha256()
+    for train_idx, test_idx in folds:
+        digest.update(np.asarray(train_idx, dtype=np.int64).tobytes())
+        digest.update(b"|")
+        digest.update(np.asarray(test_idx, dtype=np.int64).tobytes())
+        digest.update(b"#")
+    return digest.hexdigest()[:16]
+
+
+def _json_default(value):
+    # numpy 스칼라 등 JSON 이 모르는 값은 Python 기본형으로 바꾼다
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"JSON 으로 저장할 수 없는 값: {value!r}")
+
+
+def params_key(params: dict) -> str:
+    """파라미터 dict 의 정규화된 JSON (키 정렬). trial 식별자로 쓴다."""
+    return json.dumps(params, sort_keys=True, default=_json_default)
+
+
+class StudyStore:
+    """SQLite 파일 하나에 여러 study(모델별 탐색)의 trial 을 저장한다.
+
+    Args:
+        path: SQLite 파일 경로 (없으면 만든다)
+    """
+
+    def __init__(self, path=STUDY_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def get(self, study: str, data_hash: str, cv_hash: str, scoring: str, params: dict,
+            sample_fraction: float = 1.0) -> dict | None:
+        """저장된 trial 을 찾아 {fold_scores, mean_score, fit_seconds, attrs} 로 반환한다. 없으면 None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fold_scores, mean_score, fit_seconds, attrs FROM trials WHERE study = ? AND data_hash = ? "
+                "AND cv_hash = ? AND scoring = ? AND params = ? AND sample_fraction = ?",
+                (study, data_hash, cv_hash, scoring, params_key(params), sample_fraction),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"fold_scores": np.array(json.loads(row[0])), "mean_score": row[1], "fit_seconds": row[2],
+                "attrs": json.loads(row[3])}
+
+    def record(self, study: str, data_hash: str, cv_hash: str, scoring: str, params: dict, fold_scores,
+               fit_seconds: float, sample_fraction: float = 1.0, attrs: dict | None = None) -> None:
+        """trial 하나를 저장한다 (같은 trial 이 있으면 덮어쓴다). 호출마다 커밋하므로 중단돼도 남는다."""
+        fold_scores = [float(s) for s in fold_scores]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (study, data_hash, cv_hash, scoring, params_key(params), sample_fraction, json.dumps(fold_scores),
+                 float(np.mean(fold_scores)), float(fit_seconds), json.dumps(attrs or {}, default=_json_default),
+                 datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def trials(self, study: str | None = None, data_hash: str | None = None) -> pd.DataFrame:
+        """저장된 trial 목록 (params / attrs 는 dict 로 풀어서 반환)."""
+        query, args = "SELECT * FROM trials", []
+        conditions = [(c, v) for c, v in (("study", study), ("data_hash", data_hash)) if v is not None]
+        if conditions:
+            query += " WHERE " + " AND ".join(f"{c} = ?" for c, _ in conditions)
+            args = [v for _, v in conditions]
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=args)
+        for column in ("params", "fold_scores", "attrs"):
+            df[column] = df[column].map(json.loads)
+        return df
+
+    def record_best(self, study: str, data_hash: str, cv_hash: str, scoring: str, mode: str, params: dict,
+                    score: float) -> None:
+        """탐색(tune) 하나가 최종 단계에서 고른 최적 파라미터를 저장한다 (같은 탐색 조건이면 덮어쓴다)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO best VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (study, data_hash, cv_hash, scoring, mode, params_key(params), float(score),
+                 datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def best_params(self, study: str, data_hash: str | None = None, scoring: str = "roc_auc") -> dict | None:
+        """저장된 탐색 결과(record_best) 중 점수가 가장 높은 최적 파라미터.
+
+        개별 trial 이 아니라 탐색이 최종 단계까지 남긴 후보만 보므로, halving 의 앞 단계에서 적은 자원으로
+        평가된 trial 은 고르지 않는다. data_hash 가 None 이면 데이터와 관계없이 찾는다. 기록이 없으면 None.
+
+        Returns:
+            {"params": 모델 파라미터, "score": 평균 점수, "data_hash": 데이터 해시} 또는 None
+        """
+        query = "SELECT params, score, data_hash FROM best WHERE study = ? AND scoring = ?"
+        args = [study, scoring]
+        if data_hash is not None:
+            query += " AND data_hash = ?"
+            args.append(data_hash)
+        with self._connect() as conn:
+            row = conn.execute(query + " ORDER BY score DESC LIMIT 1", args).fetchone()
+        if row is None:
+            return None
+        return {"params": json.loads(row[0]), "score": row[1], "data_hash": row[2]}